@@ -11,6 +11,8 @@ from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+
+from shared.responses import FastJSONResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 
@@ -19,14 +21,15 @@ env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(env_path, override=True)
 
 from api_v2.core.database import init_db_manager, close_db_manager, get_db_manager
-from api_v2.cache import init_cache_manager, close_cache_manager
+from api_v2.cache import init_cache_manager, close_cache_manager, get_cache_manager
+from api_v2.telegram.client import init_telegram_client, close_telegram_client
 from api_v2.routes.api_v2 import router as api_v2_router
-from api_v2.routes.enforcement_endpoints import router as enforcement_router
+from api_v2.routes.enforcement_endpoints import router as enforcement_router, BOT_TOKEN
 from api_v2.routes.history import router as history_router
 from api_v2.routes.analytics import router as analytics_router
 from api_v2.routes.moderation_advanced import router as moderation_advanced_router
 from api_v2.routes.whitelist_blacklist import router as whitelist_blacklist_router
-from api_v2.routes.night_mode import router as night_mode_router
+from api_v2.routes.night_mode import router as night_mode_router, night_mode_scheduler
 from api_v2.routes.message_operations import router as message_operations_router
 from api_v2.routes.new_commands import router as new_commands_router
 from api_v2.routes.behavior_filters import router as behavior_filters_router, set_database
@@ -89,6 +92,18 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"⚠️ Redis not available: {e}. Using in-memory cache only.")
         
+        # Shared Telegram Bot API client (one keep-alive pool for all routes)
+        try:
+            await init_telegram_client(BOT_TOKEN)
+            logger.info("✅ Telegram client ready")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not initialize Telegram client: {e}")
+        
+        # Start night mode transition scheduler
+        cache_manager = get_cache_manager()
+        night_mode_scheduler.start(redis=cache_manager.redis if cache_manager else None)
+        logger.info("✅ Night mode scheduler started")
+        
         logger.info("✅ API V2 started successfully on port 8002")
     except Exception as e:
         logger.warning(f"⚠️ Startup warning: {e}")
@@ -98,6 +113,8 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("🛑 Shutting down API V2...")
     try:
+        await night_mode_scheduler.stop()
+        await close_telegram_client()
         await close_db_manager()
         await close_cache_manager()
         if hasattr(app.state, "motor_client"):
@@ -112,7 +129,8 @@ app = FastAPI(
     title="API V2 - Professional Data Management",
     description="Enterprise-grade multi-group management system",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
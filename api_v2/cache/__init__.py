@@ -6,10 +6,14 @@ from api_v2.cache.manager import (
     init_cache_manager,
     close_cache_manager,
 )
+from api_v2.cache.decorators import cached, invalidates, invalidate
 
 __all__ = [
     "CacheManager",
     "get_cache_manager",
     "init_cache_manager",
     "close_cache_manager",
+    "cached",
+    "invalidates",
+    "invalidate",
 ]
@@ -0,0 +1,150 @@
+"""
+Cache Codec Micro-Benchmark
+
+Compares encode/decode speed and payload size of the available cache codecs
+on document shapes the API actually caches (group, user, settings, member
+lists and analytics results).
+
+Usage:
+    python -m api_v2.cache.benchmark [--iterations 2000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from api_v2.cache import codecs
+from api_v2.cache.codecs import Codec
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+
+def _oid() -> Any:
+    return ObjectId() if ObjectId else f"{random.getrandbits(96):024x}"
+
+
+def _user_doc(group_id: int, user_id: int) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "_id": _oid(),
+        "group_id": group_id,
+        "user_id": user_id,
+        "username": f"user_{user_id}",
+        "first_name": "Test",
+        "role": random.choice(["member", "moderator", "admin"]),
+        "is_active": True,
+        "warnings": random.randint(0, 3),
+        "permissions": {
+            "can_send_messages": True,
+            "can_send_media": random.random() > 0.1,
+            "can_send_stickers": True,
+            "can_send_polls": False,
+        },
+        "created_at": now - timedelta(days=random.randint(0, 900)),
+        "updated_at": now,
+    }
+
+
+def sample_documents() -> Dict[str, Any]:
+    """Build representative payloads keyed by shape name"""
+    group_id = -1001234567890
+    now = datetime.utcnow()
+    group = {
+        "_id": _oid(),
+        "group_id": group_id,
+        "name": "Benchmark Group",
+        "description": "Group used for codec benchmarks",
+        "is_active": True,
+        "member_count": 1500,
+        "admins": [random.randint(10**8, 10**9) for _ in range(8)],
+        "created_at": now - timedelta(days=400),
+        "updated_at": now,
+    }
+    settings = {
+        "group_id": group_id,
+        "auto_delete_commands": True,
+        "night_mode": {"enabled": True, "start_time": "22:00", "end_time": "08:00"},
+        "word_filters": [f"word{i}" for i in range(50)],
+        "updated_at": now,
+    }
+    members = [_user_doc(group_id, 10**8 + i) for i in range(1000)]
+    analytics = {
+        "group_id": group_id,
+        "period_days": 30,
+        "daily": [
+            {"date": (now - timedelta(days=d)).date().isoformat(),
+             "active_users": random.randint(50, 500),
+             "messages": random.randint(500, 5000),
+             "actions": {"ban": random.randint(0, 5), "mute": random.randint(0, 20)}}
+            for d in range(30)
+        ],
+        "generated_at": now,
+    }
+    return {
+        "group": group,
+        "user": members[0],
+        "settings": settings,
+        "members_1000": members,
+        "analytics_30d": analytics,
+    }
+
+
+def available_codecs() -> List[Codec]:
+    """Instantiate every installed codec, with and without compression"""
+    result: List[Codec] = []
+    for name in ("json", "orjson", "msgpack"):
+        try:
+            result.append(codecs.get_codec(name, compression_threshold=None))
+            result.append(codecs.get_codec(name))
+        except RuntimeError:
+            continue
+    return result
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int = 2000) -> List[Dict[str, Any]]:
+    """Run benchmark and return one row per (shape, codec)"""
+    rows = []
+    for shape, doc in sample_documents().items():
+        # Large shapes get fewer iterations to keep runtime bounded
+        n = max(10, iterations // 100) if isinstance(doc, list) else iterations
+        for codec in available_codecs():
+            payload = codec.encode(doc)
+            label = codec.name if codec.compression_threshold is None else f"{codec.name}+zlib"
+            rows.append({
+                "shape": shape,
+                "codec": label,
+                "bytes": len(payload),
+                "encode_us": _time(lambda: codec.encode(doc), n),
+                "decode_us": _time(lambda: codecs.decode(payload), n),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cache codecs")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'shape':<16}{'codec':<16}{'bytes':>10}{'encode µs':>14}{'decode µs':>14}")
+    print("-" * 70)
+    for row in run(args.iterations):
+        print(
+            f"{row['shape']:<16}{row['codec']:<16}{row['bytes']:>10}"
+            f"{row['encode_us']:>14.1f}{row['decode_us']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Cache Codecs - Pluggable binary serialization for cached payloads
+
+Every encoded payload is framed with a two byte header:
+    [codec id][compression flag] + body
+
+so values can always be decoded regardless of which codec a key family is
+currently configured with. Payloads without a header (plain JSON written by
+older versions) are decoded with the stdlib JSON codec.
+"""
+
+import json
+import logging
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Type
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    from bson import ObjectId
+    BSON_AVAILABLE = True
+except ImportError:
+    BSON_AVAILABLE = False
+
+    class ObjectId:  # type: ignore[no-redef]
+        """Placeholder so isinstance checks work without bson installed"""
+
+logger = logging.getLogger(__name__)
+
+# Frame header values
+COMPRESSION_NONE = 0x00
+COMPRESSION_ZLIB = 0x01
+
+# Values at or above this size (bytes) are compressed by default
+DEFAULT_COMPRESSION_THRESHOLD = 2048
+
+# msgpack extension type codes
+_EXT_DATETIME = 1
+_EXT_OBJECTID = 2
+
+# JSON type tags (MongoDB Extended JSON style)
+_TAG_DATE = "$date"
+_TAG_OID = "$oid"
+
+
+class CodecError(ValueError):
+    """Raised when a payload cannot be encoded or decoded"""
+
+
+# ============================================================================
+# TYPE HOOKS
+# ============================================================================
+
+def _json_default(value: Any) -> Any:
+    """Encode BSON/datetime values as tagged objects"""
+    if isinstance(value, datetime):
+        return {_TAG_DATE: value.isoformat()}
+    if isinstance(value, date):
+        return value.isoformat()
+    if BSON_AVAILABLE and isinstance(value, ObjectId):
+        return {_TAG_OID: str(value)}
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def _json_object_hook(obj: Dict[str, Any]) -> Any:
+    """Restore tagged objects produced by ``_json_default``"""
+    if len(obj) == 1:
+        if _TAG_DATE in obj:
+            return datetime.fromisoformat(obj[_TAG_DATE])
+        if _TAG_OID in obj and BSON_AVAILABLE:
+            return ObjectId(obj[_TAG_OID])
+    return obj
+
+
+def _restore_tags(value: Any) -> Any:
+    """Walk a decoded structure in place applying ``_json_object_hook``"""
+    if isinstance(value, dict):
+        if len(value) == 1 and (_TAG_DATE in value or _TAG_OID in value):
+            return _json_object_hook(value)
+        for k, v in value.items():
+            if isinstance(v, (dict, list)):
+                value[k] = _restore_tags(v)
+        return value
+    if isinstance(value, list):
+        for i, v in enumerate(value):
+            if isinstance(v, (dict, list)):
+                value[i] = _restore_tags(v)
+    return value
+
+
+def _msgpack_default(value: Any) -> Any:
+    """Encode BSON/datetime values as msgpack extension types"""
+    if isinstance(value, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if BSON_AVAILABLE and isinstance(value, ObjectId):
+        return msgpack.ExtType(_EXT_OBJECTID, value.binary)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    """Restore msgpack extension types"""
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == _EXT_OBJECTID and BSON_AVAILABLE:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+# ============================================================================
+# CODECS
+# ============================================================================
+
+class Codec:
+    """
+    Base codec
+
+    Subclasses implement ``_dumps``/``_loads``; framing and optional
+    compression are handled here.
+    """
+
+    codec_id: int = 0
+    name: str = "base"
+
+    def __init__(self, compression_threshold: Optional[int] = DEFAULT_COMPRESSION_THRESHOLD,
+                 compression_level: int = 6):
+        """
+        Args:
+            compression_threshold: Compress bodies at or above this many bytes
+                (None disables compression)
+            compression_level: zlib compression level
+        """
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+
+    def _dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def _loads(self, body: bytes) -> Any:
+        raise NotImplementedError
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize value into a framed payload"""
+        try:
+            body = self._dumps(value)
+        except Exception as e:
+            raise CodecError(f"{self.name} encode failed: {e}") from e
+
+        flag = COMPRESSION_NONE
+        if self.compression_threshold is not None and len(body) >= self.compression_threshold:
+            compressed = zlib.compress(body, self.compression_level)
+            if len(compressed) < len(body):
+                body, flag = compressed, COMPRESSION_ZLIB
+        return bytes((self.codec_id, flag)) + body
+
+    def decode_body(self, body: bytes, flag: int) -> Any:
+        """Deserialize a payload body (header already stripped)"""
+        if flag == COMPRESSION_ZLIB:
+            body = zlib.decompress(body)
+        try:
+            return self._loads(body)
+        except Exception as e:
+            raise CodecError(f"{self.name} decode failed: {e}") from e
+
+
+class JSONCodec(Codec):
+    """Stdlib JSON codec - always available, slowest"""
+
+    codec_id = 0x01
+    name = "json"
+
+    def _dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+    def _loads(self, body: bytes) -> Any:
+        return json.loads(body, object_hook=_json_object_hook)
+
+
+class OrjsonCodec(Codec):
+    """orjson codec - fast JSON with datetime/ObjectId round-tripping"""
+
+    codec_id = 0x02
+    name = "orjson"
+
+    def __init__(self, *args, **kwargs):
+        if not ORJSON_AVAILABLE:
+            raise RuntimeError("orjson is not installed")
+        super().__init__(*args, **kwargs)
+        # Route datetimes through default() so they are tagged, not stringified
+        self._options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def _dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=_json_default, option=self._options)
+
+    def _loads(self, body: bytes) -> Any:
+        value = orjson.loads(body)
+        # Only walk payloads that actually contain tagged values
+        if b'"$date"' in body or b'"$oid"' in body:
+            value = _restore_tags(value)
+        return value
+
+
+class MsgpackCodec(Codec):
+    """msgpack codec - compact binary with native extension types"""
+
+    codec_id = 0x03
+    name = "msgpack"
+
+    def __init__(self, *args, **kwargs):
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack is not installed")
+        super().__init__(*args, **kwargs)
+
+    def _dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_msgpack_default, use_bin_type=True, datetime=False)
+
+    def _loads(self, body: bytes) -> Any:
+        return msgpack.unpackb(body, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+
+
+_CODEC_CLASSES: Dict[int, Type[Codec]] = {
+    JSONCodec.codec_id: JSONCodec,
+    OrjsonCodec.codec_id: OrjsonCodec,
+    MsgpackCodec.codec_id: MsgpackCodec,
+}
+_decoders: Dict[int, Codec] = {}
+_legacy_codec = JSONCodec(compression_threshold=None)
+
+
+def decode(payload: Any) -> Any:
+    """
+    Decode a framed payload produced by any codec
+
+    Unframed payloads are treated as legacy plain JSON.
+    """
+    if payload is None:
+        return None
+    if isinstance(payload, str):
+        payload = payload.encode()
+
+    if len(payload) >= 2 and payload[0] in _CODEC_CLASSES:
+        codec_id, flag = payload[0], payload[1]
+        decoder = _decoders.get(codec_id)
+        if decoder is None:
+            decoder = _decoders[codec_id] = _CODEC_CLASSES[codec_id]()
+        return decoder.decode_body(payload[2:], flag)
+
+    return _legacy_codec._loads(payload)
+
+
+def default_codec(**kwargs) -> Codec:
+    """Fastest available codec (orjson > msgpack > json)"""
+    if ORJSON_AVAILABLE:
+        return OrjsonCodec(**kwargs)
+    if MSGPACK_AVAILABLE:
+        return MsgpackCodec(**kwargs)
+    return JSONCodec(**kwargs)
+
+
+def get_codec(name: str, **kwargs) -> Codec:
+    """Build codec by name ("json", "orjson", "msgpack" or "default")"""
+    if name == "default":
+        return default_codec(**kwargs)
+    for codec_cls in _CODEC_CLASSES.values():
+        if codec_cls.name == name:
+            return codec_cls(**kwargs)
+    raise ValueError(f"Unknown codec: {name}")
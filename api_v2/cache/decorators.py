@@ -0,0 +1,152 @@
+"""
+Read-Through Cache Decorators - Declarative caching for routes and services
+
+Usage:
+    @router.get("/groups/{group_id}/policies")
+    @cached("policies:{group_id}", ttl=300)
+    async def get_group_policies(group_id: int): ...
+
+    @router.post("/groups/{group_id}/policies/floods")
+    @invalidates("policies:{group_id}")
+    async def toggle_floods_policy(group_id: int, ...): ...
+
+Key and tag templates are ``str.format`` templates over the decorated
+function's arguments (attribute access such as ``{entry.user_id}`` works).
+Both decorators preserve the wrapped signature, so FastAPI still sees the
+original parameters.
+"""
+
+import functools
+import inspect
+import logging
+from typing import Any, Callable, Dict, Sequence
+
+from api_v2.cache.manager import get_cache_manager
+from shared.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300  # 5 minutes
+
+# In-flight loads per cache key (single-flight on miss)
+_inflight = SingleFlight()
+
+# Bumped on every invalidation; loads that overlap one are not cached
+_invalidation_epoch = 0
+
+
+def _bind(signature: inspect.Signature, args: tuple, kwargs: dict) -> Dict[str, Any]:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return bound.arguments
+
+
+def _render(templates: Sequence[str], arguments: Dict[str, Any]) -> list:
+    return [template.format(**arguments) for template in templates]
+
+
+def _to_cacheable(value: Any) -> Any:
+    """Convert pydantic models into plain data so codecs can store them"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {k: _to_cacheable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_cacheable(v) for v in value]
+    return value
+
+
+def cached(key: str, ttl: int = DEFAULT_TTL, tags: Sequence[str] = ()):
+    """
+    Read-through cache for an async function
+
+    On a hit the cached value is returned without calling the function.
+    Concurrent misses for the same key share a single call. Exceptions
+    (including HTTPException) are never cached.
+
+    Args:
+        key: Cache key template
+        ttl: Time-to-live in seconds
+        tags: Tag templates to register the key under (see ``invalidates``)
+    """
+    def decorator(func: Callable):
+        signature = inspect.signature(func)
+
+        async def load(cache_key: str, tag_names: list, args: tuple, kwargs: dict):
+            epoch = _invalidation_epoch
+            result = await func(*args, **kwargs)
+            if epoch == _invalidation_epoch:
+                cache = get_cache_manager()
+                if cache:
+                    await cache.set(cache_key, _to_cacheable(result), ttl=ttl, tags=tag_names)
+            return result
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache = get_cache_manager()
+            if cache is None:
+                return await func(*args, **kwargs)
+
+            try:
+                arguments = _bind(signature, args, kwargs)
+                cache_key = key.format(**arguments)
+                tag_names = _render(tags, arguments)
+            except Exception as e:
+                logger.warning(f"Cache key error for {func.__name__}: {e}")
+                return await func(*args, **kwargs)
+
+            hit = await cache.get(cache_key)
+            if hit is not None:
+                return hit
+
+            return await _inflight.do(cache_key, lambda: load(cache_key, tag_names, args, kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+async def invalidate(keys: Sequence[str] = (), tags: Sequence[str] = ()):
+    """Invalidate concrete cache keys and tags"""
+    global _invalidation_epoch
+    _invalidation_epoch += 1
+    for cache_key in keys:
+        _inflight.forget(cache_key)
+
+    cache = get_cache_manager()
+    if cache is None:
+        return
+    for cache_key in keys:
+        await cache.delete(cache_key)
+    for tag in tags:
+        await cache.invalidate_tag(tag)
+
+
+def invalidates(*keys: str, tags: Sequence[str] = ()):
+    """
+    Invalidate cache keys/tags after an async write function runs
+
+    Invalidation also runs when the function raises, since a failed write
+    may still have partially applied.
+
+    Args:
+        keys: Cache key templates to delete
+        tags: Tag templates to invalidate
+    """
+    def decorator(func: Callable):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                try:
+                    arguments = _bind(signature, args, kwargs)
+                    await invalidate(_render(keys, arguments), _render(tags, arguments))
+                except Exception as e:
+                    logger.warning(f"Cache invalidation error for {func.__name__}: {e}")
+
+        return wrapper
+
+    return decorator
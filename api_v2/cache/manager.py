@@ -2,42 +2,163 @@
 Advanced Caching System - Redis and In-Memory cache for performance
 """
 
-import json
+import asyncio
+import fnmatch
 import logging
-from typing import Optional, Any, Dict
+import time as time_module
+from collections import OrderedDict
+from typing import Optional, Any, Dict, Iterable, List, Set
 from datetime import timedelta
 import redis.asyncio as aioredis
 from functools import lru_cache
 
+from api_v2.cache import codecs
+from api_v2.cache.codecs import Codec
+
 logger = logging.getLogger(__name__)
 
 # Global cache manager
 _cache_manager: Optional["CacheManager"] = None
 
+# Prefixes for generation counters and tag sets
+NAMESPACE_PREFIX = "ns"
+TAG_PREFIX = "tag"
+
+# Batch size for SCAN/SSCAN cursors and UNLINK calls
+SCAN_BATCH_SIZE = 500
+
+# Key families holding large payloads compress from a lower threshold
+LARGE_PAYLOAD_FAMILIES = ("members", "analytics")
+LARGE_PAYLOAD_COMPRESSION_THRESHOLD = 512
+
+# Entries kept by the in-memory fallback cache
+MEMORY_CACHE_MAX_ENTRIES = 10_000
+
+# Adds a key to a tag set, only ever extending the set's expiry so that it
+# outlives its longest-lived member (a member without TTL makes it persistent)
+# KEYS[1] = tag set, ARGV[1] = member key, ARGV[2] = member TTL (0 = none)
+TAG_MEMBER_SCRIPT = """
+local existed = redis.call('EXISTS', KEYS[1])
+redis.call('SADD', KEYS[1], ARGV[1])
+local ttl = tonumber(ARGV[2])
+if ttl == 0 then
+    redis.call('PERSIST', KEYS[1])
+    return 0
+end
+local current = redis.call('TTL', KEYS[1])
+if existed == 0 or (current >= 0 and current < ttl) then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+
+class MemoryCache:
+    """
+    Bounded LRU with per-entry TTL, used while Redis is unavailable
+
+    Entries can be indexed under namespace/tag names so they can be
+    invalidated together; evicted and expired entries leave the index.
+    """
+
+    def __init__(self, max_entries: int = MEMORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # key -> (expires_at, value, index names)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._index: Dict[str, Set[str]] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] is not None and entry[0] <= time_module.monotonic():
+            self.pop(key)
+            return default
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, index: Iterable[str] = ()):
+        self.pop(key)
+        names = tuple(index)
+        expires_at = time_module.monotonic() + ttl if ttl else None
+        self._entries[key] = (expires_at, value, names)
+        for name in names:
+            self._index.setdefault(name, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self.pop(next(iter(self._entries)))
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        for name in entry[2]:
+            keys = self._index.get(name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[name]
+        return entry[1]
+
+    def invalidate(self, name: str) -> int:
+        """Remove every entry indexed under name"""
+        keys = self._index.pop(name, set())
+        for key in keys:
+            self.pop(key)
+        return len(keys)
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class CacheManager:
     """
     High-performance caching with:
     - Redis for distributed cache
-    - In-memory cache for fast access
+    - Bounded in-memory fallback while Redis is unavailable
     - Automatic invalidation
     - TTL support
+    
+    Invalidation never enumerates the keyspace:
+    - Namespaces (e.g. ``group:<id>``) carry a generation counter that is
+      embedded in every key, so invalidating a namespace is a single INCR
+      and stale entries simply age out through their TTL
+    - Tags map to Redis sets of member keys for targeted deletes
+    - Pattern clears use SCAN in a background task instead of KEYS
+    
+    Values are stored in Redis through a per key-family codec (first key
+    segment, e.g. ``group`` or ``analytics``); see ``api_v2.cache.codecs``.
     """
     
     def __init__(self, redis_url: str = "redis://localhost:6379"):
         self.redis_url = redis_url
         self.redis: Optional[aioredis.Redis] = None
-        self.in_memory_cache: Dict[str, Any] = {}
+        self._tag_member = None
+        self.in_memory_cache = MemoryCache()
         self.logger = logging.getLogger(self.__class__.__name__)
+        # In-memory mirror of generations
+        self._generations: Dict[str, int] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
+        # Codec per key family, falling back to the fastest available codec
+        self.default_codec: Codec = codecs.default_codec()
+        self.codecs: Dict[str, Codec] = {
+            family: codecs.default_codec(
+                compression_threshold=LARGE_PAYLOAD_COMPRESSION_THRESHOLD
+            )
+            for family in LARGE_PAYLOAD_FAMILIES
+        }
     
     async def connect(self):
         """Connect to Redis"""
         try:
+            # Binary payloads: codecs handle (de)serialization
             self.redis = await aioredis.from_url(
                 self.redis_url,
-                encoding="utf8",
-                decode_responses=True
+                decode_responses=False
             )
+            self._tag_member = self.redis.register_script(TAG_MEMBER_SCRIPT)
             self.logger.info("✅ Redis connected")
         except Exception as e:
             self.logger.warning(f"Redis connection failed: {e}. Using in-memory only.")
@@ -45,6 +166,12 @@ class CacheManager:
     
     async def disconnect(self):
         """Disconnect from Redis"""
+        for task in list(self._background_tasks):
+            task.cancel()
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._background_tasks.clear()
+        
         if self.redis:
             await self.redis.close()
             self.logger.info("✅ Redis disconnected")
@@ -55,36 +182,58 @@ class CacheManager:
     
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        # Try Redis first
+        # Redis is authoritative when connected: another process may have
+        # invalidated the key, so a Redis miss must not fall back to memory
         if self.redis:
             try:
                 value = await self.redis.get(key)
-                if value:
-                    return json.loads(value)
+                return codecs.decode(value) if value else None
             except Exception as e:
                 self.logger.warning(f"Redis get error: {e}")
         
         # Fallback to in-memory
         return self.in_memory_cache.get(key)
     
-    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """Set value in cache"""
-        json_value = json.dumps(value, default=str)
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None,
+                  tags: Iterable[str] = (), namespace: Optional[str] = None,
+                  codec: Optional[Codec] = None):
+        """
+        Set value in cache
+        
+        Args:
+            key: Cache key
+            value: Value to cache (dicts, lists, scalars, datetime, ObjectId)
+            ttl: Time-to-live in seconds
+            tags: Tags to register the key under for ``invalidate_tag``
+            namespace: Versioned namespace the key belongs to (see ``versioned_key``)
+            codec: Override the key family's codec
+        """
+        tags = list(tags)
         
         # Set in Redis if available
-        if self.redis and ttl:
-            try:
-                await self.redis.setex(key, ttl, json_value)
-            except Exception as e:
-                self.logger.warning(f"Redis set error: {e}")
-        elif self.redis:
+        stored = False
+        if self.redis:
             try:
-                await self.redis.set(key, json_value)
+                payload = (codec or self.codec_for(key)).encode(value)
+                pipe = self.redis.pipeline(transaction=False)
+                if ttl:
+                    pipe.setex(key, ttl, payload)
+                else:
+                    pipe.set(key, payload)
+                for tag in tags:
+                    await self._tag_member(
+                        keys=[self.tag_key(tag)], args=[key, ttl or 0], client=pipe
+                    )
+                await pipe.execute()
+                stored = True
             except Exception as e:
                 self.logger.warning(f"Redis set error: {e}")
         
-        # Also set in memory
-        self.in_memory_cache[key] = value
+        # Memory only backs up Redis: nothing reads it while Redis serves
+        if not stored:
+            self.in_memory_cache.set(
+                key, value, ttl, index=([namespace] if namespace else []) + tags
+            )
     
     async def delete(self, key: str):
         """Delete from cache"""
@@ -96,20 +245,128 @@ class CacheManager:
         
         self.in_memory_cache.pop(key, None)
     
-    async def clear_pattern(self, pattern: str):
-        """Clear all keys matching pattern"""
+    async def clear_pattern(self, pattern: str) -> Optional[asyncio.Task]:
+        """
+        Clear all keys matching pattern
+        
+        Redis keys are removed by a background SCAN so the call never blocks
+        Redis for other clients. Prefer ``invalidate_namespace`` or
+        ``invalidate_tag`` for hot paths.
+        
+        Returns:
+            The background sweep task, if one was started
+        """
+        # Clear from memory first so this process never serves stale data
+        for k in self.in_memory_cache:
+            if fnmatch.fnmatchcase(k, pattern):
+                self.in_memory_cache.pop(k)
+        
+        if self.redis:
+            return self._spawn(self.sweep_pattern(pattern))
+        return None
+    
+    async def sweep_pattern(self, pattern: str) -> int:
+        """Delete Redis keys matching pattern using incremental SCAN"""
+        if not self.redis:
+            return 0
+        
+        deleted = 0
+        batch: List[str] = []
+        try:
+            async for key in self.redis.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    deleted += await self.redis.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.redis.unlink(*batch)
+        except Exception as e:
+            self.logger.warning(f"Redis sweep error for {pattern}: {e}")
+        return deleted
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Run a maintenance coroutine in the background"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+    
+    # ========================================================================
+    # CODECS
+    # ========================================================================
+    
+    def register_codec(self, family: str, codec: Codec):
+        """Use codec for every key whose first segment is family"""
+        self.codecs[family] = codec
+    
+    def codec_for(self, key: str) -> Codec:
+        """Resolve codec for key by its family (first key segment)"""
+        return self.codecs.get(key.split(":", 1)[0], self.default_codec)
+    
+    # ========================================================================
+    # NAMESPACE VERSIONING & TAGS
+    # ========================================================================
+    
+    async def get_generation(self, namespace: str) -> int:
+        """Get current generation counter for namespace"""
         if self.redis:
             try:
-                keys = await self.redis.keys(pattern)
-                if keys:
-                    await self.redis.delete(*keys)
+                value = await self.redis.get(self.make_key(NAMESPACE_PREFIX, namespace))
+                return int(value or 0)
             except Exception as e:
-                self.logger.warning(f"Redis clear pattern error: {e}")
+                self.logger.warning(f"Redis generation read error: {e}")
+        return self._generations.get(namespace, 0)
+    
+    async def versioned_key(self, namespace: str, *parts: str) -> str:
+        """Create cache key embedding the namespace's current generation"""
+        generation = await self.get_generation(namespace)
+        return self.make_key(namespace, f"v{generation}", *parts)
+    
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """
+        Invalidate every key in namespace with a single INCR
+        
+        Old-generation keys become unreachable and expire through their TTL.
+        
+        Returns:
+            The new generation
+        """
+        generation = self._generations.get(namespace, 0) + 1
+        if self.redis:
+            try:
+                generation = await self.redis.incr(self.make_key(NAMESPACE_PREFIX, namespace))
+            except Exception as e:
+                self.logger.warning(f"Redis generation bump error: {e}")
+        self._generations[namespace] = generation
         
-        # Clear from memory too
-        to_delete = [k for k in self.in_memory_cache.keys() if pattern.replace("*", "") in k]
-        for k in to_delete:
-            del self.in_memory_cache[k]
+        self.in_memory_cache.invalidate(namespace)
+        return generation
+    
+    @staticmethod
+    def tag_key(tag: str) -> str:
+        """Create Redis key of a tag's member set"""
+        return CacheManager.make_key(TAG_PREFIX, tag)
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """Delete every key registered under tag"""
+        deleted = 0
+        if self.redis:
+            tag_key = self.tag_key(tag)
+            batch: List[str] = []
+            try:
+                async for key in self.redis.sscan_iter(tag_key, count=SCAN_BATCH_SIZE):
+                    batch.append(key)
+                    if len(batch) >= SCAN_BATCH_SIZE:
+                        deleted += await self.redis.unlink(*batch)
+                        batch = []
+                if batch:
+                    deleted += await self.redis.unlink(*batch)
+                await self.redis.unlink(tag_key)
+            except Exception as e:
+                self.logger.warning(f"Redis tag invalidation error for {tag}: {e}")
+        
+        memory_deleted = self.in_memory_cache.invalidate(tag)
+        return deleted if self.redis else memory_deleted
     
     # ========================================================================
     # CACHE KEYS
@@ -120,13 +377,24 @@ class CacheManager:
         """Create cache key from parts"""
         return ":".join(str(p) for p in parts)
     
-    def group_key(self, group_id: int, suffix: str = "") -> str:
+    def group_namespace(self, group_id: int) -> str:
+        """Create group namespace (versioned by invalidate_group)"""
+        return self.make_key("group", str(group_id))
+    
+    def group_users_namespace(self, group_id: int) -> str:
+        """Create group users namespace (versioned by invalidate_group_users)"""
+        return self.make_key("user", str(group_id))
+    
+    def group_key(self, group_id: int, suffix: str = "", generation: int = 0) -> str:
         """Create group cache key"""
-        return self.make_key("group", str(group_id), suffix)
+        return self.make_key(self.group_namespace(group_id), f"v{generation}", suffix)
     
-    def user_key(self, group_id: int, user_id: int, suffix: str = "") -> str:
+    def user_key(self, group_id: int, user_id: int, suffix: str = "",
+                 generation: int = 0) -> str:
         """Create user cache key"""
-        return self.make_key("user", str(group_id), str(user_id), suffix)
+        return self.make_key(
+            self.group_users_namespace(group_id), f"v{generation}", str(user_id), suffix
+        )
     
     def role_key(self, group_id: int, role_name: str) -> str:
         """Create role cache key"""
@@ -142,15 +410,21 @@ class CacheManager:
     
     async def cache_group(self, group_id: int, group_data: Dict[str, Any]):
         """Cache group data"""
-        await self.set(self.group_key(group_id), group_data, ttl=3600)  # 1 hour
+        namespace = self.group_namespace(group_id)
+        generation = await self.get_generation(namespace)
+        await self.set(
+            self.group_key(group_id, generation=generation), group_data,
+            ttl=3600, namespace=namespace  # 1 hour
+        )
     
     async def get_cached_group(self, group_id: int) -> Optional[Dict[str, Any]]:
         """Get cached group"""
-        return await self.get(self.group_key(group_id))
+        generation = await self.get_generation(self.group_namespace(group_id))
+        return await self.get(self.group_key(group_id, generation=generation))
     
     async def invalidate_group(self, group_id: int):
-        """Invalidate group cache"""
-        await self.clear_pattern(f"group:{group_id}:*")
+        """Invalidate group cache (O(1) generation bump)"""
+        await self.invalidate_namespace(self.group_namespace(group_id))
     
     # ========================================================================
     # USER CACHE
@@ -158,15 +432,21 @@ class CacheManager:
     
     async def cache_user(self, group_id: int, user_id: int, user_data: Dict[str, Any]):
         """Cache user data"""
-        await self.set(self.user_key(group_id, user_id), user_data, ttl=1800)  # 30 min
+        namespace = self.group_users_namespace(group_id)
+        generation = await self.get_generation(namespace)
+        await self.set(
+            self.user_key(group_id, user_id, generation=generation), user_data,
+            ttl=1800, namespace=namespace  # 30 min
+        )
     
     async def get_cached_user(self, group_id: int, user_id: int) -> Optional[Dict[str, Any]]:
         """Get cached user"""
-        return await self.get(self.user_key(group_id, user_id))
+        generation = await self.get_generation(self.group_users_namespace(group_id))
+        return await self.get(self.user_key(group_id, user_id, generation=generation))
     
     async def invalidate_group_users(self, group_id: int):
-        """Invalidate all users in group"""
-        await self.clear_pattern(f"user:{group_id}:*")
+        """Invalidate all users in group (O(1) generation bump)"""
+        await self.invalidate_namespace(self.group_users_namespace(group_id))
     
     # ========================================================================
     # SETTINGS CACHE
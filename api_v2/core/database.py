@@ -8,10 +8,15 @@ from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
 
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorClient
 from pymongo import ASCENDING, DESCENDING, UpdateOne, InsertOne
 from pymongo.errors import DuplicateKeyError, BulkWriteError
 
+from api_v2.services.retention import RetentionCohortTracker
+from shared.counts import get_count_cache
+from shared.pagination import fetch_page
+
 logger = logging.getLogger(__name__)
 
 # Global database manager instance
@@ -24,21 +29,25 @@ class DatabaseIndexManager:
     INDEXES = {
         "groups": [
             {"spec": [("group_id", ASCENDING)], "unique": True, "name": "group_id_unique"},
-            {"spec": [("is_active", ASCENDING), ("updated_at", DESCENDING)]},
+            {"spec": [("is_active", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)]},
+            {"spec": [("updated_at", DESCENDING), ("_id", DESCENDING)]},
             {"spec": [("name", "text")], "name": "name_text"},
         ],
         "users": [
             {"spec": [("user_id", ASCENDING)], "unique": True},
             {"spec": [("group_id", ASCENDING), ("user_id", ASCENDING)], "unique": True},
+            {"spec": [("group_id", ASCENDING), ("role", ASCENDING), ("_id", ASCENDING)]},
             {"spec": [("role", ASCENDING)]},
             {"spec": [("is_active", ASCENDING)]},
         ],
         "roles": [
             {"spec": [("group_id", ASCENDING), ("name", ASCENDING)], "unique": True},
+            {"spec": [("group_id", ASCENDING), ("priority", DESCENDING)]},
             {"spec": [("permissions", ASCENDING)]},
         ],
         "rules": [
             {"spec": [("group_id", ASCENDING), ("rule_name", ASCENDING)], "unique": True},
+            {"spec": [("group_id", ASCENDING), ("is_active", ASCENDING), ("priority", DESCENDING)]},
             {"spec": [("is_active", ASCENDING)]},
         ],
         "settings": [
@@ -46,7 +55,7 @@ class DatabaseIndexManager:
             {"spec": [("setting_key", ASCENDING)]},
         ],
         "actions": [
-            {"spec": [("group_id", ASCENDING), ("created_at", DESCENDING)]},
+            {"spec": [("group_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]},
             {"spec": [("user_id", ASCENDING), ("created_at", DESCENDING)]},
             {"spec": [("action_type", ASCENDING)]},
             {"spec": [("status", ASCENDING)]},
@@ -57,13 +66,166 @@ class DatabaseIndexManager:
             {"spec": [("severity", ASCENDING)]},
             {"spec": [("timestamp", DESCENDING)], "expireAfterSeconds": 2592000},  # 30 days TTL
         ],
+        "user_violations": [
+            {"spec": [("user_id", ASCENDING), ("group_id", ASCENDING)], "unique": True},
+        ],
+        "violation_history": [
+            {"spec": [("group_id", ASCENDING), ("user_id", ASCENDING), ("timestamp", DESCENDING)]},
+        ],
+        "retention_users": [
+            {"spec": [("group_id", ASCENDING), ("user_id", ASCENDING)], "unique": True},
+        ],
+        "retention_cohorts": [
+            {"spec": [("group_id", ASCENDING), ("cohort_week", ASCENDING)], "unique": True},
+        ],
+        # Per-message hot paths
+        "permissions": [
+            {"spec": [("group_id", ASCENDING), ("user_id", ASCENDING)], "unique": True},
+        ],
+        "permission_restrictions": [
+            {"spec": [("group_id", ASCENDING), ("user_id", ASCENDING)], "unique": True},
+        ],
+        "night_mode_settings": [
+            {"spec": [("group_id", ASCENDING)], "unique": True},
+        ],
+        "group_policies": [
+            {"spec": [("group_id", ASCENDING)], "unique": True},
+        ],
+        "whitelists": [
+            {"spec": [("group_id", ASCENDING), ("user_id", ASCENDING)]},
+            {"spec": [("group_id", ASCENDING), ("is_active", ASCENDING), ("entry_type", ASCENDING)]},
+        ],
+        "blacklists": [
+            {"spec": [("group_id", ASCENDING), ("is_active", ASCENDING), ("entry_type", ASCENDING)]},
+            {"spec": [("group_id", ASCENDING), ("entry_type", ASCENDING), ("blocked_item", ASCENDING)]},
+        ],
+        "word_filters": [
+            {"spec": [("group_id", ASCENDING), ("word", ASCENDING)], "unique": True},
+            {"spec": [("group_id", ASCENDING), ("active", ASCENDING), ("created_at", DESCENDING)]},
+            {"spec": [("group_id", ASCENDING), ("id", ASCENDING)]},
+        ],
+        "moderation_results": [
+            {"spec": [("group_id", ASCENDING), ("timestamp", DESCENDING)]},
+            {"spec": [("group_id", ASCENDING), ("user_id", ASCENDING), ("timestamp", DESCENDING)]},
+        ],
+        "user_profiles": [
+            {"spec": [("user_id", ASCENDING), ("group_id", ASCENDING)], "unique": True},
+        ],
+        "action_logs": [
+            {"spec": [("action_id", ASCENDING)], "unique": True, "sparse": True},
+            {"spec": [("group_id", ASCENDING), ("created_at", DESCENDING)]},
+            {"spec": [("group_id", ASCENDING), ("user_id", ASCENDING), ("created_at", DESCENDING)]},
+        ],
+    }
+    
+    # Collections kept outside the main database (on the same server):
+    # routes/moderation_advanced.py reads and writes word filters in its own
+    # "group_assistant" database, so their indexes and audit go there
+    COLLECTION_DATABASES = {
+        "word_filters": "group_assistant",
+    }
+    
+    # Query shapes served by the indexes above, checked by audit_query_plans().
+    # Values are placeholders - only the shape matters to the planner.
+    QUERY_SHAPES = [
+        {"collection": "groups", "filter": {"group_id": 0}},
+        {"collection": "groups", "filter": {"is_active": True}, "sort": [("updated_at", DESCENDING), ("_id", DESCENDING)]},
+        {"collection": "groups", "filter": {}, "sort": [("updated_at", DESCENDING), ("_id", DESCENDING)]},
+        {"collection": "users", "filter": {"group_id": 0, "user_id": 0}},
+        {"collection": "users", "filter": {"group_id": 0}, "sort": [("role", ASCENDING), ("_id", ASCENDING)]},
+        {"collection": "roles", "filter": {"group_id": 0}, "sort": [("priority", DESCENDING)]},
+        {"collection": "rules", "filter": {"group_id": 0, "is_active": True}, "sort": [("priority", DESCENDING)]},
+        {"collection": "settings", "filter": {"group_id": 0}},
+        {"collection": "actions", "filter": {"group_id": 0}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+        {"collection": "actions", "filter": {"group_id": 0, "$or": [
+            {"created_at": {"$lt": datetime(1970, 1, 1)}},
+            {"created_at": datetime(1970, 1, 1), "_id": {"$lt": ObjectId("000000000000000000000000")}},
+        ]}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+        {"collection": "logs", "filter": {"group_id": 0}, "sort": [("timestamp", DESCENDING)]},
+        {"collection": "permissions", "filter": {"group_id": 0, "user_id": 0}},
+        {"collection": "permissions", "filter": {"group_id": 0, "user_id": {"$in": [0, 1]}}},
+        {"collection": "permissions", "filter": {"group_id": 0}},
+        {"collection": "permission_restrictions", "filter": {"group_id": 0, "user_id": 0}},
+        {"collection": "night_mode_settings", "filter": {"group_id": 0}},
+        {"collection": "group_policies", "filter": {"group_id": 0}},
+        {"collection": "whitelists", "filter": {"group_id": 0, "user_id": 0}},
+        {"collection": "whitelists", "filter": {"group_id": 0, "is_active": True, "entry_type": "user"}},
+        {"collection": "blacklists", "filter": {"group_id": 0, "is_active": True}},
+        {"collection": "blacklists", "filter": {"group_id": 0, "entry_type": "word", "blocked_item": ""}},
+        {"collection": "word_filters", "filter": {"group_id": 0, "active": True}, "sort": [("created_at", DESCENDING)]},
+        {"collection": "word_filters", "filter": {"group_id": 0, "word": ""}},
+        {"collection": "word_filters", "filter": {"group_id": 0, "id": ""}},
+        {"collection": "moderation_results", "filter": {"group_id": 0}, "sort": [("timestamp", DESCENDING)]},
+        {"collection": "moderation_results", "filter": {"group_id": 0, "user_id": 0}, "sort": [("timestamp", DESCENDING)]},
+        {"collection": "user_profiles", "filter": {"user_id": 0, "group_id": 0}},
+        {"collection": "user_violations", "filter": {"user_id": 0, "group_id": 0}},
+        {"collection": "violation_history", "filter": {"group_id": 0, "user_id": 0}, "sort": [("timestamp", DESCENDING)]},
+        {"collection": "action_logs", "filter": {"action_id": ""}},
+        {"collection": "action_logs", "filter": {"group_id": 0, "created_at": {"$gte": datetime(1970, 1, 1)}}},
+        {"collection": "action_logs", "filter": {"group_id": 0, "user_id": 0}, "sort": [("created_at", DESCENDING)]},
+        {"collection": "retention_users", "filter": {"group_id": 0, "user_id": 0}},
+        {"collection": "retention_cohorts", "filter": {"group_id": 0, "cohort_week": {"$gt": 0}}, "sort": [("cohort_week", ASCENDING)]},
+    ]
+    
+    # Plan stages that mean a full scan or a blocking in-memory sort
+    FLAGGED_STAGES = {"COLLSCAN": "collection scan", "SORT": "in-memory sort"}
+    
+    @staticmethod
+    def _database_for(db: AsyncIOMotorDatabase, collection_name: str) -> AsyncIOMotorDatabase:
+        """Database actually holding a collection (see COLLECTION_DATABASES)"""
+        name = DatabaseIndexManager.COLLECTION_DATABASES.get(collection_name)
+        return db.client[name] if name else db
+    
+    @staticmethod
+    async def _merge_duplicate_violations(collection) -> int:
+        """
+        Fold duplicate (user_id, group_id) violation rows into one so the
+        unique index the atomic upsert relies on can be built
+        """
+        merged = 0
+        duplicates = collection.aggregate([
+            {"$group": {"_id": {"user_id": "$user_id", "group_id": "$group_id"},
+                        "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ], allowDiskUse=True)
+        async for row in duplicates:
+            docs = await collection.find({"_id": {"$in": row["ids"]}}).to_list(None)
+            docs.sort(key=lambda doc: doc.get("created_at") or datetime.min)
+            keep, extra = docs[0], docs[1:]
+            limit = max(len(doc.get("violations") or []) for doc in docs)
+            violations = sorted(
+                (v for doc in docs for v in doc.get("violations") or []),
+                key=lambda v: v.get("timestamp") or datetime.min,
+            )
+            last_times = [doc["last_violation_time"] for doc in docs if doc.get("last_violation_time")]
+            await collection.update_one({"_id": keep["_id"]}, {"$set": {
+                "violation_count": sum(doc.get("violation_count", 0) for doc in docs),
+                "violations": violations[-limit:] if limit else [],
+                "last_violation_time": max(last_times) if last_times else None,
+                "updated_at": datetime.utcnow(),
+            }})
+            await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in extra]}})
+            merged += len(extra)
+        if merged:
+            logger.warning(f"Merged {merged} duplicate user_violations rows")
+        return merged
+    
+    # Run before a collection's indexes are created (e.g. dedupe for a unique index)
+    PRE_INDEX_MIGRATIONS = {
+        "user_violations": "_merge_duplicate_violations",
     }
     
     @staticmethod
     async def create_indexes(db: AsyncIOMotorDatabase):
         """Create all indexes asynchronously"""
         for collection_name, indexes in DatabaseIndexManager.INDEXES.items():
-            collection = db[collection_name]
+            collection = DatabaseIndexManager._database_for(db, collection_name)[collection_name]
+            migration = DatabaseIndexManager.PRE_INDEX_MIGRATIONS.get(collection_name)
+            if migration is not None:
+                try:
+                    await getattr(DatabaseIndexManager, migration)(collection)
+                except Exception as e:
+                    logger.error(f"Index migration failed: {collection_name} - {e}")
             for index_spec in indexes:
                 try:
                     await collection.create_index(
@@ -74,7 +236,87 @@ class DatabaseIndexManager:
                     )
                     logger.info(f"✅ Index created: {collection_name}.{index_spec.get('name', 'auto')}")
                 except Exception as e:
-                    logger.warning(f"Index creation: {collection_name} - {e}")
+                    if index_spec.get("unique"):
+                        # Writes that rely on this index for atomic upserts are unsafe without it
+                        logger.error(f"❌ Unique index creation failed: {collection_name} - {e}")
+                    else:
+                        logger.warning(f"Index creation: {collection_name} - {e}")
+    
+    @staticmethod
+    def _plan_stages(plan: Any) -> List[str]:
+        """All stage names in an explain plan tree (classic and SBE layouts)"""
+        stages = []
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            for key in ("inputStage", "queryPlan", "winningPlan"):
+                if key in plan:
+                    stages.extend(DatabaseIndexManager._plan_stages(plan[key]))
+            for child in plan.get("inputStages", []):
+                stages.extend(DatabaseIndexManager._plan_stages(child))
+        return stages
+    
+    @staticmethod
+    def _index_names(plan: Any) -> List[str]:
+        names = []
+        if isinstance(plan, dict):
+            if plan.get("indexName"):
+                names.append(plan["indexName"])
+            for key in ("inputStage", "queryPlan", "winningPlan"):
+                if key in plan:
+                    names.extend(DatabaseIndexManager._index_names(plan[key]))
+            for child in plan.get("inputStages", []):
+                names.extend(DatabaseIndexManager._index_names(child))
+        return names
+    
+    @staticmethod
+    async def audit_query_plans(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        """
+        Explain every registered query shape and flag collection scans,
+        in-memory sorts and missing collections
+        """
+        results = []
+        existing: Dict[str, set] = {}
+        for shape in DatabaseIndexManager.QUERY_SHAPES:
+            shape_db = DatabaseIndexManager._database_for(db, shape["collection"])
+            command = {"find": shape["collection"], "filter": shape["filter"], "limit": 20}
+            if shape.get("sort"):
+                command["sort"] = dict(shape["sort"])
+            entry = {
+                "collection": shape["collection"],
+                "filter": {key: "?" for key in shape["filter"]},
+                "sort": [field for field, _ in shape.get("sort", [])],
+            }
+            try:
+                if shape_db.name not in existing:
+                    existing[shape_db.name] = set(await shape_db.list_collection_names())
+                if shape["collection"] not in existing[shape_db.name]:
+                    # Explain on a missing collection is an EOF plan, not a pass
+                    entry["stages"], entry["indexes"] = [], []
+                    entry["issues"] = [f"collection missing in {shape_db.name}"]
+                else:
+                    explain = await shape_db.command("explain", command, verbosity="queryPlanner")
+                    winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+                    stages = DatabaseIndexManager._plan_stages(winning)
+                    entry["stages"] = stages
+                    entry["indexes"] = DatabaseIndexManager._index_names(winning)
+                    entry["issues"] = [
+                        DatabaseIndexManager.FLAGGED_STAGES[stage]
+                        for stage in stages if stage in DatabaseIndexManager.FLAGGED_STAGES
+                    ]
+            except Exception as e:
+                entry["stages"], entry["indexes"] = [], []
+                entry["issues"] = [f"explain failed: {e}"]
+            entry["ok"] = not entry["issues"]
+            results.append(entry)
+        
+        flagged = [entry for entry in results if not entry["ok"]]
+        return {
+            "checked": len(results),
+            "flagged": len(flagged),
+            "ok": not flagged,
+            "shapes": results,
+        }
 
 
 class AdvancedDatabaseManager:
@@ -91,6 +333,8 @@ class AdvancedDatabaseManager:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.retention = RetentionCohortTracker(db)
+        self.counts = get_count_cache()
     
     async def initialize(self):
         """Initialize database (create indexes)"""
@@ -115,6 +359,7 @@ class AdvancedDatabaseManager:
             })
             
             result = await self.db.groups.insert_one(group_data)
+            self.counts.note_insert(self.db.groups, group_data)
             return str(result.inserted_id)
         except DuplicateKeyError:
             return await self.update_group(group_data["group_id"], group_data)
@@ -127,24 +372,28 @@ class AdvancedDatabaseManager:
         return await self.db.groups.find_one({"group_id": group_id})
     
     async def get_groups(self, page: int = 1, per_page: int = 20, 
-                        active_only: bool = True) -> Dict[str, Any]:
-        """Get paginated groups"""
+                        active_only: bool = True, cursor: Optional[str] = None,
+                        count: str = "cached") -> Dict[str, Any]:
+        """
+        Get paginated groups (pass `cursor` from the previous page for keyset
+        paging; `count` is the total's count strategy, see shared.counts)
+        """
         query = {"is_active": True} if active_only else {}
-        total = await self.db.groups.count_documents(query)
-        skip = (page - 1) * per_page
+        total = await self.counts.count(self.db.groups, query, count)
         
-        groups = await self.db.groups.find(query)\
-            .sort("updated_at", DESCENDING)\
-            .skip(skip)\
-            .limit(per_page)\
-            .to_list(per_page)
+        groups, next_cursor = await fetch_page(
+            self.db.groups, query, [("updated_at", DESCENDING)], per_page,
+            cursor=cursor, skip=(page - 1) * per_page
+        )
         
         return {
             "items": groups,
             "total": total,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page
+            "pages": (total + per_page - 1) // per_page if total is not None else None,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
         }
     
     async def update_group(self, group_id: int, updates: Dict[str, Any]) -> str:
@@ -163,6 +412,8 @@ class AdvancedDatabaseManager:
             {"group_id": group_id},
             {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
         )
+        if result.modified_count:
+            self.counts.invalidate(self.db.groups)
         return result.modified_count > 0
     
     # ========================================================================
@@ -180,6 +431,7 @@ class AdvancedDatabaseManager:
             })
             
             result = await self.db.users.insert_one(user_data)
+            self.counts.note_insert(self.db.users, user_data)
             return str(result.inserted_id)
         except DuplicateKeyError:
             # User already exists, update
@@ -196,23 +448,24 @@ class AdvancedDatabaseManager:
         })
     
     async def get_group_users(self, group_id: int, page: int = 1, 
-                             per_page: int = 50) -> Dict[str, Any]:
-        """Get all users in group (paginated)"""
-        total = await self.db.users.count_documents({"group_id": group_id})
-        skip = (page - 1) * per_page
+                             per_page: int = 50, cursor: Optional[str] = None,
+                             count: str = "cached") -> Dict[str, Any]:
+        """Get all users in group (paginated, keyset when `cursor` is given)"""
+        total = await self.counts.count(self.db.users, {"group_id": group_id}, count)
         
-        users = await self.db.users.find({"group_id": group_id})\
-            .sort("role", ASCENDING)\
-            .skip(skip)\
-            .limit(per_page)\
-            .to_list(per_page)
+        users, next_cursor = await fetch_page(
+            self.db.users, {"group_id": group_id}, [("role", ASCENDING)], per_page,
+            cursor=cursor, skip=(page - 1) * per_page
+        )
         
         return {
             "items": users,
             "total": total,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page
+            "pages": (total + per_page - 1) // per_page if total is not None else None,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
         }
     
     async def update_user(self, group_id: int, user_id: int, 
@@ -350,26 +603,36 @@ class AdvancedDatabaseManager:
         })
         
         result = await self.db.actions.insert_one(action_data)
+        self.counts.note_insert(self.db.actions, action_data)
+        
+        try:
+            await self.retention.record(
+                action_data.get("group_id"), action_data.get("user_id"), action_data["created_at"]
+            )
+        except Exception as e:
+            self.logger.warning(f"Retention cohort update failed: {e}")
+        
         return str(result.inserted_id)
     
     async def get_group_actions(self, group_id: int, page: int = 1, 
-                               per_page: int = 50) -> Dict[str, Any]:
-        """Get actions for group (paginated)"""
-        total = await self.db.actions.count_documents({"group_id": group_id})
-        skip = (page - 1) * per_page
+                               per_page: int = 50, cursor: Optional[str] = None,
+                               count: str = "cached") -> Dict[str, Any]:
+        """Get actions for group, newest first (paginated, keyset when `cursor` is given)"""
+        total = await self.counts.count(self.db.actions, {"group_id": group_id}, count)
         
-        actions = await self.db.actions.find({"group_id": group_id})\
-            .sort("created_at", DESCENDING)\
-            .skip(skip)\
-            .limit(per_page)\
-            .to_list(per_page)
+        actions, next_cursor = await fetch_page(
+            self.db.actions, {"group_id": group_id}, [("created_at", DESCENDING)], per_page,
+            cursor=cursor, skip=(page - 1) * per_page
+        )
         
         return {
             "items": actions,
             "total": total,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page
+            "pages": (total + per_page - 1) // per_page if total is not None else None,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
         }
     
     # ========================================================================
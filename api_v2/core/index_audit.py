@@ -0,0 +1,51 @@
+"""
+Index Audit - Query-plan check for the registered api_v2 query shapes
+
+Usage:
+    python -m api_v2.core.index_audit [--uri mongodb://...] [--db bot_manager] [--create-indexes]
+
+Exits non-zero when any shape is served by a collection scan or an
+in-memory sort, or its collection does not exist, so it can gate
+deployments and CI.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from api_v2.core.database import DatabaseIndexManager
+
+
+async def run(uri: str, db_name: str, create_indexes: bool) -> int:
+    client = AsyncIOMotorClient(uri, serverSelectionTimeoutMS=5000)
+    try:
+        db = client[db_name]
+        if create_indexes:
+            await DatabaseIndexManager.create_indexes(db)
+        report = await DatabaseIndexManager.audit_query_plans(db)
+    finally:
+        client.close()
+
+    for shape in report["shapes"]:
+        status = "ok  " if shape["ok"] else "FLAG"
+        sort = f" sort={shape['sort']}" if shape["sort"] else ""
+        detail = ", ".join(shape["issues"]) or ", ".join(shape["indexes"]) or "-"
+        print(f"{status} {shape['collection']} {list(shape['filter'])}{sort}: {detail}")
+    print(f"\n{report['checked']} shapes checked, {report['flagged']} flagged")
+    return 0 if report["ok"] else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain registered query shapes and flag scans/sorts")
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default=os.getenv("MONGODB_DB", "bot_manager"))
+    parser.add_argument("--create-indexes", action="store_true", help="Create declared indexes first")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.uri, args.db, args.create_indexes)))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,35 @@ Advanced Analytics Engine for Bot Management
 Real-time metrics, trends, predictions, and insights
 """
 
+import asyncio
 import logging
+import time as time_module
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from enum import Enum
 from pydantic import BaseModel
 import statistics
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+
+from api_v2.services.retention import RetentionCohortTracker
 
 logger = logging.getLogger(__name__)
 
+# Health score memo TTL (seconds) - older values are served while refreshing
+HEALTH_TTL = 300
+
+# Background refresh of materialized health scores
+HEALTH_REFRESH_INTERVAL = 600  # seconds
+HEALTH_REFRESH_CONCURRENCY = 4
+MAX_TRACKED_HEALTH_GROUPS = 10_000
+# Only groups requested within this window (seconds) are refreshed
+HEALTH_RECENT_WINDOW = 3600
+
+# Retention window used by the health score (retention endpoint is unbounded)
+HEALTH_RETENTION_LOOKBACK_DAYS = 90
+
+HEALTH_COLLECTION = "group_health_scores"
+
 
 # ============================================================================
 # MODELS
@@ -70,6 +89,14 @@ class AnalyticsEngine:
     def __init__(self, db_manager):
         self.db = db_manager
         self.metrics_cache = defaultdict(list)
+        self.retention = getattr(db_manager, "retention", None) or RetentionCohortTracker(db_manager.db)
+        
+        # Health score memo: group_id -> (computed_at, report)
+        self._health_memo: Dict[int, Tuple[float, InsightReport]] = {}
+        self._health_refreshing: Dict[int, asyncio.Task] = {}
+        # Groups whose materialized score is kept fresh (LRU by last request)
+        self._health_groups: "OrderedDict[int, float]" = OrderedDict()
+        self._health_refresher: Optional[asyncio.Task] = None
         
     async def calculate_daily_active_users(
         self, 
@@ -135,44 +162,26 @@ class AnalyticsEngine:
     async def calculate_retention_rate(
         self,
         group_id: int,
-        cohort_days: int = 7
+        cohort_days: int = 7,
+        lookback_days: Optional[int] = None
     ) -> Dict[str, float]:
-        """Calculate user retention cohort analysis"""
-        pipeline = [
-            {
-                "$match": {"group_id": group_id}
-            },
-            {
-                "$group": {
-                    "_id": "$user_id",
-                    "first_action": {"$min": "$timestamp"},
-                    "last_action": {"$max": "$timestamp"},
-                    "action_count": {"$sum": 1}
-                }
-            }
-        ]
-        
-        users = await self.db.aggregate_actions(pipeline)
-        
-        # Cohort analysis
-        cohorts = defaultdict(list)
-        for user in users:
-            first_week = user["first_action"].isocalendar()[1]
-            cohorts[first_week].append(user)
-        
-        retention = {}
-        for week, cohort_users in cohorts.items():
-            # Users still active after cohort_days
-            still_active = sum(
-                1 for u in cohort_users
-                if (u["last_action"] - u["first_action"]).days >= cohort_days
-            )
-            retention[f"week_{week}"] = (
-                still_active / len(cohort_users) * 100
-                if cohort_users else 0
-            )
+        """
+        Calculate user retention cohort analysis
         
-        return retention
+        Read from incrementally maintained weekly cohorts (one document per
+        cohort), covering the last year or `lookback_days`.
+        """
+        cohorts = max(1, lookback_days // 7) if lookback_days else 52
+        return await self.retention.retention_rates(group_id, cohort_days, cohorts=cohorts)
+    
+    async def calculate_retention_matrix(
+        self,
+        group_id: int,
+        cohorts: int = 12,
+        weeks: int = 12
+    ) -> Dict[str, Any]:
+        """Weekly cohort x week-offset retention matrix (percent)"""
+        return await self.retention.retention_matrix(group_id, cohorts, weeks)
     
     async def calculate_moderation_effectiveness(
         self,
@@ -217,6 +226,54 @@ class AnalyticsEngine:
     async def get_group_health_score(
         self,
         group_id: int
+    ) -> InsightReport:
+        """
+        Group health (0-100), answered from the memo or materialized document
+        
+        Values older than HEALTH_TTL are still returned but trigger a
+        background refresh; only a group with no stored score at all waits
+        for the aggregations.
+        """
+        self._track_health_group(group_id)
+        self.start_health_refresher()
+        
+        memo = self._health_memo.get(group_id)
+        if memo and time_module.time() - memo[0] < HEALTH_TTL:
+            return memo[1]
+        
+        if memo is None:
+            stored = await self._load_health_score(group_id)
+            if stored:
+                memo = self._health_memo[group_id] = stored
+        
+        if memo:
+            if time_module.time() - memo[0] >= HEALTH_TTL:
+                self._refresh_health_in_background(group_id)
+            return memo[1]
+        
+        # Shield so one cancelled caller does not cancel the shared refresh
+        return await asyncio.shield(self._refresh_health_in_background(group_id))
+    
+    async def refresh_group_health_score(self, group_id: int) -> InsightReport:
+        """Recompute a group's health score and materialize it"""
+        report = await self.compute_group_health_score(group_id)
+        computed_at = time_module.time()
+        self._health_memo[group_id] = (computed_at, report)
+        
+        try:
+            await self.db.db[HEALTH_COLLECTION].update_one(
+                {"group_id": group_id},
+                {"$set": dict(report.dict(), computed_at=computed_at)},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Could not store health score for group {group_id}: {e}")
+        
+        return report
+    
+    async def compute_group_health_score(
+        self,
+        group_id: int
     ) -> InsightReport:
         """
         Calculate overall group health (0-100)
@@ -227,10 +284,13 @@ class AnalyticsEngine:
         - Admin activity
         """
         
-        # Gather metrics
-        dau = await self.calculate_daily_active_users(group_id, days=7)
-        retention = await self.calculate_retention_rate(group_id)
-        moderation = await self.calculate_moderation_effectiveness(group_id)
+        # Independent aggregations run concurrently
+        dau, retention, moderation, violation_count = await asyncio.gather(
+            self.calculate_daily_active_users(group_id, days=7),
+            self.calculate_retention_rate(group_id, lookback_days=HEALTH_RETENTION_LOOKBACK_DAYS),
+            self.calculate_moderation_effectiveness(group_id),
+            self._count_rule_violations(group_id)
+        )
         
         # Calculate health components
         retention_score = (
@@ -239,20 +299,6 @@ class AnalyticsEngine:
         )
         
         # Rule violations score (inverse)
-        violations_pipeline = [
-            {
-                "$match": {
-                    "group_id": group_id,
-                    "rule_violated": True
-                }
-            },
-            {"$count": "total"}
-        ]
-        violation_result = await self.db.aggregate_actions(violations_pipeline)
-        violation_count = (
-            violation_result[0]["total"]
-            if violation_result else 0
-        )
         violations_score = max(0, 100 - min(violation_count / 10, 50))
         
         # Admin activity score
@@ -288,6 +334,101 @@ class AnalyticsEngine:
             health_score=health_score
         )
     
+    async def _count_rule_violations(self, group_id: int) -> int:
+        """Count actions flagged as rule violations"""
+        violations_pipeline = [
+            {
+                "$match": {
+                    "group_id": group_id,
+                    "rule_violated": True
+                }
+            },
+            {"$count": "total"}
+        ]
+        violation_result = await self.db.aggregate_actions(violations_pipeline)
+        return (
+            violation_result[0]["total"]
+            if violation_result else 0
+        )
+    
+    # ========================================================================
+    # MATERIALIZED HEALTH SCORES
+    # ========================================================================
+    
+    def _track_health_group(self, group_id: int):
+        self._health_groups[group_id] = time_module.time()
+        self._health_groups.move_to_end(group_id)
+        while len(self._health_groups) > MAX_TRACKED_HEALTH_GROUPS:
+            evicted, _ = self._health_groups.popitem(last=False)
+            self._health_memo.pop(evicted, None)
+    
+    def _evict_idle_health_groups(self, cutoff: float):
+        """Stop tracking groups not requested since cutoff (oldest first)"""
+        while self._health_groups:
+            group_id, requested_at = next(iter(self._health_groups.items()))
+            if requested_at >= cutoff:
+                break
+            self._health_groups.popitem(last=False)
+            self._health_memo.pop(group_id, None)
+    
+    async def _load_health_score(self, group_id: int) -> Optional[Tuple[float, InsightReport]]:
+        """Read the materialized score document, if any"""
+        try:
+            doc = await self.db.db[HEALTH_COLLECTION].find_one({"group_id": group_id}, {"_id": 0})
+        except Exception as e:
+            logger.warning(f"Could not load health score for group {group_id}: {e}")
+            return None
+        if not doc:
+            return None
+        computed_at = doc.pop("computed_at", 0)
+        return computed_at, InsightReport(**doc)
+    
+    def _refresh_health_in_background(self, group_id: int) -> "asyncio.Task":
+        """Start (or join) a single refresh per group"""
+        task = self._health_refreshing.get(group_id)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self.refresh_group_health_score(group_id))
+            self._health_refreshing[group_id] = task
+            task.add_done_callback(lambda done: self._health_refreshing.pop(group_id, None)
+                                   if self._health_refreshing.get(group_id) is done else None)
+        return task
+    
+    async def _run_health_refresher(self, interval: float):
+        semaphore = asyncio.Semaphore(HEALTH_REFRESH_CONCURRENCY)
+        
+        async def refresh(group_id: int):
+            async with semaphore:
+                try:
+                    await self._refresh_health_in_background(group_id)
+                except Exception as e:
+                    logger.warning(f"Health refresh failed for group {group_id}: {e}")
+        
+        while True:
+            await asyncio.sleep(interval)
+            now = time_module.time()
+            self._evict_idle_health_groups(now - HEALTH_RECENT_WINDOW)
+            stale = [
+                group_id for group_id in list(self._health_groups)
+                if now - self._health_memo.get(group_id, (0, None))[0] >= interval
+            ]
+            if stale:
+                await asyncio.gather(*(refresh(group_id) for group_id in stale))
+    
+    def start_health_refresher(self, interval: float = HEALTH_REFRESH_INTERVAL):
+        """Keep materialized scores of recently requested groups fresh"""
+        if self._health_refresher is None or self._health_refresher.done():
+            self._health_refresher = asyncio.create_task(self._run_health_refresher(interval))
+    
+    async def stop_health_refresher(self):
+        """Stop the background refresher"""
+        if self._health_refresher:
+            self._health_refresher.cancel()
+            try:
+                await self._health_refresher
+            except asyncio.CancelledError:
+                pass
+            self._health_refresher = None
+    
     def _calculate_trend(self, values: List[float]) -> str:
         """Determine if trend is up, down, or stable"""
         if len(values) < 2:
@@ -10,6 +10,8 @@ import uuid
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 
+from pymongo import DESCENDING, ReturnDocument
+
 from api_v2.models.enforcement import (
     ActionType, ActionStatus, EnforcementLevel, EnforcementReason,
     EscalationPolicy, EnforcementAction, ActionResponse, ActionLog,
@@ -18,9 +20,14 @@ from api_v2.models.enforcement import (
 )
 from api_v2.core.database import AdvancedDatabaseManager, get_db_manager
 from api_v2.telegram import TelegramAPIWrapper
+from shared.batch_runner import BatchRun, BatchRunner, ChatPacer, retry_after_seconds
 
 logger = logging.getLogger(__name__)
 
+# Violations kept inline on the user_violations document (newest last);
+# the full history lives in the append-only violation_history collection
+RECENT_VIOLATIONS_LIMIT = 20
+
 
 class EnforcementEngine:
     """
@@ -39,7 +46,12 @@ class EnforcementEngine:
             'base': 1,
             'max_retries': 3,
             'max_backoff': 60,
+            'max_flood_waits': 5,
         }
+        # Per-chat pacing shared by single and batch actions, and the
+        # registry of running/resumable batches
+        self.pacer = ChatPacer()
+        self.batches = BatchRunner()
 
     # ========================================================================
     # ACTION EXECUTION
@@ -50,12 +62,14 @@ class EnforcementEngine:
         action_id = str(uuid.uuid4())
         start_time = datetime.utcnow()
         retry_count = 0
+        flood_waits = 0
         last_error = None
 
         try:
             # Attempt execution with retries
             while retry_count <= self.retry_config['max_retries']:
                 try:
+                    await self.pacer.wait(action.group_id)
                     result = await self._execute_action_internal(action)
                     
                     execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
@@ -91,6 +105,15 @@ class EnforcementEngine:
 
                 except Exception as e:
                     last_error = e
+
+                    # Telegram flood control: wait exactly as long as asked
+                    # (pacer.wait holds the retry) without spending a retry
+                    flood_wait = retry_after_seconds(e)
+                    if flood_wait is not None and flood_waits < self.retry_config['max_flood_waits']:
+                        flood_waits += 1
+                        self.pacer.defer(action.group_id, flood_wait)
+                        continue
+
                     retry_count += 1
 
                     if retry_count <= self.retry_config['max_retries']:
@@ -388,50 +411,41 @@ class EnforcementEngine:
     # BATCH OPERATIONS
     # ========================================================================
 
-    async def execute_batch(self, batch_request) -> BatchActionResponse:
-        """Execute multiple actions"""
-        batch_id = str(uuid.uuid4())
-        start_time = datetime.utcnow()
-        results = []
-        successful = 0
-        failed = 0
-
-        if batch_request.execute_concurrently:
-            # Execute concurrently
-            tasks = [self.execute_action(action) for action in batch_request.actions]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-        else:
-            # Execute sequentially
-            for action in batch_request.actions:
-                try:
-                    result = await self.execute_action(action)
-                    results.append(result)
-                    if batch_request.stop_on_error and not result.success:
-                        break
-                except Exception as e:
-                    logger.error(f"Error in batch action: {e}")
-                    if batch_request.stop_on_error:
-                        break
-
-        # Count results
-        for result in results:
-            if isinstance(result, ActionResponse):
-                if result.success:
-                    successful += 1
-                else:
-                    failed += 1
-
-        execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+    def submit_batch(self, batch_request) -> BatchRun:
+        """
+        Start a batch in the background and return its run
+
+        At most `concurrency` actions are in flight (1 when not executing
+        concurrently); progress is available through `self.batches`.
+        """
+        concurrency = 1 if not batch_request.execute_concurrently else batch_request.concurrency
+        return self.batches.submit(
+            batch_request.actions,
+            self.execute_action,
+            is_success=lambda result: result.success,
+            serialize=lambda result: result.model_dump(mode="json"),
+            concurrency=concurrency,
+            stop_on_error=batch_request.stop_on_error,
+            metadata={"group_id": batch_request.actions[0].group_id if batch_request.actions else None},
+        )
 
+    def batch_response(self, run: BatchRun) -> BatchActionResponse:
+        """Summarize a batch run (completed items only)"""
         return BatchActionResponse(
-            batch_id=batch_id,
-            total_actions=len(batch_request.actions),
-            successful=successful,
-            failed=failed,
-            results=results,
-            execution_time_ms=execution_time
+            batch_id=run.batch_id,
+            total_actions=run.total,
+            successful=run.successful,
+            failed=run.failed,
+            results=[result for result in run.results if isinstance(result, ActionResponse)],
+            execution_time_ms=run.summary()["elapsed_ms"]
         )
 
+    async def execute_batch(self, batch_request) -> BatchActionResponse:
+        """Execute multiple actions and wait for the batch to finish"""
+        run = self.submit_batch(batch_request)
+        await self.batches.wait(run.batch_id)
+        return self.batch_response(run)
+
     # ========================================================================
     # VIOLATION TRACKING & ESCALATION
     # ========================================================================
@@ -447,47 +461,42 @@ class EnforcementEngine:
         """Track user violation and apply escalation if needed"""
         try:
             collection = self.db_manager.db['user_violations']
-            
-            # Get or create violation record
-            violation_record = await collection.find_one({
-                'user_id': user_id,
-                'group_id': group_id
-            })
-
-            if not violation_record:
-                violation_record = {
-                    'user_id': user_id,
-                    'group_id': group_id,
-                    'violation_count': 0,
-                    'violations': [],
-                    'current_level': EnforcementLevel.WARNING,
-                    'escalation_policy': EscalationPolicy.ACCUMULATE,
-                    'created_at': datetime.utcnow(),
-                    'updated_at': datetime.utcnow()
-                }
-
-            # Add violation
-            violation_record['violation_count'] += 1
-            violation_record['violations'].append({
+            now = datetime.utcnow()
+            violation = {
                 'type': violation_type,
                 'reason': reason,
-                'timestamp': datetime.utcnow()
-            })
-            violation_record['last_violation_time'] = datetime.utcnow()
-            violation_record['updated_at'] = datetime.utcnow()
+                'timestamp': now
+            }
 
-            # Update in database
-            await collection.update_one(
+            # Single atomic update: counter, capped recent history, metadata
+            violation_record = await collection.find_one_and_update(
                 {'user_id': user_id, 'group_id': group_id},
-                {'$set': violation_record},
-                upsert=True
+                {
+                    '$inc': {'violation_count': 1},
+                    '$push': {'violations': {'$each': [violation], '$slice': -RECENT_VIOLATIONS_LIMIT}},
+                    '$set': {'last_violation_time': now, 'updated_at': now},
+                    '$setOnInsert': {
+                        'current_level': EnforcementLevel.WARNING,
+                        'escalation_policy': EscalationPolicy.ACCUMULATE,
+                        'created_at': now
+                    }
+                },
+                projection={'_id': 0, 'violation_count': 1, 'current_level': 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+
+            # Full history is append-only
+            await self.db_manager.db['violation_history'].insert_one(
+                dict(violation, user_id=user_id, group_id=group_id)
             )
 
-            # Apply escalation if enabled
-            if escalate and violation_record['violation_count'] % 3 == 0:
+            # Apply escalation if enabled (decided on the counter this update produced)
+            count = violation_record['violation_count']
+            if escalate and count % 3 == 0:
                 await self._apply_escalation(user_id, group_id, violation_record)
 
-            logger.info(f"Violation tracked for user {user_id}: count={violation_record['violation_count']}")
+            logger.info(f"Violation tracked for user {user_id}: count={count}")
 
         except Exception as e:
             logger.error(f"Error tracking violation: {e}")
@@ -529,7 +538,10 @@ class EnforcementEngine:
         """Get user violation history"""
         try:
             collection = self.db_manager.db['user_violations']
-            record = await collection.find_one({'user_id': user_id, 'group_id': group_id})
+            record = await collection.find_one(
+                {'user_id': user_id, 'group_id': group_id},
+                {'_id': 0, 'violation_count': 1, 'current_level': 1, 'violations': {'$slice': -5}}
+            )
 
             if not record:
                 return UserEnforcementHistory(
@@ -542,7 +554,7 @@ class EnforcementEngine:
                     is_banned=False
                 )
 
-            recent = record.get('violations', [])[-5:]  # Last 5 violations
+            recent = record.get('violations', [])  # Last 5 violations (projected)
 
             return UserEnforcementHistory(
                 user_id=user_id,
@@ -566,6 +578,21 @@ class EnforcementEngine:
                 is_banned=False
             )
 
+    async def get_violation_history(
+        self,
+        user_id: int,
+        group_id: int,
+        limit: int = 50,
+        before: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Get full violation history, newest first (paginate with `before`)"""
+        query: Dict[str, Any] = {'user_id': user_id, 'group_id': group_id}
+        if before:
+            query['timestamp'] = {'$lt': before}
+        return await self.db_manager.db['violation_history'].find(
+            query, {'_id': 0, 'type': 1, 'reason': 1, 'timestamp': 1}
+        ).sort('timestamp', DESCENDING).limit(limit).to_list(limit)
+
     # ========================================================================
     # STATISTICS
     # ========================================================================
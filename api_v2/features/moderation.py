@@ -5,13 +5,31 @@ Machine learning-based text analysis and content filtering
 
 import logging
 import re
+from collections import Counter, OrderedDict
 from typing import Dict, List, Tuple, Optional, Any
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 import hashlib
 
+from api_v2.services.content_matcher import AhoCorasick
+from api_v2.services.duplicate_detector import DuplicateDetector
+from api_v2.services.write_behind import WriteBehindBuffer
+
 logger = logging.getLogger(__name__)
 
+# Batch analysis limit per call
+MAX_BATCH_SIZE = 1000
+
+# Bound on in-process behavior profiles (least recently used are evicted)
+MAX_CACHED_PROFILES = 10_000
+
+# Moderation result write-behind settings
+RESULTS_FLUSH_BATCH_SIZE = 500
+RESULTS_FLUSH_INTERVAL = 1.0  # seconds
+RESULTS_MAX_PENDING = 20_000
+
 
 # ============================================================================
 # MODELS & ENUMS
@@ -54,6 +72,18 @@ class ModerationResult(BaseModel):
     hash: str  # For deduplication
 
 
+class ModerationBatchItem(BaseModel):
+    """Single message in a batch analysis request"""
+    message_id: int
+    user_id: int
+    content: str
+
+
+class ModerationBatchRequest(BaseModel):
+    """Batch analysis request"""
+    messages: List[ModerationBatchItem] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
 class UserBehaviorProfile(BaseModel):
     """User behavior analysis profile"""
     user_id: int
@@ -81,11 +111,32 @@ class ModerationEngine:
         # Content filters
         self.spam_keywords = self._load_spam_keywords()
         self.profanity_keywords = self._load_profanity_keywords()
+        self.adult_keywords = self._load_adult_keywords()
+        self.suspicious_domains = self._load_suspicious_domains()
+        self.hate_patterns = self._load_hate_patterns()
+        self.harassment_patterns = self._load_harassment_patterns()
+        self.phishing_regexes = self._load_phishing_regexes()
         self.toxic_patterns = self._load_toxic_patterns()
         self.phishing_patterns = self._load_phishing_patterns()
         
-        # User behavior cache
-        self.user_profiles: Dict[int, UserBehaviorProfile] = {}
+        # Compiled once: one keyword automaton, precompiled regex families
+        self._compile_rules()
+        
+        # User behavior cache, keyed by (group_id, user_id)
+        self.user_profiles: "OrderedDict[Tuple[int, int], UserBehaviorProfile]" = OrderedDict()
+        self.profile_evictions = 0
+        
+        # Rolling exact/near-duplicate detector (in memory, per group)
+        self.duplicates = DuplicateDetector()
+        
+        # Results are persisted in the background, never on the request path
+        self.results_buffer = WriteBehindBuffer(
+            self._write_results,
+            name="moderation_results",
+            batch_size=RESULTS_FLUSH_BATCH_SIZE,
+            flush_interval=RESULTS_FLUSH_INTERVAL,
+            max_pending=RESULTS_MAX_PENDING
+        )
     
     async def analyze_message(
         self,
@@ -98,46 +149,90 @@ class ModerationEngine:
         Comprehensive message analysis
         Returns moderation result with severity and recommended action
         """
+        results = await self.analyze_batch(group_id, [
+            {"message_id": message_id, "user_id": user_id, "content": content}
+        ])
+        return results[0]
+    
+    async def analyze_batch(
+        self,
+        group_id: int,
+        messages: List[Dict[str, Any]]
+    ) -> List[ModerationResult]:
+        """
+        Analyze many messages in one call
+        
+        Each message is scored in a single pass. Verdicts are returned
+        immediately; results and profile counters are queued and written
+        in bulk by the write-behind buffer.
+        
+        Args:
+            group_id: Group the messages belong to
+            messages: Dicts (or models) with message_id, user_id, content
+        """
+        results = []
+        for message in messages:
+            if hasattr(message, "model_dump"):
+                message = message.model_dump()
+            result = self.score_message(
+                message["message_id"], message["user_id"], group_id, message["content"]
+            )
+            self._apply_to_profile(result)
+            self.duplicates.observe(
+                group_id, message["content"],
+                message_id=result.message_id, user_id=result.user_id, digest=result.hash
+            )
+            results.append(result)
+        
+        now = datetime.utcnow()
+        self.results_buffer.add_many(dict(result.dict(), timestamp=now) for result in results)
+        return results
+    
+    def score_message(
+        self,
+        message_id: int,
+        user_id: int,
+        group_id: int,
+        content: str
+    ) -> ModerationResult:
+        """Score one message without touching the database"""
         
         # Preprocess content
         processed_content = self._preprocess_text(content)
         
+        # Single pass over the text for every keyword-based signal
+        features = self._scan(processed_content)
+        
         # Check for various categories
         categories = []
         scores = {}
         
-        # Spam detection
-        spam_score = self._detect_spam(processed_content)
+        spam_score = self._detect_spam(processed_content, features)
         scores["spam"] = spam_score
         if spam_score > 0.6:
             categories.append(ContentCategory.SPAM)
         
-        # Profanity detection
-        profanity_score, profanity_keywords = self._detect_profanity(processed_content)
+        profanity_score, profanity_keywords = self._detect_profanity(processed_content, features)
         scores["profanity"] = profanity_score
         if profanity_score > 0.5:
             categories.append(ContentCategory.PROFANITY)
         
-        # Hate speech detection
-        hate_score = self._detect_hate_speech(processed_content)
+        hate_score = self._detect_hate_speech(processed_content, features)
         scores["hate_speech"] = hate_score
         if hate_score > 0.7:
             categories.append(ContentCategory.HATE_SPEECH)
         
-        # Harassment detection
-        harassment_score = self._detect_harassment(processed_content)
+        harassment_score = self._detect_harassment(processed_content, features)
         scores["harassment"] = harassment_score
         if harassment_score > 0.6:
             categories.append(ContentCategory.HARASSMENT)
         
-        # Phishing detection
-        phishing_score = self._detect_phishing(content)
+        phishing_score = self._detect_phishing(processed_content, features)
         scores["phishing"] = phishing_score
         if phishing_score > 0.8:
             categories.append(ContentCategory.PHISHING)
         
-        # Adult content detection
-        adult_score = self._detect_adult_content(processed_content)
+        adult_score = self._detect_adult_content(processed_content, features)
         scores["adult"] = adult_score
         if adult_score > 0.7:
             categories.append(ContentCategory.ADULT_CONTENT)
@@ -149,8 +244,7 @@ class ModerationEngine:
         # Determine suggested action
         suggested_action = self._get_suggested_action(severity, categories)
         
-        # Create result
-        result = ModerationResult(
+        return ModerationResult(
             message_id=message_id,
             user_id=user_id,
             group_id=group_id,
@@ -163,16 +257,6 @@ class ModerationEngine:
             flagged=severity in [ContentSeverity.HIGH, ContentSeverity.CRITICAL],
             hash=hashlib.md5(content.encode()).hexdigest()
         )
-        
-        # Update user profile
-        await self._update_user_profile(user_id, group_id, result)
-        
-        # Log to database
-        await self.db.db[self.db.db_name]["moderation_results"].insert_one(
-            result.dict()
-        )
-        
-        return result
     
     async def analyze_user_behavior(
         self,
@@ -250,7 +334,7 @@ class ModerationEngine:
             is_bot=is_bot
         )
         
-        self.user_profiles[user_id] = profile
+        self._remember_profile(group_id, user_id, profile)
         return profile
     
     async def detect_duplicate_content(
@@ -258,21 +342,25 @@ class ModerationEngine:
         group_id: int,
         content_hash: str
     ) -> Dict[str, Any]:
-        """Detect duplicate/spam messages"""
-        
-        # Look for recent messages with same hash
-        recent_messages = await self.db.db[self.db.db_name]["moderation_results"].find(
-            {
-                "group_id": group_id,
-                "hash": content_hash,
-                "timestamp": {"$gte": datetime.utcnow() - timedelta(hours=1)}
-            }
-        ).to_list(None)
+        """Detect duplicate/spam messages (analyzed in the last hour)"""
+        count = self.duplicates.count(group_id, content_hash)
         
         return {
-            "is_duplicate": len(recent_messages) > 0,
-            "duplicate_count": len(recent_messages),
-            "spam_score": min(len(recent_messages) * 0.3, 1.0)
+            "is_duplicate": count > 0,
+            "duplicate_count": count,
+            "spam_score": min(count * 0.3, 1.0)
+        }
+    
+    def get_duplicate_clusters(
+        self,
+        group_id: int,
+        min_size: int = 2,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """Near-duplicate message clusters (spam waves) in the last hour"""
+        return {
+            "clusters": self.duplicates.clusters(group_id, min_size=min_size, limit=limit),
+            **self.duplicates.stats(group_id)
         }
     
     def get_moderation_stats(self, group_id: int) -> Dict[str, Any]:
@@ -282,112 +370,121 @@ class ModerationEngine:
             "flagged": 0,
             "by_category": {},
             "by_severity": {},
-            "user_profiles_tracked": len(self.user_profiles)
+            "user_profiles_tracked": len(self.user_profiles),
+            "profile_evictions": self.profile_evictions,
+            "persistence": self.results_buffer.metrics()
         }
     
     # ========================================================================
     # DETECTION METHODS
     # ========================================================================
     
-    def _detect_spam(self, content: str) -> float:
+    def _compile_rules(self):
+        """Compile keyword lists and regex families once"""
+        self._keywords = AhoCorasick()
+        
+        def add(keyword: str, tag: Tuple[str, str]):
+            keyword = keyword.lower()
+            tags = self._keywords.payload(keyword)
+            if tags is None:
+                self._keywords.add(keyword, [tag])
+            else:
+                tags.append(tag)
+        
+        for keyword in self.spam_keywords:
+            add(keyword, ("spam", keyword))
+        for keyword in self.profanity_keywords:
+            add(keyword, ("profanity", keyword))
+        for keyword in self.adult_keywords:
+            add(keyword, ("adult", keyword))
+        for domain in self.suspicious_domains:
+            add(domain, ("suspicious_domain", domain))
+        add("http://", ("link", "http"))
+        add("https://", ("link", "https"))
+        
+        # Regex families only run when one of their trigger words occurs
+        self._regex_families: Dict[str, List[re.Pattern]] = {}
+        for family, (patterns, triggers) in (
+            ("hate_speech", self.hate_patterns),
+            ("harassment", self.harassment_patterns),
+            ("phishing", self.phishing_regexes),
+        ):
+            self._regex_families[family] = [re.compile(p, re.IGNORECASE) for p in patterns]
+            for trigger in triggers:
+                add(trigger, ("trigger", family))
+        
+        self._profanity_order = {k: i for i, k in enumerate(self.profanity_keywords)}
+        self._repeated_chars = re.compile(r'(.)\1{4,}')
+    
+    def _scan(self, content: str) -> Dict[str, Any]:
+        """One automaton pass collecting every keyword hit by category"""
+        found: Dict[str, set] = {
+            "spam": set(), "profanity": set(), "adult": set(),
+            "suspicious_domain": set(), "trigger": set(),
+        }
+        links = 0
+        for _, _, keyword in self._keywords.iter_matches(content):
+            for category, value in self._keywords.payload(keyword):
+                if category == "link":
+                    links += 1
+                else:
+                    found[category].add(value)
+        found["links"] = links
+        return found
+    
+    def _family_score(self, family: str, content: str, features: Dict[str, Any], weight: float) -> float:
+        if family not in features["trigger"]:
+            return 0.0
+        return sum(weight for pattern in self._regex_families[family] if pattern.search(content))
+    
+    def _detect_spam(self, content: str, features: Dict[str, Any]) -> float:
         """Detect spam content (0.0 - 1.0)"""
         score = 0.0
         
-        # Check for spam keywords
-        spam_count = sum(1 for keyword in self.spam_keywords if keyword in content)
-        score += min(spam_count * 0.1, 0.5)
+        # Spam keywords
+        score += min(len(features["spam"]) * 0.1, 0.5)
         
-        # Check for excessive links
-        links = len(re.findall(r'http[s]?://\S+', content))
-        if links > 2:
+        # Excessive links
+        if features["links"] > 2:
             score += 0.3
         
-        # Check for excessive uppercase
+        # Excessive uppercase
         if len(content) > 5:
-            uppercase_ratio = sum(1 for c in content if c.isupper()) / len(content)
+            uppercase_ratio = sum(map(str.isupper, content)) / len(content)
             if uppercase_ratio > 0.7:
                 score += 0.2
         
-        # Check for repeated characters
-        if re.search(r'(.)\1{4,}', content):
+        # Repeated characters
+        if self._repeated_chars.search(content):
             score += 0.2
         
         return min(score, 1.0)
     
-    def _detect_profanity(self, content: str) -> Tuple[float, List[str]]:
+    def _detect_profanity(self, content: str, features: Dict[str, Any]) -> Tuple[float, List[str]]:
         """Detect profanity (0.0 - 1.0) and return detected words"""
-        detected = []
-        score = 0.0
-        
-        for keyword in self.profanity_keywords:
-            if keyword in content:
-                detected.append(keyword)
-                score += 0.2
-        
-        return min(score, 1.0), detected
+        detected = sorted(features["profanity"], key=self._profanity_order.get)
+        return min(len(detected) * 0.2, 1.0), detected
     
-    def _detect_hate_speech(self, content: str) -> float:
+    def _detect_hate_speech(self, content: str, features: Dict[str, Any]) -> float:
         """Detect hate speech (0.0 - 1.0)"""
-        score = 0.0
-        
-        # Check for offensive patterns
-        offensive_patterns = [
-            r'\b(bad|terrible|awful)\s+(people|group|nation|race)\b',
-            r'(all|every)\s+(group|nation|race)\s+(is|are)',
-        ]
-        
-        for pattern in offensive_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                score += 0.3
-        
-        return min(score, 1.0)
+        return min(self._family_score("hate_speech", content, features, 0.3), 1.0)
     
-    def _detect_harassment(self, content: str) -> float:
+    def _detect_harassment(self, content: str, features: Dict[str, Any]) -> float:
         """Detect harassment (0.0 - 1.0)"""
-        score = 0.0
-        
-        # Check for threatening language
-        threats = [
-            r'(will|gonna|should|should)\s+(beat|hit|kill|hurt)',
-            r'go\s+(die|kill)\s+yourself',
-            r'you\s+(are|is)\s+(stupid|dumb|idiot)',
-        ]
-        
-        for threat in threats:
-            if re.search(threat, content, re.IGNORECASE):
-                score += 0.4
-        
-        return min(score, 1.0)
+        return min(self._family_score("harassment", content, features, 0.4), 1.0)
     
-    def _detect_phishing(self, content: str) -> float:
+    def _detect_phishing(self, content: str, features: Dict[str, Any]) -> float:
         """Detect phishing attempts (0.0 - 1.0)"""
-        score = 0.0
+        score = self._family_score("phishing", content, features, 0.3)
         
-        # Check for phishing patterns
-        phishing_patterns = [
-            r'(verify|confirm|update).*account',
-            r'click.*link.*(urgent|immediately)',
-            r'(password|credit card|bank).*required',
-        ]
-        
-        for pattern in phishing_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                score += 0.3
-        
-        # Check for suspicious URLs
-        suspicious_domains = ['bit.ly', 'tinyurl', 'short.link']
-        for domain in suspicious_domains:
-            if domain in content:
-                score += 0.2
+        # Suspicious URLs
+        score += len(features["suspicious_domain"]) * 0.2
         
         return min(score, 1.0)
     
-    def _detect_adult_content(self, content: str) -> float:
+    def _detect_adult_content(self, content: str, features: Dict[str, Any]) -> float:
         """Detect adult content (0.0 - 1.0)"""
-        # Simplified implementation
-        adult_keywords = ['xxx', 'porn', '18+', 'nude']
-        score = sum(0.25 for keyword in adult_keywords if keyword in content)
-        return min(score, 1.0)
+        return min(len(features["adult"]) * 0.25, 1.0)
     
     def _detect_bot_behavior(self, message_count: int, avg_length: float) -> bool:
         """Detect bot-like behavior"""
@@ -477,6 +574,37 @@ class ModerationEngine:
             # Add more as needed
         ]
     
+    def _load_adult_keywords(self) -> List[str]:
+        """Load adult content keywords"""
+        return ['xxx', 'porn', '18+', 'nude']
+    
+    def _load_suspicious_domains(self) -> List[str]:
+        """Load URL shortener/suspicious domains"""
+        return ['bit.ly', 'tinyurl', 'short.link']
+    
+    def _load_hate_patterns(self) -> Tuple[List[str], List[str]]:
+        """Load hate speech patterns and the words any match must contain"""
+        return [
+            r'\b(bad|terrible|awful)\s+(people|group|nation|race)\b',
+            r'(all|every)\s+(group|nation|race)\s+(is|are)',
+        ], ["people", "group", "nation", "race"]
+    
+    def _load_harassment_patterns(self) -> Tuple[List[str], List[str]]:
+        """Load threatening language patterns and their trigger words"""
+        return [
+            r'(will|gonna|should|should)\s+(beat|hit|kill|hurt)',
+            r'go\s+(die|kill)\s+yourself',
+            r'you\s+(are|is)\s+(stupid|dumb|idiot)',
+        ], ["beat", "hit", "kill", "hurt", "yourself", "stupid", "dumb", "idiot"]
+    
+    def _load_phishing_regexes(self) -> Tuple[List[str], List[str]]:
+        """Load phishing patterns and their trigger words"""
+        return [
+            r'(verify|confirm|update).*account',
+            r'click.*link.*(urgent|immediately)',
+            r'(password|credit card|bank).*required',
+        ], ["account", "urgent", "immediately", "required"]
+    
     def _load_toxic_patterns(self) -> List[str]:
         """Load toxic communication patterns"""
         return [
@@ -493,27 +621,55 @@ class ModerationEngine:
             "update payment information"
         ]
     
-    async def _update_user_profile(
-        self,
-        user_id: int,
-        group_id: int,
-        result: ModerationResult
-    ):
-        """Update user behavior profile based on moderation result"""
-        
-        if user_id in self.user_profiles:
-            profile = self.user_profiles[user_id]
+    def _remember_profile(self, group_id: int, user_id: int, profile: UserBehaviorProfile):
+        """Cache a profile, evicting the least recently used beyond the bound"""
+        key = (group_id, user_id)
+        self.user_profiles[key] = profile
+        self.user_profiles.move_to_end(key)
+        while len(self.user_profiles) > MAX_CACHED_PROFILES:
+            self.user_profiles.popitem(last=False)
+            self.profile_evictions += 1
+    
+    def _apply_to_profile(self, result: ModerationResult):
+        """Update cached user behavior profile from a moderation result"""
+        key = (result.group_id, result.user_id)
+        profile = self.user_profiles.get(key)
+        if profile:
+            self.user_profiles.move_to_end(key)
             profile.message_count += 1
             
             if result.severity in [ContentSeverity.HIGH, ContentSeverity.CRITICAL]:
                 profile.toxicity_score = min(profile.toxicity_score + 10, 100)
-        
-        # Store in database
-        await self.db.db[self.db.db_name]["user_profiles"].update_one(
-            {"user_id": user_id, "group_id": group_id},
-            {"$inc": {"message_count": 1}},
-            upsert=True
+    
+    async def _write_results(self, docs: List[Dict[str, Any]]):
+        """Flush callback: store results and profile counters in bulk"""
+        try:
+            await self.db.db["moderation_results"].insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate _ids mean a retried batch was already partly written
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+        
+        counts = Counter((doc["user_id"], doc["group_id"]) for doc in docs)
+        await self.db.db["user_profiles"].bulk_write(
+            [
+                UpdateOne(
+                    {"user_id": user_id, "group_id": group_id},
+                    {"$inc": {"message_count": count}},
+                    upsert=True
+                )
+                for (user_id, group_id), count in counts.items()
+            ],
+            ordered=False
         )
+    
+    async def flush(self):
+        """Persist all queued moderation results now"""
+        await self.results_buffer.flush()
+    
+    async def close(self):
+        """Stop background persistence, flushing what is queued"""
+        await self.results_buffer.close()
 
 
 # Import datetime at module level
@@ -18,6 +18,13 @@ from api_v2.models.enforcement import (
     UserEnforcementHistory,
 )
 
+# Permission state models
+from api_v2.models.permissions import (
+    PERMISSION_FIELDS,
+    PermissionBulkLookupRequest,
+    PermissionBulkLookupResponse,
+)
+
 __all__ = [
     "ActionType",
     "ActionStatus",
@@ -33,4 +40,7 @@ __all__ = [
     "BatchActionResponse",
     "EnforcementStats",
     "UserEnforcementHistory",
+    "PERMISSION_FIELDS",
+    "PermissionBulkLookupRequest",
+    "PermissionBulkLookupResponse",
 ]
@@ -182,6 +182,7 @@ class BatchActionRequest(BaseModel):
     actions: List[EnforcementAction]
     execute_concurrently: bool = True
     stop_on_error: bool = False
+    concurrency: Optional[int] = Field(None, ge=1, le=64, description="Actions in flight at once")
 
 
 class BatchActionResponse(BaseModel):
@@ -0,0 +1,103 @@
+"""
+Compact Permission State Model
+Per (group, user) permissions stored as a single small-int bitmask
+
+A set bit means the permission is DENIED, so the default state (everything
+allowed) is mask 0 and only restricted users need to be stored at all.
+Restriction metadata (who, why, when) lives in a separate side document.
+"""
+
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+
+# ============================================================================
+# BIT LAYOUT (append only - never reorder, masks are persisted)
+# ============================================================================
+
+PERMISSION_FIELDS: Tuple[str, ...] = (
+    "can_send_messages",
+    "can_send_other_messages",  # Stickers & GIFs
+    "can_send_audios",          # Voice messages
+    "can_send_documents",
+    "can_send_photos",
+    "can_send_videos",
+)
+
+PERMISSION_BITS: Dict[str, int] = {name: 1 << i for i, name in enumerate(PERMISSION_FIELDS)}
+
+DEFAULT_MASK = 0
+
+# Denying any of these marks the user as restricted
+RESTRICTED_MASK = (
+    PERMISSION_BITS["can_send_messages"]
+    | PERMISSION_BITS["can_send_other_messages"]
+    | PERMISSION_BITS["can_send_audios"]
+)
+
+# Packed snapshot format: magic header, then one record per user
+SNAPSHOT_MAGIC = b"PRM1"
+SNAPSHOT_RECORD = struct.Struct("<qB")  # user_id (int64), mask (uint8)
+
+
+# ============================================================================
+# CONVERSION HELPERS
+# ============================================================================
+
+def permissions_to_mask(permissions: Dict[str, Any]) -> int:
+    """Encode a {field: allowed} dict as a denied-bits mask (missing = allowed)"""
+    mask = 0
+    for name, bit in PERMISSION_BITS.items():
+        if not permissions.get(name, True):
+            mask |= bit
+    return mask
+
+
+def mask_to_permissions(mask: int) -> Dict[str, bool]:
+    """Decode a mask into a {field: allowed} dict"""
+    return {name: not (mask & bit) for name, bit in PERMISSION_BITS.items()}
+
+
+def is_restricted(mask: int) -> bool:
+    """Whether the mask denies any core messaging permission"""
+    return bool(mask & RESTRICTED_MASK)
+
+
+def mask_from_document(doc: Optional[Dict[str, Any]]) -> int:
+    """Read a mask from a stored document, accepting legacy boolean documents"""
+    if not doc:
+        return DEFAULT_MASK
+    if "mask" in doc:
+        return int(doc["mask"])
+    return permissions_to_mask(doc)
+
+
+def pack_records(records: Iterable[Tuple[int, int]]) -> bytes:
+    """Pack (user_id, mask) records for a snapshot stream (header not included)"""
+    return b"".join(SNAPSHOT_RECORD.pack(user_id, mask) for user_id, mask in records)
+
+
+def unpack_snapshot(data: bytes) -> List[Tuple[int, int]]:
+    """Decode a packed snapshot into (user_id, mask) records"""
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("Not a permission snapshot")
+    body = memoryview(data)[len(SNAPSHOT_MAGIC):]
+    return list(SNAPSHOT_RECORD.iter_unpack(body))
+
+
+# ============================================================================
+# API MODELS
+# ============================================================================
+
+class PermissionBulkLookupRequest(BaseModel):
+    """Bulk permission lookup"""
+    user_ids: List[int] = Field(..., min_length=1, max_length=5000)
+
+
+class PermissionBulkLookupResponse(BaseModel):
+    """Bulk permission lookup result (masks keyed by user_id)"""
+    group_id: int
+    fields: List[str] = list(PERMISSION_FIELDS)
+    masks: Dict[int, int]
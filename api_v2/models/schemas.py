@@ -249,10 +249,12 @@ class PaginationParams(BaseModel):
 class PaginatedResponse(BaseModel):
     """Paginated response wrapper"""
     items: List[Dict[str, Any]]
-    total: int
+    total: Optional[int] = None  # None when counting was skipped (count="none")
     page: int
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # keyset cursor for the next page
+    has_more: bool = False
 
 
 # ============================================================================
@@ -417,6 +419,7 @@ class NightModeSettings(BaseModel):
     exempt_user_ids: List[int] = Field(default_factory=list, description="User IDs exempt from night mode")
     exempt_roles: List[str] = Field(default_factory=list, description="Roles exempt from night mode (admin, moderator, vip)")
     auto_delete_restricted: bool = Field(default=True, description="Auto-delete restricted content?")
+    timezone: Optional[str] = Field(default=None, description="IANA timezone for start/end times (server time if unset)")
     created_at: datetime
     updated_at: datetime
 
@@ -430,6 +433,7 @@ class NightModeCreate(BaseModel):
     exempt_user_ids: Optional[List[int]] = None
     exempt_roles: Optional[List[str]] = None
     auto_delete_restricted: Optional[bool] = None
+    timezone: Optional[str] = None
 
 
 class NightModeUpdate(BaseModel):
@@ -441,6 +445,7 @@ class NightModeUpdate(BaseModel):
     exempt_user_ids: Optional[List[int]] = None
     exempt_roles: Optional[List[str]] = None
     auto_delete_restricted: Optional[bool] = None
+    timezone: Optional[str] = None
 
 
 class NightModeStatus(BaseModel):
@@ -502,3 +507,22 @@ class BlacklistResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+
+
+class ContentScanRequest(BaseModel):
+    """Scan a whole message against the group's blacklist and word filters"""
+    text: Optional[str] = None
+    urls: List[str] = Field(default_factory=list, description="URLs from message entities (text URLs are also extracted)")
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    sticker_id: Optional[str] = None
+    gif_id: Optional[str] = None
+
+
+class ContentScanResponse(BaseModel):
+    """Content scan result"""
+    group_id: int
+    blocked: bool
+    auto_delete: bool
+    action: Optional[str] = None
+    hits: List[Dict[str, Any]] = Field(default_factory=list)
@@ -12,6 +12,7 @@ from api_v2.features import (
     AutomationEngine, 
     ModerationEngine
 )
+from api_v2.features.moderation import ModerationBatchRequest
 
 logger = logging.getLogger(__name__)
 
@@ -77,6 +78,44 @@ async def get_retention_analytics(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/groups/{group_id}/analytics/retention/matrix")
+async def get_retention_matrix(
+    group_id: int,
+    cohorts: int = Query(12, ge=1, le=104),
+    weeks: int = Query(12, ge=1, le=63)
+):
+    """Get weekly cohort retention matrix (percent of cohort active per week)"""
+    if not analytics_engine:
+        raise HTTPException(status_code=500, detail="Analytics engine not initialized")
+    
+    try:
+        matrix = await analytics_engine.calculate_retention_matrix(group_id, cohorts, weeks)
+        return {
+            "status": "success",
+            "data": matrix
+        }
+    except Exception as e:
+        logger.error(f"Retention matrix error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/groups/{group_id}/analytics/retention/backfill")
+async def backfill_retention_cohorts(group_id: int):
+    """Rebuild a group's retention cohorts from its action history (one-off)"""
+    if not analytics_engine:
+        raise HTTPException(status_code=500, detail="Analytics engine not initialized")
+    
+    try:
+        result = await analytics_engine.retention.backfill(group_id)
+        return {
+            "status": "success",
+            "result": result
+        }
+    except Exception as e:
+        logger.error(f"Retention backfill error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/groups/{group_id}/analytics/moderation-effectiveness")
 async def get_moderation_effectiveness(
     group_id: int,
@@ -113,7 +152,8 @@ async def get_group_health_score(group_id: int):
             "health_score": health.health_score,
             "insights": health.insights,
             "recommendations": health.recommendations,
-            "alerts": health.alerts
+            "alerts": health.alerts,
+            "computed_at": health.timestamp
         }
     except Exception as e:
         logger.error(f"Health score error: {e}")
@@ -267,6 +307,25 @@ async def analyze_message(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/groups/{group_id}/moderation/analyze-batch")
+async def analyze_message_batch(group_id: int, request: ModerationBatchRequest):
+    """Analyze up to 1000 messages in one call"""
+    if not moderation_engine:
+        raise HTTPException(status_code=500, detail="Moderation engine not initialized")
+    
+    try:
+        results = await moderation_engine.analyze_batch(group_id, request.messages)
+        return {
+            "status": "success",
+            "count": len(results),
+            "flagged": sum(1 for result in results if result.flagged),
+            "results": [result.dict() for result in results]
+        }
+    except Exception as e:
+        logger.error(f"Batch analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/groups/{group_id}/moderation/user-profile/{user_id}")
 async def get_user_behavior_profile(group_id: int, user_id: int):
     """Get user behavior profile and risk assessment"""
@@ -304,6 +363,27 @@ async def detect_duplicate_content(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/groups/{group_id}/moderation/duplicates")
+async def get_duplicate_clusters(
+    group_id: int,
+    min_size: int = Query(2, ge=1, le=1000),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Get near-duplicate message clusters (spam waves) from the last hour"""
+    if not moderation_engine:
+        raise HTTPException(status_code=500, detail="Moderation engine not initialized")
+    
+    try:
+        result = moderation_engine.get_duplicate_clusters(group_id, min_size, limit)
+        return {
+            "status": "success",
+            "result": result
+        }
+    except Exception as e:
+        logger.error(f"Duplicate clusters error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/groups/{group_id}/moderation/stats")
 async def get_moderation_stats(group_id: int):
     """Get moderation statistics"""
@@ -8,11 +8,15 @@ import os
 from pymongo import MongoClient
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException, Query, Depends, Body
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from api_v2.models.schemas import *
 from api_v2.services.business_logic import *
-from api_v2.core.database import get_db_manager
+from api_v2.core.database import DatabaseIndexManager, get_db_manager
+from api_v2.cache import cached, invalidates
+from shared.counts import COUNT_MODE_PATTERN
+from shared.pagination import InvalidCursor
+from shared.responses import json_response
 
 
 # Database connection
@@ -78,6 +82,21 @@ async def health_check():
     }
 
 
+@router.get("/admin/index-audit")
+async def index_audit(flagged_only: bool = Query(False)):
+    """
+    Explain every registered query shape and flag collection scans and
+    in-memory sorts (see DatabaseIndexManager.QUERY_SHAPES)
+    """
+    db_manager = get_db_manager()
+    if not db_manager:
+        raise HTTPException(status_code=503, detail="Database not available")
+    report = await DatabaseIndexManager.audit_query_plans(db_manager.db)
+    if flagged_only:
+        report["shapes"] = [shape for shape in report["shapes"] if not shape["ok"]]
+    return report
+
+
 # ============================================================================
 # GROUP ENDPOINTS
 # ============================================================================
@@ -246,6 +265,7 @@ async def get_rules(group_id: int):
 # ============================================================================
 
 @router.get("/groups/{group_id}/settings", response_model=Dict[str, Any])
+@cached("group_settings:{group_id}")
 async def get_settings(group_id: int):
     """Get settings for a group"""
     try:
@@ -258,6 +278,7 @@ async def get_settings(group_id: int):
 
 
 @router.put("/groups/{group_id}/settings", response_model=Dict[str, Any])
+@invalidates("group_settings:{group_id}")
 async def update_settings(group_id: int, settings: SettingsUpdate):
     """Update settings for a group"""
     try:
@@ -291,15 +312,21 @@ async def log_action(group_id: int, action: ActionCreate):
 async def get_group_actions(
     group_id: int,
     page: int = Query(1, ge=1),
-    per_page: int = Query(50, ge=1, le=100)
+    per_page: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (ignores page)"),
+    count: str = Query("cached", pattern=COUNT_MODE_PATTERN, description="Total count strategy (none: has_more only)")
 ):
     """Get actions for group"""
     try:
-        result = await get_action_service().get_group_actions(group_id, page, per_page)
-        return {
+        result = await get_action_service().get_group_actions(
+            group_id, page, per_page, cursor=cursor, count=count
+        )
+        return json_response({
             "success": True,
-            "data": result
-        }
+            "data": result.model_dump()
+        })
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
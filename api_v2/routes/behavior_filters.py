@@ -8,6 +8,8 @@ from fastapi import APIRouter, HTTPException
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+from api_v2.cache import cached, invalidates
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v2", tags=["behavior-filters"])
@@ -26,6 +28,7 @@ def set_database(database):
 # ============================================================================
 
 @router.get("/groups/{group_id}/policies", response_model=Dict[str, Any])
+@cached("policies:{group_id}")
 async def get_group_policies(group_id: int):
     """Get all behavior filter policies for a group"""
     try:
@@ -61,6 +64,7 @@ async def get_group_policies(group_id: int):
 
 
 @router.post("/groups/{group_id}/policies/floods", response_model=Dict[str, Any])
+@invalidates("policies:{group_id}")
 async def toggle_floods_policy(group_id: int, payload: Dict[str, Any] = None):
     """Toggle floods detection policy"""
     try:
@@ -113,6 +117,7 @@ async def toggle_floods_policy(group_id: int, payload: Dict[str, Any] = None):
 
 
 @router.post("/groups/{group_id}/policies/spam", response_model=Dict[str, Any])
+@invalidates("policies:{group_id}")
 async def toggle_spam_policy(group_id: int, payload: Dict[str, Any] = None):
     """Toggle spam detection policy"""
     try:
@@ -165,6 +170,7 @@ async def toggle_spam_policy(group_id: int, payload: Dict[str, Any] = None):
 
 
 @router.post("/groups/{group_id}/policies/checks", response_model=Dict[str, Any])
+@invalidates("policies:{group_id}")
 async def toggle_checks_policy(group_id: int, payload: Dict[str, Any] = None):
     """Toggle checks policy"""
     try:
@@ -217,6 +223,7 @@ async def toggle_checks_policy(group_id: int, payload: Dict[str, Any] = None):
 
 
 @router.post("/groups/{group_id}/policies/silence", response_model=Dict[str, Any])
+@invalidates("policies:{group_id}")
 async def toggle_silence_policy(group_id: int, payload: Dict[str, Any] = None):
     """Toggle silence mode policy"""
     try:
@@ -269,6 +276,7 @@ async def toggle_silence_policy(group_id: int, payload: Dict[str, Any] = None):
 
 
 @router.post("/groups/{group_id}/policies/links", response_model=Dict[str, Any])
+@invalidates("policies:{group_id}")
 async def toggle_links_policy(group_id: int, payload: Dict[str, Any] = None):
     """Toggle links policy"""
     try:
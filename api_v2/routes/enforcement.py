@@ -5,13 +5,16 @@ Unified enforcement operations from centralized_api + api_v2 features
 """
 
 import logging
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from api_v2.models.enforcement import (
     EnforcementAction, ActionResponse, BatchActionRequest, BatchActionResponse,
     EnforcementStats, UserEnforcementHistory
 )
+from shared.batch_runner import STREAM_MEDIA_TYPES
 
 logger = logging.getLogger(__name__)
 
@@ -90,12 +93,17 @@ async def execute_enforcement_action(
 @router.post("/groups/{group_id}/enforcement/batch", response_model=BatchActionResponse)
 async def execute_batch_enforcement(
     group_id: int,
-    batch_request: BatchActionRequest
-) -> BatchActionResponse:
+    batch_request: BatchActionRequest,
+    stream: Optional[str] = Query(None, pattern="^(ndjson|sse)$", description="Stream progress instead of waiting")
+):
     """
     Execute multiple enforcement actions
     
-    Supports concurrent and sequential execution.
+    Supports concurrent and sequential execution. At most `concurrency`
+    actions are in flight, calls into the chat are paced and Telegram
+    flood waits are honoured. With `stream=ndjson|sse` progress events are
+    streamed as actions complete; the batch id (X-Batch-Id header and the
+    first event) can be used to re-attach, cancel or resume.
     
     Example:
     ```json
@@ -117,6 +125,14 @@ async def execute_batch_enforcement(
             action.group_id = group_id
 
         engine = await get_enforcement_engine()
+        if stream:
+            run = engine.submit_batch(batch_request)
+            return StreamingResponse(
+                engine.batches.stream(run.batch_id, stream),
+                media_type=STREAM_MEDIA_TYPES[stream],
+                headers={"X-Batch-Id": run.batch_id}
+            )
+
         response = await engine.execute_batch(batch_request)
         
         return response
@@ -129,6 +145,85 @@ async def execute_batch_enforcement(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+def _get_batch_run(engine, group_id: int, batch_id: str):
+    run = engine.batches.get(batch_id)
+    if run is None or run.metadata.get("group_id") != group_id:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return run
+
+
+@router.post("/groups/{group_id}/enforcement/batch/async", status_code=202)
+async def submit_batch_enforcement(group_id: int, batch_request: BatchActionRequest):
+    """Start a batch in the background and return its id immediately"""
+    try:
+        if not batch_request.actions:
+            raise ValueError("Batch must contain at least one action")
+        for action in batch_request.actions:
+            action.group_id = group_id
+
+        engine = await get_enforcement_engine()
+        run = engine.submit_batch(batch_request)
+        return run.summary()
+
+    except ValueError as e:
+        logger.warning(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error submitting batch enforcement: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/groups/{group_id}/enforcement/batch/{batch_id}")
+async def get_batch_status(group_id: int, batch_id: str):
+    """Progress of a batch"""
+    engine = await get_enforcement_engine()
+    return _get_batch_run(engine, group_id, batch_id).summary()
+
+
+@router.get("/groups/{group_id}/enforcement/batch/{batch_id}/events")
+async def stream_batch_events(
+    group_id: int,
+    batch_id: str,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$"),
+    after: int = Query(-1, ge=-1, description="Only events with a higher seq"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Stream a batch's progress events from an offset
+
+    Reconnecting SSE clients resume from their Last-Event-ID automatically.
+    """
+    engine = await get_enforcement_engine()
+    run = _get_batch_run(engine, group_id, batch_id)
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    return StreamingResponse(
+        engine.batches.stream(run.batch_id, format, after),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"X-Batch-Id": run.batch_id}
+    )
+
+
+@router.post("/groups/{group_id}/enforcement/batch/{batch_id}/cancel")
+async def cancel_batch(group_id: int, batch_id: str):
+    """Stop a running batch (finished actions are kept)"""
+    engine = await get_enforcement_engine()
+    _get_batch_run(engine, group_id, batch_id)
+    run = await engine.batches.cancel(batch_id)
+    return run.summary()
+
+
+@router.post("/groups/{group_id}/enforcement/batch/{batch_id}/resume")
+async def resume_batch(group_id: int, batch_id: str):
+    """Continue a cancelled or stopped batch with its unfinished actions"""
+    engine = await get_enforcement_engine()
+    run = _get_batch_run(engine, group_id, batch_id)
+    if run.status == "running":
+        raise HTTPException(status_code=409, detail="Batch is still running")
+    engine.batches.resume(batch_id)
+    return run.summary()
+
+
 # ============================================================================
 # ACTION TYPE SPECIFIC ENDPOINTS
 # ============================================================================
@@ -316,6 +411,31 @@ async def get_user_violations(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.get("/groups/{group_id}/enforcement/user/{user_id}/violations/history")
+async def get_user_violation_history(
+    group_id: int,
+    user_id: int,
+    limit: int = Query(50, ge=1, le=500, description="Maximum entries to return"),
+    before: Optional[datetime] = Query(None, description="Only entries older than this timestamp")
+) -> dict:
+    """Get full violation history for a user (newest first)"""
+    try:
+        engine = await get_enforcement_engine()
+        history = await engine.get_violation_history(user_id, group_id, limit, before)
+        
+        return {
+            "user_id": user_id,
+            "group_id": group_id,
+            "count": len(history),
+            "violations": history,
+            "next_before": history[-1]["timestamp"] if len(history) == limit else None
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting violation history: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.post("/groups/{group_id}/enforcement/user/{user_id}/violations/track")
 async def track_user_violation(
     group_id: int,
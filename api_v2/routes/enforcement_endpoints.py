@@ -6,23 +6,40 @@ These endpoints handle moderation actions by calling Telegram Bot API directly
 import os
 import logging
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, Any
-from fastapi import APIRouter, HTTPException, Body
-import httpx
+from typing import Dict, Any, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Body, Query
+from fastapi.responses import StreamingResponse
 import json
 from api_v2.core.database import get_db_manager
+from api_v2.telegram.client import get_telegram_client
+from api_v2.cache import cached, invalidates
+from api_v2.models.permissions import (
+    DEFAULT_MASK,
+    PERMISSION_FIELDS,
+    SNAPSHOT_MAGIC,
+    PermissionBulkLookupRequest,
+    PermissionBulkLookupResponse,
+    is_restricted,
+    mask_from_document,
+    mask_to_permissions,
+    pack_records,
+    permissions_to_mask,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v2", tags=["enforcement"])
 
 # Get bot token from environment
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8276429151:AAEWq4nE9hQcRgY4AcuLWFKW_z26Xcmk2gY")
-TELEGRAM_API_URL = "https://api.telegram.org/bot"
 
 # Cache for bot ID
 BOT_ID_CACHE = None
 
+# Fields of the pre-bitmask permission document layout
+LEGACY_PERMISSION_FIELDS = PERMISSION_FIELDS + ("is_restricted", "restricted_at", "restricted_by", "restriction_reason")
+
 async def get_bot_id():
     """Get bot ID by extracting from token (format: ID:Token)"""
     global BOT_ID_CACHE
@@ -34,132 +51,111 @@ async def get_bot_id():
             BOT_ID_CACHE = None
     return BOT_ID_CACHE
 
-# In-memory database for permission states (legacy fallback)
-# Structure: {group_id: {user_id: {permissions...}}}
-PERMISSION_STATES_DB: Dict[int, Dict[int, Dict[str, Any]]] = {}
+# Bounded in-process fallback of permission masks, used when MongoDB is down
+# Structure: {(group_id, user_id): mask} - only non-default users are kept
+PERMISSION_MASKS_MAX = 100_000
+PERMISSION_MASKS: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+
+
+def _remember_mask(group_id: int, user_id: int, mask: int):
+    """Update the in-process mask fallback (LRU, non-default users only)"""
+    key = (group_id, user_id)
+    if mask == DEFAULT_MASK:
+        PERMISSION_MASKS.pop(key, None)
+        return
+    PERMISSION_MASKS[key] = mask
+    PERMISSION_MASKS.move_to_end(key)
+    while len(PERMISSION_MASKS) > PERMISSION_MASKS_MAX:
+        PERMISSION_MASKS.popitem(last=False)
 
 
+def _permission_state(mask: int, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Expand a mask plus restriction metadata into the permission state dict"""
+    meta = meta or {}
+    return {
+        **mask_to_permissions(mask),
+        "mask": mask,
+        "is_restricted": is_restricted(mask),
+        "restricted_at": meta.get("restricted_at"),
+        "restricted_by": meta.get("restricted_by"),
+        "restriction_reason": meta.get("restriction_reason"),
+    }
+
 
+@invalidates("permissions:{group_id}:{user_id}")
 async def save_permission_state(group_id: int, user_id: int, permissions: Dict[str, bool], restricted_by: int = 0, reason: str = ""):
-    """Save user permission state to MongoDB"""
+    """
+    Save user permission state to MongoDB
+    
+    `permissions` holds one bitmask per restricted user (default users have no
+    document); who/why/when is kept in `permission_restrictions`.
+    """
+    mask = permissions_to_mask(permissions)
+    _remember_mask(group_id, user_id, mask)
+    
     try:
-        db_manager = get_db_manager()
-        
-        # Prepare the document
-        perm_doc = {
-            "group_id": group_id,
-            "user_id": user_id,
-            "can_send_messages": permissions.get("can_send_messages", True),
-            "can_send_other_messages": permissions.get("can_send_other_messages", True),
-            "can_send_audios": permissions.get("can_send_audios", True),
-            "can_send_documents": permissions.get("can_send_documents", True),
-            "can_send_photos": permissions.get("can_send_photos", True),
-            "can_send_videos": permissions.get("can_send_videos", True),
-            "is_restricted": not all([permissions.get(k, True) for k in ["can_send_messages", "can_send_other_messages", "can_send_audios"]]),
-            "restricted_at": datetime.now().isoformat(),
-            "restricted_by": restricted_by,
-            "restriction_reason": reason,
-            "updated_at": datetime.now().isoformat()
-        }
+        motor_db = get_db_manager().db
+        now = datetime.utcnow()
+        key = {"group_id": group_id, "user_id": user_id}
         
-        try:
-            # Access motor database through db_manager.db and save using async
-            motor_db = db_manager.db
-            result = await motor_db.permissions.update_one(
-                {"group_id": group_id, "user_id": user_id},
-                {"$set": perm_doc},
+        if mask == DEFAULT_MASK:
+            await motor_db.permissions.delete_one(key)
+        else:
+            # $unset drops boolean fields left by the legacy document layout
+            await motor_db.permissions.update_one(
+                key,
+                {
+                    "$set": {"mask": mask, "updated_at": now},
+                    "$unset": {field: "" for field in LEGACY_PERMISSION_FIELDS},
+                },
                 upsert=True
             )
-            logger.info(f"✅ Permission state saved to MongoDB: group={group_id}, user={user_id}, matched={result.matched_count}, modified={result.modified_count}, upserted={result.upserted_id}")
-        except Exception as mongo_error:
-            logger.warning(f"⚠️ Error saving to MongoDB: {mongo_error}, using in-memory fallback")
-            raise
-        
-        # Also keep in-memory cache in sync
-        if group_id not in PERMISSION_STATES_DB:
-            PERMISSION_STATES_DB[group_id] = {}
-        PERMISSION_STATES_DB[group_id][user_id] = perm_doc
         
+        await motor_db.permission_restrictions.update_one(
+            key,
+            {"$set": {
+                "restricted_at": now,
+                "restricted_by": restricted_by,
+                "restriction_reason": reason,
+            }},
+            upsert=True
+        )
+        logger.info(f"✅ Permission state saved: group={group_id}, user={user_id}, mask={mask:#04x}")
     except Exception as e:
-        logger.error(f"❌ Error saving permission state to MongoDB: {e}", exc_info=True)
-        # Fallback to in-memory
-        if group_id not in PERMISSION_STATES_DB:
-            PERMISSION_STATES_DB[group_id] = {}
-        PERMISSION_STATES_DB[group_id][user_id] = {
-            "can_send_messages": permissions.get("can_send_messages", True),
-            "can_send_other_messages": permissions.get("can_send_other_messages", True),
-            "can_send_audios": permissions.get("can_send_audios", True),
-            "can_send_documents": permissions.get("can_send_documents", True),
-            "can_send_photos": permissions.get("can_send_photos", True),
-            "can_send_videos": permissions.get("can_send_videos", True),
-            "is_restricted": not all([permissions.get(k, True) for k in ["can_send_messages", "can_send_other_messages", "can_send_audios"]]),
-            "restricted_at": datetime.now().isoformat(),
-            "restricted_by": restricted_by,
-            "restriction_reason": reason,
-            "updated_at": datetime.now().isoformat()
-        }
-        logger.info(f"⚠️ Fallback: Saved to in-memory cache")
-
-
-
+        logger.error(f"❌ Error saving permission state to MongoDB: {e}, kept in-memory only", exc_info=True)
 
 
+@cached("permissions:{group_id}:{user_id}")
 async def get_permission_state(group_id: int, user_id: int) -> Dict[str, Any]:
     """Get user permission state from MongoDB, fallback to in-memory"""
     try:
-        db_manager = get_db_manager()
-        motor_db = db_manager.db
-        
-        # Try to find in MongoDB
-        doc = await motor_db.permissions.find_one({"group_id": group_id, "user_id": user_id})
-        if doc:
-            logger.info(f"✅ Loaded permissions from MongoDB: group={group_id}, user={user_id}")
-            # Update in-memory cache
-            if group_id not in PERMISSION_STATES_DB:
-                PERMISSION_STATES_DB[group_id] = {}
-            PERMISSION_STATES_DB[group_id][user_id] = doc
-            return doc
+        motor_db = get_db_manager().db
+        key = {"group_id": group_id, "user_id": user_id}
+        
+        doc = await motor_db.permissions.find_one(key, {"_id": 0})
+        mask = mask_from_document(doc)
+        _remember_mask(group_id, user_id, mask)
+        if mask == DEFAULT_MASK:
+            return _permission_state(mask)
+        
+        meta = await motor_db.permission_restrictions.find_one(key, {"_id": 0})
+        # Legacy documents carry their metadata inline
+        return _permission_state(mask, meta or doc)
     except Exception as e:
         logger.warning(f"⚠️ Error reading from MongoDB: {e}, using in-memory/default")
     
-    # Fallback to in-memory cache
-    if group_id in PERMISSION_STATES_DB and user_id in PERMISSION_STATES_DB[group_id]:
-        logger.info(f"✅ Loaded permissions from in-memory cache: group={group_id}, user={user_id}")
-        return PERMISSION_STATES_DB[group_id][user_id]
-    
-    # Return default (all allowed) if not found anywhere
-    logger.info(f"ℹ️ No permission state found, returning defaults: group={group_id}, user={user_id}")
-    return {
-        "can_send_messages": True,
-        "can_send_other_messages": True,
-        "can_send_audios": True,
-        "can_send_documents": True,
-        "can_send_photos": True,
-        "can_send_videos": True,
-        "is_restricted": False,
-        "restricted_at": None,
-        "restricted_by": None,
-        "restriction_reason": None
-    }
-
-
+    return _permission_state(PERMISSION_MASKS.get((group_id, user_id), DEFAULT_MASK))
 
 
 async def call_telegram_api(method: str, **kwargs) -> Dict[str, Any]:
-    """Call Telegram Bot API with proper error handling"""
-    url = f"{TELEGRAM_API_URL}{BOT_TOKEN}/{method}"
+    """
+    Call Telegram Bot API with proper error handling
     
+    Goes through the shared pooled client (keep-alive, rate limiting,
+    automatic retry_after handling).
+    """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(url, json=kwargs)
-            data = response.json()
-            
-            if not data.get("ok"):
-                error_msg = data.get("description", "Unknown error")
-                logger.error(f"Telegram API error for {method}: {error_msg}")
-                return {"success": False, "error": error_msg}
-            
-            return {"success": True, "data": data.get("result", {})}
+        return await get_telegram_client(BOT_TOKEN).call(method, **kwargs)
     except Exception as e:
         logger.error(f"Exception calling Telegram API: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -759,6 +755,74 @@ async def is_user_restricted(group_id: int, user_id: int, permission_type: str =
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/groups/{group_id}/permissions/bulk", response_model=PermissionBulkLookupResponse)
+async def bulk_get_permissions(group_id: int, request: PermissionBulkLookupRequest):
+    """
+    Look up permission masks for many users in one query
+    
+    Users without a stored state get the default mask (0 = everything allowed).
+    Decode masks with the returned `fields` order: bit i set = fields[i] denied.
+    """
+    try:
+        motor_db = get_db_manager().db
+        masks = {user_id: DEFAULT_MASK for user_id in request.user_ids}
+        cursor = motor_db.permissions.find(
+            {"group_id": group_id, "user_id": {"$in": list(masks)}},
+            {"_id": 0}
+        )
+        async for doc in cursor:
+            masks[doc["user_id"]] = mask_from_document(doc)
+        
+        return PermissionBulkLookupResponse(group_id=group_id, masks=masks)
+    except Exception as e:
+        logger.error(f"Bulk permissions error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/groups/{group_id}/permissions/snapshot")
+async def get_permissions_snapshot(group_id: int, format: str = Query("packed", pattern="^(packed|json)$")):
+    """
+    Stream every non-default permission state in the group
+    
+    format=packed (application/octet-stream): b"PRM1" followed by 9-byte
+    little-endian records of (user_id int64, mask uint8).
+    format=json: {"fields": [...], "masks": {user_id: mask}}.
+    """
+    try:
+        motor_db = get_db_manager().db
+        cursor = motor_db.permissions.find({"group_id": group_id}, {"_id": 0}).batch_size(5000)
+        
+        if format == "json":
+            masks = {}
+            async for doc in cursor:
+                mask = mask_from_document(doc)
+                if mask != DEFAULT_MASK:
+                    masks[doc["user_id"]] = mask
+            return {"group_id": group_id, "fields": list(PERMISSION_FIELDS), "masks": masks}
+        
+        async def stream():
+            yield SNAPSHOT_MAGIC
+            records = []
+            async for doc in cursor:
+                mask = mask_from_document(doc)
+                if mask != DEFAULT_MASK:
+                    records.append((doc["user_id"], mask))
+                if len(records) >= 5000:
+                    yield pack_records(records)
+                    records = []
+            if records:
+                yield pack_records(records)
+        
+        return StreamingResponse(
+            stream(),
+            media_type="application/octet-stream",
+            headers={"X-Permission-Fields": ",".join(PERMISSION_FIELDS)}
+        )
+    except Exception as e:
+        logger.error(f"Permissions snapshot error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/groups/{group_id}/enforcement/toggle-permission", response_model=Dict[str, Any])
 async def toggle_permission(group_id: int, action: dict = Body(...)):
     """Toggle user permission without calling Telegram API - works with database only"""
@@ -12,6 +12,8 @@ from fastapi import APIRouter, HTTPException, Body
 from pymongo import MongoClient
 import os
 
+from shared.responses import json_response
+
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v2", tags=["message-operations"])
 
@@ -132,28 +134,27 @@ async def get_deleted_messages(group_id: int, limit: int = 50):
         
         deleted_messages = list(
             messages_collection
-            .find({"group_id": group_id})
+            .find(
+                {"group_id": group_id},
+                {"_id": 0, "message_id": 1, "deleted_by": 1, "reason": 1, "deleted_at": 1}
+            )
             .sort("deleted_at", -1)
             .limit(limit)
         )
         
-        # Convert ObjectId to string and format dates
-        formatted_messages = []
         for msg in deleted_messages:
-            formatted_messages.append({
-                "message_id": msg.get("message_id"),
-                "deleted_by": msg.get("deleted_by"),
-                "reason": msg.get("reason", "No reason provided"),
-                "deleted_at": msg.get("deleted_at").isoformat() if msg.get("deleted_at") else None
-            })
+            msg.setdefault("message_id", None)
+            msg.setdefault("deleted_by", None)
+            msg.setdefault("reason", "No reason provided")
+            msg.setdefault("deleted_at", None)
         
-        return {
+        return json_response({
             "success": True,
             "group_id": group_id,
-            "total_count": len(formatted_messages),
-            "deleted_messages": formatted_messages,
-            "message": f"Retrieved {len(formatted_messages)} deleted messages"
-        }
+            "total_count": len(deleted_messages),
+            "deleted_messages": deleted_messages,
+            "message": f"Retrieved {len(deleted_messages)} deleted messages"
+        })
     
     except Exception as e:
         logger.error(f"Get deleted messages error: {e}")
@@ -278,7 +279,7 @@ async def get_broadcasts(group_id: int, limit: int = 50, status: Optional[str] =
         
         broadcasts = list(
             broadcasts_collection
-            .find(query)
+            .find(query, {"_id": 0, "id": 1, "admin_id": 1, "admin_name": 1, "text": 1, "sent_at": 1, "status": 1})
             .sort("sent_at", -1)
             .limit(limit)
         )
@@ -286,22 +287,23 @@ async def get_broadcasts(group_id: int, limit: int = 50, status: Optional[str] =
         # Format broadcasts
         formatted_broadcasts = []
         for b in broadcasts:
+            text = b.get("text", "")
             formatted_broadcasts.append({
                 "id": b.get("id"),
                 "admin_id": b.get("admin_id"),
                 "admin_name": b.get("admin_name"),
-                "text_preview": b.get("text", "")[:100] + ("..." if len(b.get("text", "")) > 100 else ""),
-                "sent_at": b.get("sent_at").isoformat() if b.get("sent_at") else None,
+                "text_preview": text[:100] + ("..." if len(text) > 100 else ""),
+                "sent_at": b.get("sent_at"),
                 "status": b.get("status", "unknown")
             })
         
-        return {
+        return json_response({
             "success": True,
             "group_id": group_id,
             "total_count": len(formatted_broadcasts),
             "broadcasts": formatted_broadcasts,
             "message": f"Retrieved {len(formatted_broadcasts)} broadcast records"
-        }
+        })
     
     except Exception as e:
         logger.error(f"Get broadcasts error: {e}")
@@ -3,6 +3,7 @@ Advanced Moderation Routes
 Provides endpoints for word filtering, spam detection, slowmode, etc.
 """
 
+import asyncio
 import logging
 import uuid
 from datetime import datetime
@@ -11,16 +12,35 @@ from fastapi import APIRouter, HTTPException, Body
 from pymongo import MongoClient
 import os
 
+from api_v2.cache import cached, invalidates
+from api_v2.services.content_matcher import content_matcher
+
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v2", tags=["moderation-advanced"])
 
 # Database connection
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 client = MongoClient(MONGODB_URL)
+# word_filters indexes are declared for this database in
+# DatabaseIndexManager.COLLECTION_DATABASES (api_v2.core.database)
 db = client["group_assistant"]
 
 
+async def _load_word_filters(group_id: int) -> List[dict]:
+    """Active word filters for the compiled content matcher"""
+    return await asyncio.to_thread(
+        lambda: list(db["word_filters"].find(
+            {"group_id": group_id, "active": True},
+            {"_id": 0, "id": 1, "word": 1, "action": 1, "active": 1}
+        ))
+    )
+
+
+content_matcher.word_filter_loader = _load_word_filters
+
+
 @router.post("/groups/{group_id}/moderation/filters", response_model=Dict[str, Any])
+@invalidates("word_filters:{group_id}")
 async def add_word_filter(group_id: int, filter_data: dict = Body(...)):
     """Add a word to the filter list"""
     try:
@@ -58,6 +78,7 @@ async def add_word_filter(group_id: int, filter_data: dict = Body(...)):
         }
         
         result = filters_collection.insert_one(filter_doc)
+        content_matcher.apply_word_filter(group_id, filter_doc)
         
         return {
             "success": True,
@@ -76,6 +97,7 @@ async def add_word_filter(group_id: int, filter_data: dict = Body(...)):
 
 
 @router.get("/groups/{group_id}/moderation/filters", response_model=Dict[str, Any])
+@cached("word_filters:{group_id}")
 async def list_word_filters(group_id: int):
     """List all word filters for a group"""
     try:
@@ -108,6 +130,7 @@ async def list_word_filters(group_id: int):
 
 
 @router.delete("/groups/{group_id}/moderation/filters/{filter_id}", response_model=Dict[str, Any])
+@invalidates("word_filters:{group_id}")
 async def remove_word_filter(group_id: int, filter_id: str):
     """Remove a word filter"""
     try:
@@ -121,6 +144,10 @@ async def remove_word_filter(group_id: int, filter_id: str):
         if result.matched_count == 0:
             raise ValueError("Filter not found")
         
+        removed = filters_collection.find_one({"id": filter_id, "group_id": group_id})
+        if removed:
+            content_matcher.apply_word_filter(group_id, removed)
+        
         return {
             "success": True,
             "message": "Filter removed successfully"
@@ -5,13 +5,15 @@ Integrates with whitelist/blacklist and permission systems.
 """
 
 from fastapi import APIRouter, Body, Query, HTTPException, status
-from datetime import datetime, time
+from datetime import datetime
 from typing import List, Optional, Dict, Any
 import logging
 
 # Models (imported from schemas)
 from api_v2.models.schemas import NightModeSettings, NightModeCreate, NightModeStatus, NightModePermissionCheck
 from api_v2.core.database import get_db_manager
+from api_v2.cache import cached, invalidates
+from api_v2.services.night_mode import CompiledNightMode, NightModeScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -22,64 +24,13 @@ router = APIRouter(prefix="/api/v2/groups/{group_id}/night-mode", tags=["night-m
 # HELPER FUNCTIONS
 # ============================================================================
 
-def parse_time_string(time_str: str) -> Optional[time]:
-    """Parse 'HH:MM' format to time object"""
-    try:
-        parts = time_str.split(":")
-        return time(int(parts[0]), int(parts[1]))
-    except Exception as e:
-        logger.warning(f"Could not parse time string '{time_str}': {e}")
-        return None
-
-
-def is_current_time_in_range(start_str: str, end_str: str) -> bool:
-    """Check if current time is within night mode window (handles midnight crossing)"""
-    try:
-        start = parse_time_string(start_str)
-        end = parse_time_string(end_str)
-        current = datetime.now().time()
-        
-        if not start or not end:
-            return False
-        
-        # If end time < start time, it crosses midnight
-        if end < start:
-            # Night mode: 22:00 to 08:00 (crosses midnight)
-            return current >= start or current < end
-        else:
-            # Normal: start to end (doesn't cross midnight)
-            return start <= current < end
-    except Exception as e:
-        logger.error(f"Error checking time range: {e}")
-        return False
-
-
-def get_next_transition_time(start_str: str, end_str: str) -> str:
-    """Calculate next transition time (when night mode starts/stops)"""
-    try:
-        start = parse_time_string(start_str)
-        end = parse_time_string(end_str)
-        current = datetime.now().time()
-        
-        if not start or not end:
-            return "Unknown"
-        
-        # Check if currently in night mode
-        if end < start:
-            # Crosses midnight
-            in_night_mode = current >= start or current < end
-        else:
-            in_night_mode = start <= current < end
-        
-        if in_night_mode:
-            # Will end at end_time
-            return f"{end_str} (ends in {end})"
-        else:
-            # Will start at start_time
-            return f"{start_str} (starts in {start})"
-    except Exception as e:
-        logger.error(f"Error calculating transition: {e}")
-        return "Unknown"
+def describe_next_transition(schedule: CompiledNightMode) -> str:
+    """Next start/end of the night window, in the group's timezone"""
+    now = schedule.now()
+    boundary = schedule.next_transition(now)
+    hours, minutes = divmod(int((boundary - now.replace(second=0, microsecond=0)).total_seconds()) // 60, 60)
+    change = "ends" if schedule.in_window(now.hour * 60 + now.minute) else "starts"
+    return f"{boundary.strftime('%H:%M')} ({change} in {hours}h {minutes:02d}m)"
 
 
 async def get_night_mode_settings(group_id: int) -> Optional[Dict[str, Any]]:
@@ -97,6 +48,16 @@ async def get_night_mode_settings(group_id: int) -> Optional[Dict[str, Any]]:
         return None
 
 
+async def _reload_schedule(group_id: int):
+    """Recompile the group's schedule after a settings write"""
+    try:
+        await night_mode_scheduler.reload(group_id)
+    except Exception as e:
+        logger.warning(f"Could not recompile night mode schedule: {e}")
+        night_mode_scheduler.forget(group_id)
+
+
+@invalidates("night_mode:{group_id}")
 async def save_night_mode_settings(group_id: int, settings: dict) -> bool:
     """Save night mode settings to database"""
     try:
@@ -118,17 +79,23 @@ async def save_night_mode_settings(group_id: int, settings: dict) -> bool:
             {"$set": settings},
             upsert=True
         )
+        await _reload_schedule(group_id)
         return True
     except Exception as e:
         logger.error(f"Error saving night mode settings: {e}")
         return False
 
 
+# Compiled schedules + transition loop (started in the app lifespan)
+night_mode_scheduler = NightModeScheduler(get_night_mode_settings)
+
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
 @router.get("/settings", response_model=Dict[str, Any])
+@cached("night_mode:{group_id}")
 async def get_night_mode_config(group_id: int):
     """Get current night mode settings for group"""
     try:
@@ -179,6 +146,8 @@ async def update_night_mode_config(group_id: int, config: NightModeCreate):
             update_dict["exempt_roles"] = config.exempt_roles
         if config.auto_delete_restricted is not None:
             update_dict["auto_delete_restricted"] = config.auto_delete_restricted
+        if config.timezone is not None:
+            update_dict["timezone"] = config.timezone
         
         # Save updated settings
         success = await save_night_mode_settings(group_id, update_dict)
@@ -257,36 +226,19 @@ async def get_night_mode_status(group_id: int) -> NightModeStatus:
     Returns: {is_active, enabled, current_time, start_time, end_time, next_transition}
     """
     try:
-        settings = await get_night_mode_settings(group_id)
-        
-        if not settings:
-            # Not configured = not active
-            current_time = datetime.now().strftime("%H:%M")
-            return NightModeStatus(
-                is_active=False,
-                enabled=False,
-                current_time=current_time,
-                start_time="22:00",
-                end_time="08:00",
-                next_transition="Not configured"
-            )
-        
-        enabled = settings.get("enabled", False)
-        start_time = settings.get("start_time", "22:00")
-        end_time = settings.get("end_time", "08:00")
-        current_time = datetime.now().strftime("%H:%M")
-        
-        # Check if currently in night mode
-        is_active = enabled and is_current_time_in_range(start_time, end_time)
-        next_transition = get_next_transition_time(start_time, end_time)
+        schedule = await night_mode_scheduler.get(group_id)
+        current_time = schedule.now().strftime("%H:%M")
         
         return NightModeStatus(
-            is_active=is_active,
-            enabled=enabled,
+            is_active=await night_mode_scheduler.is_active(group_id),
+            enabled=schedule.enabled,
             current_time=current_time,
-            start_time=start_time,
-            end_time=end_time,
-            next_transition=next_transition
+            start_time=schedule.start_time,
+            end_time=schedule.end_time,
+            next_transition=(
+                describe_next_transition(schedule)
+                if schedule.configured else "Not configured"
+            )
         )
     except Exception as e:
         logger.error(f"Error getting night mode status: {e}")
@@ -372,10 +324,11 @@ async def check_night_mode_permission(group_id: int, user_id: int, content_type:
     Returns: {can_send, reason, is_exempt, is_admin, content_type}
     """
     try:
-        settings = await get_night_mode_settings(group_id)
+        # Compiled schedule: no DB read or time parsing per check
+        schedule = await night_mode_scheduler.get(group_id)
         
         # If night mode not enabled, everything is allowed
-        if not settings or not settings.get("enabled", False):
+        if not schedule.enabled:
             return NightModePermissionCheck(
                 can_send=True,
                 reason="Night mode disabled",
@@ -384,11 +337,8 @@ async def check_night_mode_permission(group_id: int, user_id: int, content_type:
                 content_type=content_type
             )
         
-        # Check if currently in night mode window
-        start_time = settings.get("start_time", "22:00")
-        end_time = settings.get("end_time", "08:00")
-        
-        if not is_current_time_in_range(start_time, end_time):
+        # Active flag is flipped by the scheduler at each transition
+        if not await night_mode_scheduler.is_active(group_id):
             return NightModePermissionCheck(
                 can_send=True,
                 reason="Not in night mode time window",
@@ -398,8 +348,7 @@ async def check_night_mode_permission(group_id: int, user_id: int, content_type:
             )
         
         # Check if user is exempt
-        exempt_users = settings.get("exempt_user_ids", [])
-        if user_id in exempt_users:
+        if user_id in schedule.exempt_user_ids:
             return NightModePermissionCheck(
                 can_send=True,
                 reason="User is exempt from night mode",
@@ -409,9 +358,7 @@ async def check_night_mode_permission(group_id: int, user_id: int, content_type:
             )
         
         # Check if this content type is restricted during night mode
-        restricted_types = settings.get("restricted_content_types", ["stickers", "gifs", "media", "voice"])
-        
-        if content_type not in restricted_types:
+        if not schedule.is_restricted_type(content_type):
             return NightModePermissionCheck(
                 can_send=True,
                 reason=f"{content_type} is allowed during night mode",
@@ -423,10 +370,11 @@ async def check_night_mode_permission(group_id: int, user_id: int, content_type:
         # Content type is restricted
         return NightModePermissionCheck(
             can_send=False,
-            reason=f"{content_type} is blocked during night mode ({start_time}-{end_time})",
+            reason=f"{content_type} is blocked during night mode ({schedule.start_time}-{schedule.end_time})",
             is_exempt=False,
             is_admin=False,
-            content_type=content_type
+            content_type=content_type,
+            auto_delete=schedule.auto_delete
         )
     except Exception as e:
         logger.error(f"Error checking night mode permission: {e}")
@@ -458,6 +406,7 @@ async def list_exemptions(group_id: int):
 
 
 @router.post("/toggle-exempt/{user_id}", response_model=Dict[str, Any])
+@invalidates("night_mode:{group_id}")
 async def toggle_exempt_user(group_id: int, user_id: int):
     """Toggle night mode exemption for a user"""
     try:
@@ -502,6 +451,7 @@ async def toggle_exempt_user(group_id: int, user_id: int):
                 {"$set": settings},
                 upsert=True
             )
+            await _reload_schedule(group_id)
         
         return {
             "status": "success",
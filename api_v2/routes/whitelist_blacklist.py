@@ -11,19 +11,39 @@ from pydantic import BaseModel
 
 from api_v2.models.schemas import (
     WhitelistCreate, WhitelistUpdate, WhitelistResponse,
-    BlacklistCreate, BlacklistUpdate, BlacklistResponse
+    BlacklistCreate, BlacklistUpdate, BlacklistResponse,
+    ContentScanRequest, ContentScanResponse
 )
 from api_v2.core.database import get_db_manager
+from api_v2.cache import cached, invalidates
+from api_v2.services.content_matcher import content_matcher
+from shared.responses import json_response, model_projection
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v2", tags=["whitelist_blacklist"])
 
+# Word filter actions, strongest last
+FILTER_ACTION_ORDER = ["delete", "warn", "mute"]
+
+
+async def _load_blacklist(group_id: int) -> List[dict]:
+    """Active blacklist entries for the compiled content matcher"""
+    db = get_db_manager().db
+    return await db.blacklists.find(
+        {"group_id": group_id, "is_active": True},
+        {"_id": 0, "entry_type": 1, "blocked_item": 1, "reason": 1, "auto_delete": 1, "is_active": 1}
+    ).to_list(None)
+
+
+content_matcher.blacklist_loader = _load_blacklist
+
 
 # ============================================================================
 # WHITELIST MANAGEMENT
 # ============================================================================
 
 @router.post("/groups/{group_id}/whitelist", response_model=WhitelistResponse)
+@invalidates("whitelist:{group_id}:{entry.user_id}")
 async def add_whitelist(group_id: int, entry: WhitelistCreate):
     """
     Add user to whitelist
@@ -44,11 +64,11 @@ async def add_whitelist(group_id: int, entry: WhitelistCreate):
     - "manage_links": Can manage link blacklist
     """
     try:
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         # Check if already whitelisted
         existing = await db.whitelists.find_one({
@@ -90,18 +110,18 @@ async def add_whitelist(group_id: int, entry: WhitelistCreate):
 async def list_whitelist(group_id: int, entry_type: Optional[str] = None):
     """List whitelisted users"""
     try:
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         query = {"group_id": group_id, "is_active": True}
         if entry_type:
             query["entry_type"] = entry_type
         
-        whitelist = await db.whitelists.find(query).to_list(1000)
-        return whitelist
+        whitelist = await db.whitelists.find(query, model_projection(WhitelistResponse)).to_list(1000)
+        return json_response(whitelist)
         
     except Exception as e:
         logger.error(f"Error listing whitelist: {e}")
@@ -109,14 +129,15 @@ async def list_whitelist(group_id: int, entry_type: Optional[str] = None):
 
 
 @router.get("/groups/{group_id}/whitelist/{user_id}")
+@cached("whitelist:{group_id}:{user_id}")
 async def check_whitelist(group_id: int, user_id: int):
     """Check if user is whitelisted and their powers"""
     try:
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         entry = await db.whitelists.find_one({
             "group_id": group_id,
@@ -146,14 +167,15 @@ async def check_whitelist(group_id: int, user_id: int):
 
 
 @router.put("/groups/{group_id}/whitelist/{user_id}")
+@invalidates("whitelist:{group_id}:{user_id}")
 async def update_whitelist(group_id: int, user_id: int, update: WhitelistUpdate):
     """Update whitelist entry"""
     try:
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         # Build update doc
         update_doc = {"updated_at": datetime.now()}
@@ -186,14 +208,15 @@ async def update_whitelist(group_id: int, user_id: int, update: WhitelistUpdate)
 
 
 @router.delete("/groups/{group_id}/whitelist/{user_id}")
+@invalidates("whitelist:{group_id}:{user_id}")
 async def remove_whitelist(group_id: int, user_id: int):
     """Remove user from whitelist"""
     try:
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         result = await db.whitelists.update_one(
             {"group_id": group_id, "user_id": user_id},
@@ -230,11 +253,11 @@ async def add_blacklist(group_id: int, entry: BlacklistCreate):
     - "domain": Block entire domain (domain.com)
     """
     try:
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         # Check if already blacklisted
         existing = await db.blacklists.find_one({
@@ -261,6 +284,7 @@ async def add_blacklist(group_id: int, entry: BlacklistCreate):
         
         result = await db.blacklists.insert_one(blacklist_doc)
         blacklist_doc["_id"] = result.inserted_id
+        content_matcher.apply_blacklist(group_id, blacklist_doc)
         
         logger.info(f"✅ Added to blacklist: group={group_id}, type={entry.entry_type}, item={entry.blocked_item}")
         return blacklist_doc
@@ -276,18 +300,18 @@ async def add_blacklist(group_id: int, entry: BlacklistCreate):
 async def list_blacklist(group_id: int, entry_type: Optional[str] = None):
     """List blacklisted items"""
     try:
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         query = {"group_id": group_id, "is_active": True}
         if entry_type:
             query["entry_type"] = entry_type
         
-        blacklist = await db.blacklists.find(query).to_list(10000)
-        return blacklist
+        blacklist = await db.blacklists.find(query, model_projection(BlacklistResponse)).to_list(10000)
+        return json_response(blacklist)
         
     except Exception as e:
         logger.error(f"Error listing blacklist: {e}")
@@ -296,37 +320,10 @@ async def list_blacklist(group_id: int, entry_type: Optional[str] = None):
 
 @router.get("/groups/{group_id}/blacklist/check/{item_type}/{item_value}")
 async def check_blacklist(group_id: int, item_type: str, item_value: str):
-    """Check if item is blacklisted"""
+    """Check if item is blacklisted (links also match domain/subdomain entries)"""
     try:
-        db_manager = await get_db_manager()
-        if not db_manager:
-            raise HTTPException(status_code=500, detail="Database not available")
-        
-        db = db_manager.client[db_manager.db_name]
-        
-        # For domains, also check if any parent domain is blacklisted
-        query = {
-            "group_id": group_id,
-            "entry_type": item_type,
-            "blocked_item": item_value,
-            "is_active": True
-        }
-        
-        entry = await db.blacklists.find_one(query)
-        
-        # If checking a domain-based link, also check domain blacklist
-        if item_type == "link" and not entry:
-            try:
-                from urllib.parse import urlparse
-                domain = urlparse(item_value).netloc
-                entry = await db.blacklists.find_one({
-                    "group_id": group_id,
-                    "entry_type": "domain",
-                    "blocked_item": domain,
-                    "is_active": True
-                })
-            except:
-                pass
+        matcher = await content_matcher.get(group_id)
+        entry = matcher.match_item(item_type, item_value)
         
         if entry:
             return {
@@ -346,17 +343,53 @@ async def check_blacklist(group_id: int, item_type: str, item_value: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/groups/{group_id}/blacklist/scan", response_model=ContentScanResponse)
+async def scan_content(group_id: int, request: ContentScanRequest):
+    """
+    Scan a whole message in one pass
+    
+    Checks the sender, sticker/GIF, every URL (explicit and found in text)
+    and every filtered word or phrase against the group's compiled matcher.
+    """
+    try:
+        matcher = await content_matcher.get(group_id)
+        hits = matcher.scan(
+            text=request.text,
+            urls=request.urls,
+            user_id=request.user_id,
+            username=request.username,
+            sticker_id=request.sticker_id,
+            gif_id=request.gif_id,
+        )
+        
+        actions = [hit["action"] for hit in hits if hit.get("action") in FILTER_ACTION_ORDER]
+        auto_delete = any(hit.get("auto_delete", True) for hit in hits)
+        action = max(actions, key=FILTER_ACTION_ORDER.index) if actions else ("delete" if auto_delete else None)
+        
+        return ContentScanResponse(
+            group_id=group_id,
+            blocked=bool(hits),
+            auto_delete=auto_delete,
+            action=action,
+            hits=hits
+        )
+        
+    except Exception as e:
+        logger.error(f"Error scanning content: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.put("/groups/{group_id}/blacklist/{blacklist_id}")
 async def update_blacklist(group_id: int, blacklist_id: str, update: BlacklistUpdate):
     """Update blacklist entry"""
     try:
         from bson import ObjectId
         
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         update_doc = {"updated_at": datetime.now()}
         if update.reason is not None:
@@ -375,6 +408,8 @@ async def update_blacklist(group_id: int, blacklist_id: str, update: BlacklistUp
             raise HTTPException(status_code=404, detail="Blacklist entry not found")
         
         entry = await db.blacklists.find_one({"_id": ObjectId(blacklist_id)})
+        if entry:
+            content_matcher.apply_blacklist(group_id, entry)
         return entry
         
     except HTTPException:
@@ -390,11 +425,11 @@ async def remove_blacklist(group_id: int, blacklist_id: str):
     try:
         from bson import ObjectId
         
-        db_manager = await get_db_manager()
+        db_manager = get_db_manager()
         if not db_manager:
             raise HTTPException(status_code=500, detail="Database not available")
         
-        db = db_manager.client[db_manager.db_name]
+        db = db_manager.db
         
         result = await db.blacklists.update_one(
             {"_id": ObjectId(blacklist_id), "group_id": group_id},
@@ -404,6 +439,10 @@ async def remove_blacklist(group_id: int, blacklist_id: str):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Blacklist entry not found")
         
+        entry = await db.blacklists.find_one({"_id": ObjectId(blacklist_id)})
+        if entry:
+            content_matcher.apply_blacklist(group_id, entry)
+        
         logger.info(f"✅ Removed from blacklist: group={group_id}, blacklist_id={blacklist_id}")
         return {"success": True, "message": "Removed from blacklist"}
         
@@ -253,10 +253,11 @@ class ActionService:
         return ActionResponse(**action_data.dict(), id=action_id)
     
     async def get_group_actions(self, group_id: int, page: int = 1, 
-                               per_page: int = 50) -> PaginatedResponse:
+                               per_page: int = 50, cursor: Optional[str] = None,
+                               count: str = "cached") -> PaginatedResponse:
         """Get actions for group"""
         self._ensure_initialized()
-        result = await self.db.get_group_actions(group_id, page, per_page)
+        result = await self.db.get_group_actions(group_id, page, per_page, cursor=cursor, count=count)
         
         return PaginatedResponse(**result)
     
@@ -0,0 +1,407 @@
+"""
+Content Matcher - Compiled per-group blacklist and word-filter matching
+
+Each group's blacklist and word filters are compiled into:
+- an Aho-Corasick automaton over filtered words and phrases
+- a reversed-label trie for domain blacklists (matches subdomains)
+- hash sets for exact links, users, usernames, stickers and GIFs
+
+so scanning a message is linear in its length instead of one DB round
+trip (or one substring check) per filter. Matchers are cached per group
+and patched in place on CRUD; the automaton is rebuilt lazily on the next
+scan after a word change.
+"""
+
+import asyncio
+import logging
+import re
+import time as time_module
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Compiled matchers are re-read after this many seconds (picks up writes
+# made by other workers)
+MATCHER_TTL = 60
+
+# Explicit URLs plus bare domains such as "example.com/path"
+URL_PATTERN = re.compile(
+    r"(?:https?://|www\.)[^\s<>\"']+|\b(?:[a-z0-9-]+\.)+[a-z]{2,24}\b(?:/[^\s<>\"']*)?",
+    re.IGNORECASE,
+)
+
+def normalize_host(value: str) -> str:
+    """Extract a lowercase hostname from a URL or bare domain"""
+    value = value.strip().lower()
+    if "://" not in value:
+        value = "//" + value
+    try:
+        host = urlparse(value).hostname or ""
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize_link(value: str) -> str:
+    """Canonical form used for exact link matches"""
+    value = value.strip().lower().rstrip("/")
+    for prefix in ("https://", "http://"):
+        if value.startswith(prefix):
+            value = value[len(prefix):]
+            break
+    return value[4:] if value.startswith("www.") else value
+
+
+def extract_urls(text: str) -> List[str]:
+    """Find URLs and bare domains in message text"""
+    return URL_PATTERN.findall(text or "")
+
+
+# ============================================================================
+# AHO-CORASICK AUTOMATON
+# ============================================================================
+
+class AhoCorasick:
+    """Multi-pattern substring matcher over lowercase text"""
+
+    def __init__(self):
+        self._patterns: Dict[str, Any] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def add(self, pattern: str, payload: Any = None):
+        """Add or replace a pattern"""
+        pattern = pattern.lower()
+        if pattern:
+            self._patterns[pattern] = payload
+            self._dirty = True
+
+    def discard(self, pattern: str):
+        """Remove a pattern if present"""
+        if pattern.lower() in self._patterns:
+            del self._patterns[pattern.lower()]
+            self._dirty = True
+
+    def payload(self, pattern: str) -> Any:
+        return self._patterns.get(pattern)
+
+    def _build(self):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[str]] = [[]]
+        for pattern in self._patterns:
+            state = 0
+            for char in pattern:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(pattern)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(char, 0)
+                out[nxt].extend(out[fail[nxt]])
+
+        self._goto, self._fail = goto, fail
+        self._out = [tuple(o) for o in out]
+        self._dirty = False
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, pattern) for every occurrence in lowercase text"""
+        if self._dirty:
+            self._build()
+        if not self._patterns:
+            return
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern in out[state]:
+                yield i - len(pattern) + 1, i + 1, pattern
+
+
+# ============================================================================
+# DOMAIN TRIE
+# ============================================================================
+
+class DomainTrie:
+    """Reversed-label trie: an entry for example.com also covers a.b.example.com"""
+
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children: Dict[str, "DomainTrie"] = {}
+        self.entry: Any = None
+
+    def add(self, domain: str, payload: Any):
+        node = self
+        for label in reversed(domain.split(".")):
+            node = node.children.setdefault(label, DomainTrie())
+        node.entry = payload
+
+    def discard(self, domain: str):
+        path = []
+        node = self
+        for label in reversed(domain.split(".")):
+            child = node.children.get(label)
+            if child is None:
+                return
+            path.append((node, label))
+            node = child
+        node.entry = None
+        # Prune empty branches
+        for parent, label in reversed(path):
+            child = parent.children[label]
+            if child.entry is None and not child.children:
+                del parent.children[label]
+            else:
+                break
+
+    def match(self, host: str) -> Any:
+        """Return the entry for the most specific blacklisted suffix of host"""
+        node = self
+        found = None
+        for label in reversed(host.split(".")):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.entry is not None:
+                found = node.entry
+        return found
+
+
+# ============================================================================
+# PER-GROUP MATCHER
+# ============================================================================
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class GroupMatcher:
+    """Compiled blacklist + word filters for one group"""
+
+    def __init__(self, group_id: int):
+        self.group_id = group_id
+        self.words = AhoCorasick()
+        self.domains = DomainTrie()
+        self.links: Dict[str, Dict[str, Any]] = {}
+        self.user_ids: Dict[str, Dict[str, Any]] = {}
+        self.usernames: Dict[str, Dict[str, Any]] = {}
+        self.stickers: Dict[str, Dict[str, Any]] = {}
+        self.gifs: Dict[str, Dict[str, Any]] = {}
+        self.compiled_at = time_module.monotonic()
+
+    # ---- building -----------------------------------------------------------
+
+    def _blacklist_slot(self, entry_type: str, item: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        if entry_type == "link":
+            return self.links, normalize_link(item)
+        if entry_type == "user":
+            item = item.strip()
+            if item.lstrip("-").isdigit():
+                return self.user_ids, item
+            return self.usernames, item.lstrip("@").lower()
+        if entry_type == "sticker":
+            return self.stickers, item.strip()
+        if entry_type == "gif":
+            return self.gifs, item.strip()
+        return None, item
+
+    def apply_blacklist(self, doc: Dict[str, Any]):
+        """Add, update or remove one blacklist document"""
+        entry_type = doc.get("entry_type")
+        item = str(doc.get("blocked_item") or "")
+        if not item:
+            return
+        active = doc.get("is_active", True)
+        entry = {
+            "type": entry_type,
+            "item": item,
+            "reason": doc.get("reason"),
+            "auto_delete": doc.get("auto_delete", True),
+        }
+
+        if entry_type == "domain":
+            host = normalize_host(item)
+            if host:
+                if active:
+                    self.domains.add(host, entry)
+                else:
+                    self.domains.discard(host)
+            return
+
+        slot, key = self._blacklist_slot(entry_type, item)
+        if slot is None or not key:
+            return
+        if active:
+            slot[key] = entry
+        else:
+            slot.pop(key, None)
+
+    def apply_word_filter(self, doc: Dict[str, Any]):
+        """Add, update or remove one word filter document"""
+        word = (doc.get("word") or "").lower().strip()
+        if not word:
+            return
+        if doc.get("active", True):
+            self.words.add(word, {
+                "type": "word",
+                "item": word,
+                "action": doc.get("action", "delete"),
+                "filter_id": doc.get("id"),
+            })
+        else:
+            self.words.discard(word)
+
+    # ---- matching -----------------------------------------------------------
+
+    def match_words(self, text: str) -> List[Dict[str, Any]]:
+        """Whole-word/phrase matches of filtered words in text"""
+        if not text or not len(self.words):
+            return []
+        lowered = text.lower()
+        hits = []
+        seen = set()
+        for start, end, pattern in self.words.iter_matches(lowered):
+            if pattern in seen:
+                continue
+            if start > 0 and _is_word_char(lowered[start - 1]):
+                continue
+            if end < len(lowered) and _is_word_char(lowered[end]):
+                continue
+            seen.add(pattern)
+            hits.append(dict(self.words.payload(pattern), position=start))
+        return hits
+
+    def match_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """Exact link match first, then domain/subdomain match"""
+        entry = self.links.get(normalize_link(url))
+        if entry:
+            return entry
+        host = normalize_host(url)
+        return self.domains.match(host) if host else None
+
+    def match_item(self, item_type: str, value: str) -> Optional[Dict[str, Any]]:
+        """Check a single item (same semantics as the per-item check endpoint)"""
+        if item_type in ("link", "domain"):
+            return self.match_url(value)
+        slot, key = self._blacklist_slot(item_type, value)
+        return slot.get(key) if slot is not None else None
+
+    def scan(
+        self,
+        text: Optional[str] = None,
+        urls: Iterable[str] = (),
+        user_id: Optional[int] = None,
+        username: Optional[str] = None,
+        sticker_id: Optional[str] = None,
+        gif_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Scan a whole message and return every blacklist/word-filter hit"""
+        hits: List[Dict[str, Any]] = []
+
+        if user_id is not None and str(user_id) in self.user_ids:
+            hits.append(self.user_ids[str(user_id)])
+        if username and username.lstrip("@").lower() in self.usernames:
+            hits.append(self.usernames[username.lstrip("@").lower()])
+        if sticker_id and sticker_id in self.stickers:
+            hits.append(self.stickers[sticker_id])
+        if gif_id and gif_id in self.gifs:
+            hits.append(self.gifs[gif_id])
+
+        if text:
+            hits.extend(self.match_words(text))
+
+        if self.links or self.domains.children:
+            seen = set()
+            for url in list(urls) + extract_urls(text or ""):
+                entry = self.match_url(url)
+                if entry and id(entry) not in seen:
+                    seen.add(id(entry))
+                    hits.append(dict(entry, matched=url))
+
+        return hits
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class ContentMatcherRegistry:
+    """
+    Per-group cache of compiled matchers
+
+    Loaders are registered by the modules that own the collections:
+    - blacklist_loader(group_id) -> active blacklist documents
+    - word_filter_loader(group_id) -> active word filter documents
+    """
+
+    def __init__(self):
+        self.blacklist_loader: Optional[Callable[[int], Any]] = None
+        self.word_filter_loader: Optional[Callable[[int], Any]] = None
+        self.matchers: Dict[int, GroupMatcher] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def get(self, group_id: int) -> GroupMatcher:
+        """Get compiled matcher, compiling or refreshing it if needed"""
+        matcher = self.matchers.get(group_id)
+        if matcher and time_module.monotonic() - matcher.compiled_at < MATCHER_TTL:
+            return matcher
+
+        lock = self._locks.setdefault(group_id, asyncio.Lock())
+        async with lock:
+            matcher = self.matchers.get(group_id)
+            if matcher and time_module.monotonic() - matcher.compiled_at < MATCHER_TTL:
+                return matcher
+            return await self.reload(group_id)
+
+    async def reload(self, group_id: int) -> GroupMatcher:
+        """Recompile a group's matcher from the database"""
+        matcher = GroupMatcher(group_id)
+        if self.blacklist_loader:
+            for doc in await self.blacklist_loader(group_id) or []:
+                matcher.apply_blacklist(doc)
+        if self.word_filter_loader:
+            for doc in await self.word_filter_loader(group_id) or []:
+                matcher.apply_word_filter(doc)
+        self.matchers[group_id] = matcher
+        return matcher
+
+    def apply_blacklist(self, group_id: int, doc: Dict[str, Any]):
+        """Patch a cached matcher after a blacklist write (no-op if not cached)"""
+        matcher = self.matchers.get(group_id)
+        if matcher:
+            matcher.apply_blacklist(doc)
+
+    def apply_word_filter(self, group_id: int, doc: Dict[str, Any]):
+        """Patch a cached matcher after a word filter write (no-op if not cached)"""
+        matcher = self.matchers.get(group_id)
+        if matcher:
+            matcher.apply_word_filter(doc)
+
+    def forget(self, group_id: int):
+        """Drop a group's compiled matcher"""
+        self.matchers.pop(group_id, None)
+
+
+content_matcher = ContentMatcherRegistry()
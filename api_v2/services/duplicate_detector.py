@@ -0,0 +1,301 @@
+"""
+Duplicate Detector - Streaming exact and near-duplicate detection
+
+Per group, in memory:
+- exact duplicates are counted in a time-bucketed count-min sketch keyed
+  by the content hash (fixed memory, never undercounts)
+- near duplicates are found with 64-bit SimHash signatures indexed in LSH
+  band buckets (8 bands of 8 bits: signatures within 7 bits always share
+  a band, within MAX_HAMMING_DISTANCE almost always), so a lookup only
+  compares a bounded handful of candidates
+
+Both structures cover a rolling window and are bounded per group, and the
+number of tracked groups is bounded too (least recently active evicted).
+Cost per message is O(message length) for hashing plus O(1) lookups.
+"""
+
+import hashlib
+import re
+import time as time_module
+from array import array
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Rolling window covered by both detectors
+WINDOW_SECONDS = 3600
+BUCKET_SECONDS = 600  # count-min sketch time bucket
+
+# Count-min sketch shape (per time bucket): 2048 x 4 uint16 = 16 KB, so at
+# most 96 KB per group for the whole window
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+CMS_MAX_COUNT = 0xFFFF
+
+# SimHash / LSH
+SIMHASH_BITS = 64
+LSH_BANDS = 8
+MAX_HAMMING_DISTANCE = 10  # one changed word in ~15 lands around 5-10 bits
+MIN_TOKENS_FOR_SIMHASH = 4  # shorter messages only get exact matching
+MAX_BAND_BUCKET_SIZE = 32
+
+# Memory bounds
+MAX_SIGNATURES_PER_GROUP = 5000
+MAX_TRACKED_GROUPS = 500
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_BAND_BITS = SIMHASH_BITS // LSH_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+
+def content_hash(content: str) -> str:
+    """Hash used for exact duplicate matching (same as ModerationResult.hash)"""
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def simhash(content: str) -> Optional[int]:
+    """64-bit SimHash over word unigrams and bigrams (None if too short)"""
+    tokens = _TOKEN_PATTERN.findall(content.lower())
+    if len(tokens) < MIN_TOKENS_FOR_SIMHASH:
+        return None
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    # Column-wise majority vote over the features' bit strings
+    bit_strings = [
+        format(int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "big"), "064b")
+        for f in features
+    ]
+    half = len(bit_strings) / 2
+    majority = "".join("1" if column.count("1") > half else "0" for column in zip(*bit_strings))
+    return int(majority, 2)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count() if hasattr(int, "bit_count") else bin(a ^ b).count("1")
+
+
+class CountMinSketch:
+    """Fixed-size frequency sketch over hex digests"""
+
+    __slots__ = ("table",)
+
+    def __init__(self):
+        self.table = array("H", bytes(2 * CMS_WIDTH * CMS_DEPTH))
+
+    @staticmethod
+    def _indexes(digest: str) -> List[int]:
+        # md5 hex digest -> CMS_DEPTH independent 32-bit slices
+        return [
+            row * CMS_WIDTH + int(digest[row * 8:(row + 1) * 8], 16) % CMS_WIDTH
+            for row in range(CMS_DEPTH)
+        ]
+
+    def add(self, digest: str):
+        for index in self._indexes(digest):
+            if self.table[index] < CMS_MAX_COUNT:
+                self.table[index] += 1
+
+    def estimate(self, digest: str) -> int:
+        return min(self.table[index] for index in self._indexes(digest))
+
+
+class _Signature:
+    __slots__ = ("timestamp", "signature", "cluster_id", "message_id")
+
+    def __init__(self, timestamp: float, signature: int, cluster_id: int, message_id: Optional[int]):
+        self.timestamp = timestamp
+        self.signature = signature
+        self.cluster_id = cluster_id
+        self.message_id = message_id
+
+
+class GroupDuplicateState:
+    """Rolling detector state for one group"""
+
+    def __init__(self):
+        self.sketches: "OrderedDict[int, CountMinSketch]" = OrderedDict()  # bucket -> sketch
+        self.signatures: Deque[_Signature] = deque()
+        self.bands: Dict[Tuple[int, int], Deque[_Signature]] = {}
+        self.clusters: Dict[int, Dict[str, Any]] = {}
+        self._next_cluster = 1
+
+    # ---- exact --------------------------------------------------------------
+
+    def _expire_sketches(self, now: float):
+        oldest = int((now - WINDOW_SECONDS) // BUCKET_SECONDS)
+        while self.sketches and next(iter(self.sketches)) <= oldest:
+            self.sketches.popitem(last=False)
+
+    def exact_count(self, digest: str, now: float) -> int:
+        self._expire_sketches(now)
+        return sum(sketch.estimate(digest) for sketch in self.sketches.values())
+
+    def add_exact(self, digest: str, now: float):
+        bucket = int(now // BUCKET_SECONDS)
+        sketch = self.sketches.get(bucket)
+        if sketch is None:
+            sketch = self.sketches[bucket] = CountMinSketch()
+        sketch.add(digest)
+
+    # ---- near-duplicate -----------------------------------------------------
+
+    @staticmethod
+    def _band_keys(signature: int) -> List[Tuple[int, int]]:
+        return [(band, signature >> (band * _BAND_BITS) & _BAND_MASK) for band in range(LSH_BANDS)]
+
+    def _evict_oldest(self):
+        entry = self.signatures.popleft()
+        for key in self._band_keys(entry.signature):
+            bucket = self.bands.get(key)
+            if bucket:
+                try:
+                    bucket.remove(entry)
+                except ValueError:
+                    pass
+                if not bucket:
+                    del self.bands[key]
+        cluster = self.clusters.get(entry.cluster_id)
+        if cluster:
+            cluster["live"] -= 1
+            if cluster["live"] <= 0:
+                del self.clusters[entry.cluster_id]
+
+    def _expire_signatures(self, now: float):
+        cutoff = now - WINDOW_SECONDS
+        while self.signatures and self.signatures[0].timestamp < cutoff:
+            self._evict_oldest()
+
+    def add_near(self, signature: int, content: str, now: float,
+                 message_id: Optional[int], user_id: Optional[int]) -> Dict[str, Any]:
+        self._expire_signatures(now)
+
+        match = None
+        for key in self._band_keys(signature):
+            for candidate in self.bands.get(key, ()):
+                if hamming_distance(candidate.signature, signature) <= MAX_HAMMING_DISTANCE:
+                    match = candidate
+                    break
+            if match:
+                break
+
+        if match and match.cluster_id in self.clusters:
+            cluster_id = match.cluster_id
+            cluster = self.clusters[cluster_id]
+        else:
+            cluster_id = self._next_cluster
+            self._next_cluster += 1
+            cluster = self.clusters[cluster_id] = {
+                "cluster_id": cluster_id,
+                "size": 0,
+                "live": 0,
+                "first_seen": now,
+                "sample": content[:200],
+                "message_ids": deque(maxlen=20),
+                "user_ids": set(),
+            }
+        cluster["size"] += 1
+        cluster["live"] += 1
+        cluster["last_seen"] = now
+        if message_id is not None:
+            cluster["message_ids"].append(message_id)
+        if user_id is not None and len(cluster["user_ids"]) < 100:
+            cluster["user_ids"].add(user_id)
+
+        entry = _Signature(now, signature, cluster_id, message_id)
+        self.signatures.append(entry)
+        for key in self._band_keys(signature):
+            bucket = self.bands.setdefault(key, deque(maxlen=MAX_BAND_BUCKET_SIZE))
+            bucket.append(entry)
+        while len(self.signatures) > MAX_SIGNATURES_PER_GROUP:
+            self._evict_oldest()
+
+        return cluster
+
+
+class DuplicateDetector:
+    """Per-group rolling duplicate/near-duplicate detector"""
+
+    def __init__(self):
+        self.groups: "OrderedDict[int, GroupDuplicateState]" = OrderedDict()
+
+    def _state(self, group_id: int) -> GroupDuplicateState:
+        state = self.groups.get(group_id)
+        if state is None:
+            state = self.groups[group_id] = GroupDuplicateState()
+            while len(self.groups) > MAX_TRACKED_GROUPS:
+                self.groups.popitem(last=False)
+        else:
+            self.groups.move_to_end(group_id)
+        return state
+
+    def observe(
+        self,
+        group_id: int,
+        content: str,
+        message_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        digest: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Record a message and report how often it (or a near copy) was seen"""
+        now = now or time_module.time()
+        digest = digest or content_hash(content)
+        state = self._state(group_id)
+
+        duplicate_count = state.exact_count(digest, now)
+        state.add_exact(digest, now)
+
+        near_count = 0
+        cluster_id = None
+        signature = simhash(content)
+        if signature is not None:
+            cluster = state.add_near(signature, content, now, message_id, user_id)
+            cluster_id = cluster["cluster_id"]
+            near_count = cluster["size"] - 1
+
+        return {
+            "is_duplicate": duplicate_count > 0,
+            "duplicate_count": duplicate_count,
+            "is_near_duplicate": near_count > 0,
+            "near_duplicate_count": near_count,
+            "cluster_id": cluster_id,
+            "spam_score": min(max(duplicate_count, near_count) * 0.3, 1.0),
+        }
+
+    def count(self, group_id: int, digest: str, now: Optional[float] = None) -> int:
+        """Exact occurrences of a content hash within the window"""
+        state = self.groups.get(group_id)
+        if state is None:
+            return 0
+        return state.exact_count(digest, now or time_module.time())
+
+    def clusters(self, group_id: int, min_size: int = 2, limit: int = 20) -> List[Dict[str, Any]]:
+        """Largest live near-duplicate clusters in the window"""
+        state = self.groups.get(group_id)
+        if state is None:
+            return []
+        state._expire_signatures(time_module.time())
+        found = [c for c in state.clusters.values() if c["size"] >= min_size]
+        found.sort(key=lambda c: c["size"], reverse=True)
+        return [
+            {
+                "cluster_id": c["cluster_id"],
+                "size": c["size"],
+                "first_seen": c["first_seen"],
+                "last_seen": c["last_seen"],
+                "sample": c["sample"],
+                "message_ids": list(c["message_ids"]),
+                "user_count": len(c["user_ids"]),
+                "user_ids": sorted(c["user_ids"]),
+            }
+            for c in found[:limit]
+        ]
+
+    def stats(self, group_id: int) -> Dict[str, Any]:
+        state = self.groups.get(group_id)
+        if state is None:
+            return {"tracked_signatures": 0, "active_clusters": 0, "sketch_buckets": 0}
+        return {
+            "tracked_signatures": len(state.signatures),
+            "active_clusters": len(state.clusters),
+            "sketch_buckets": len(state.sketches),
+        }
@@ -0,0 +1,289 @@
+"""
+Night Mode Scheduler - Compiled schedules with transition-driven state
+
+Night mode settings are compiled once per group into minute-of-day
+intervals, a timezone, an exempt-user set and a content-type bitmask.
+A background scheduler flips each group's active flag only at its
+transitions and publishes the change, so permission checks are a dict
+lookup with no DB read or time-string parsing.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import time as time_module
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_START_TIME = "22:00"
+DEFAULT_END_TIME = "08:00"
+DEFAULT_RESTRICTED_CONTENT_TYPES = ["stickers", "gifs", "media", "voice"]
+
+# Content type bits (append only)
+CONTENT_TYPES = ("text", "stickers", "gifs", "media", "voice", "links", "polls", "documents")
+CONTENT_TYPE_BITS: Dict[str, int] = {name: 1 << i for i, name in enumerate(CONTENT_TYPES)}
+
+# Redis channel transitions are published on
+TRANSITIONS_CHANNEL = "night_mode:transitions"
+
+# Compiled configs are re-read after this many seconds (picks up writes
+# made by other workers)
+CONFIG_TTL = 60
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_minute_of_day(time_str: Optional[str], default: str) -> int:
+    """Parse 'HH:MM' into minutes since midnight"""
+    try:
+        hours, minutes = (time_str or default).split(":")[:2]
+        value = int(hours) * 60 + int(minutes)
+        if not 0 <= value < MINUTES_PER_DAY:
+            raise ValueError("out of range")
+        return value
+    except Exception as e:
+        logger.warning(f"Could not parse time string '{time_str}': {e}")
+        hours, minutes = default.split(":")
+        return int(hours) * 60 + int(minutes)
+
+
+def content_types_to_mask(content_types: List[str]) -> Tuple[int, FrozenSet[str]]:
+    """Encode content types as a bitmask plus any types without a bit"""
+    mask = 0
+    extra = set()
+    for content_type in content_types:
+        bit = CONTENT_TYPE_BITS.get(content_type)
+        if bit:
+            mask |= bit
+        else:
+            extra.add(content_type)
+    return mask, frozenset(extra)
+
+
+def _resolve_timezone(name: Optional[str]) -> Optional[tzinfo]:
+    if not name or ZoneInfo is None:
+        return None
+    try:
+        return ZoneInfo(name)
+    except Exception as e:
+        logger.warning(f"Unknown timezone '{name}': {e}, using server time")
+        return None
+
+
+class CompiledNightMode:
+    """Pre-parsed night mode schedule for one group"""
+
+    __slots__ = (
+        "group_id", "enabled", "start_time", "end_time", "start_minute", "end_minute",
+        "timezone", "exempt_user_ids", "restricted_mask", "restricted_extra",
+        "auto_delete", "configured", "signature", "compiled_at",
+    )
+
+    def __init__(self, group_id: int, settings: Optional[Dict[str, Any]]):
+        settings = settings or {}
+        self.group_id = group_id
+        self.enabled = bool(settings.get("enabled", False))
+        self.start_time = settings.get("start_time") or DEFAULT_START_TIME
+        self.end_time = settings.get("end_time") or DEFAULT_END_TIME
+        self.start_minute = parse_minute_of_day(self.start_time, DEFAULT_START_TIME)
+        self.end_minute = parse_minute_of_day(self.end_time, DEFAULT_END_TIME)
+        self.timezone = _resolve_timezone(settings.get("timezone"))
+        self.exempt_user_ids = frozenset(settings.get("exempt_user_ids") or ())
+        self.restricted_mask, self.restricted_extra = content_types_to_mask(
+            settings.get("restricted_content_types") or DEFAULT_RESTRICTED_CONTENT_TYPES
+        )
+        self.auto_delete = bool(settings.get("auto_delete_restricted", True))
+        self.configured = bool(settings)
+        self.signature = (
+            self.configured, self.enabled, self.start_minute, self.end_minute, settings.get("timezone"),
+            self.exempt_user_ids, self.restricted_mask, self.restricted_extra, self.auto_delete,
+        )
+        self.compiled_at = time_module.monotonic()
+
+    def now(self) -> datetime:
+        """Current time in the schedule's timezone (server time if unset)"""
+        return datetime.now(self.timezone) if self.timezone else datetime.now()
+
+    def in_window(self, minute: int) -> bool:
+        """Whether minute-of-day falls in the night window (handles midnight)"""
+        if self.end_minute < self.start_minute:
+            return minute >= self.start_minute or minute < self.end_minute
+        return self.start_minute <= minute < self.end_minute
+
+    def is_active_at(self, moment: datetime) -> bool:
+        """Whether night mode is active at moment"""
+        return self.enabled and self.in_window(moment.hour * 60 + moment.minute)
+
+    def next_transition(self, moment: datetime) -> datetime:
+        """Next start or end boundary strictly after moment"""
+        minute = moment.hour * 60 + moment.minute
+        target = self.end_minute if self.in_window(minute) else self.start_minute
+        delta = (target - minute) % MINUTES_PER_DAY or MINUTES_PER_DAY
+        boundary = moment.replace(second=0, microsecond=0) + timedelta(minutes=delta)
+        return boundary
+
+    def is_restricted_type(self, content_type: str) -> bool:
+        """Whether content type is restricted while active"""
+        bit = CONTENT_TYPE_BITS.get(content_type)
+        if bit:
+            return bool(self.restricted_mask & bit)
+        return content_type in self.restricted_extra
+
+
+class NightModeScheduler:
+    """
+    Registry of compiled night mode schedules plus the transition loop
+
+    - `get()` compiles a group's schedule on first use (one DB read)
+    - `is_active()` reads the flag maintained by the loop
+    - `reload()` recompiles after a settings write
+    """
+
+    def __init__(self, loader: Callable[[int], Any]):
+        """
+        Args:
+            loader: async callable returning a group's settings document
+        """
+        self.loader = loader
+        self.schedules: Dict[int, CompiledNightMode] = {}
+        self.active: Dict[int, bool] = {}
+        self.listeners: List[Callable[[int, bool], Any]] = []
+        self.redis = None
+        self._heap: List[Tuple[float, int, int]] = []  # (timestamp, group_id, version)
+        self._versions: Dict[int, int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    # ========================================================================
+    # REGISTRY
+    # ========================================================================
+
+    async def get(self, group_id: int) -> CompiledNightMode:
+        """Get compiled schedule, compiling or refreshing it if needed"""
+        compiled = self.schedules.get(group_id)
+        if compiled and time_module.monotonic() - compiled.compiled_at < CONFIG_TTL:
+            return compiled
+
+        lock = self._locks.setdefault(group_id, asyncio.Lock())
+        async with lock:
+            compiled = self.schedules.get(group_id)
+            if compiled and time_module.monotonic() - compiled.compiled_at < CONFIG_TTL:
+                return compiled
+            return await self.reload(group_id)
+
+    async def reload(self, group_id: int, settings: Optional[Dict[str, Any]] = None) -> CompiledNightMode:
+        """Recompile a group's schedule from settings (loaded if not given)"""
+        if settings is None:
+            settings = await self.loader(group_id)
+        compiled = CompiledNightMode(group_id, settings)
+        current = self.schedules.get(group_id)
+        if current and current.signature == compiled.signature:
+            # Unchanged - keep the queued transition
+            current.compiled_at = compiled.compiled_at
+            return current
+        self.schedules[group_id] = compiled
+        self._schedule(compiled)
+        return compiled
+
+    def forget(self, group_id: int):
+        """Drop a group's compiled schedule"""
+        self.schedules.pop(group_id, None)
+        self.active.pop(group_id, None)
+        self._versions[group_id] = self._versions.get(group_id, 0) + 1
+
+    async def is_active(self, group_id: int) -> bool:
+        """Whether night mode is currently active for group"""
+        if group_id not in self.active:
+            await self.get(group_id)
+        return self.active.get(group_id, False)
+
+    # ========================================================================
+    # TRANSITIONS
+    # ========================================================================
+
+    def _schedule(self, compiled: CompiledNightMode):
+        """Set current state and queue the next transition"""
+        version = self._versions.get(compiled.group_id, 0) + 1
+        self._versions[compiled.group_id] = version
+
+        now = compiled.now()
+        self._set_active(compiled.group_id, compiled.is_active_at(now))
+        if compiled.enabled:
+            heapq.heappush(
+                self._heap,
+                (compiled.next_transition(now).timestamp(), compiled.group_id, version)
+            )
+            self._wakeup.set()
+
+    def _set_active(self, group_id: int, is_active: bool):
+        previous = self.active.get(group_id)
+        self.active[group_id] = is_active
+        if previous is not None and previous != is_active:
+            self._publish(group_id, is_active)
+
+    def _publish(self, group_id: int, is_active: bool):
+        logger.info(f"🌙 Night mode {'started' if is_active else 'ended'} for group {group_id}")
+        for listener in self.listeners:
+            try:
+                result = listener(group_id, is_active)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.warning(f"Night mode listener error: {e}")
+        if self.redis:
+            message = json.dumps({"group_id": group_id, "is_active": is_active})
+            asyncio.ensure_future(self._publish_redis(message))
+
+    async def _publish_redis(self, message: str):
+        try:
+            await self.redis.publish(TRANSITIONS_CHANNEL, message)
+        except Exception as e:
+            logger.warning(f"Night mode publish error: {e}")
+
+    def _run_due(self):
+        """Apply every transition whose time has passed"""
+        now_ts = time_module.time()
+        while self._heap and self._heap[0][0] <= now_ts:
+            _, group_id, version = heapq.heappop(self._heap)
+            compiled = self.schedules.get(group_id)
+            if compiled is None or self._versions.get(group_id) != version:
+                continue  # Superseded by a reload
+            self._schedule(compiled)
+
+    async def run(self):
+        """Transition loop - sleeps until the next transition"""
+        while True:
+            self._run_due()
+            self._wakeup.clear()
+            delay = CONFIG_TTL
+            if self._heap:
+                delay = min(delay, max(0.0, self._heap[0][0] - time_module.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, redis=None):
+        """Start the transition loop"""
+        self.redis = redis
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the transition loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
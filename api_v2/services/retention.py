@@ -0,0 +1,271 @@
+"""
+Retention Cohorts - Incremental weekly cohort tracking
+
+Instead of aggregating a group's whole action history on every retention
+query, activity is folded into two compact collections as it is logged:
+
+    retention_users    one doc per (group, user): first-seen week and a
+                       week-activity bitmap (bit i = active i weeks later)
+    retention_cohorts  one doc per (group, cohort week): cohort size,
+                       active users per week offset, and a histogram of
+                       users by their latest active offset
+
+Repeated activity within an already-marked week is absorbed by an
+in-process cache, so most actions cost no extra write. Retention queries
+read at most one document per requested cohort, whatever the group's age.
+"""
+
+import logging
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+USERS_COLLECTION = "retention_users"
+COHORTS_COLLECTION = "retention_cohorts"
+
+# Week offsets tracked per user (fits a signed int64 bitmap)
+MAX_WEEK_OFFSET = 62
+
+# Weeks are counted from this Monday
+EPOCH_MONDAY = datetime(1970, 1, 5)
+WEEK_MS = 7 * 24 * 3600 * 1000
+
+# (group_id, user_id) -> (first_week, mask) cache bound
+MAX_CACHED_USERS = 100_000
+
+
+def week_index(when: datetime) -> int:
+    """Weeks since EPOCH_MONDAY (Monday-based, timezone-naive UTC)"""
+    if when.tzinfo is not None:
+        when = when.replace(tzinfo=None) - (when.utcoffset() or timedelta(0))
+    return (when - EPOCH_MONDAY).days // 7
+
+
+def week_start(week: int) -> datetime:
+    """Monday starting a week index"""
+    return EPOCH_MONDAY + timedelta(weeks=week)
+
+
+class RetentionCohortTracker:
+    """Maintains and queries incremental weekly retention cohorts"""
+
+    def __init__(self, db):
+        """
+        Args:
+            db: Motor database
+        """
+        self.db = db
+        self._users: "OrderedDict[Tuple[int, int], Tuple[int, int]]" = OrderedDict()
+
+    # ========================================================================
+    # INGEST
+    # ========================================================================
+
+    def _remember(self, key: Tuple[int, int], first_week: int, mask: int):
+        self._users[key] = (first_week, mask)
+        self._users.move_to_end(key)
+        while len(self._users) > MAX_CACHED_USERS:
+            self._users.popitem(last=False)
+
+    async def record(self, group_id: int, user_id: int, when: Optional[datetime] = None):
+        """Fold one unit of user activity into the group's cohorts"""
+        if group_id is None or user_id is None:
+            return
+        week = week_index(when or datetime.utcnow())
+        key = (group_id, user_id)
+
+        cached = self._users.get(key)
+        if cached:
+            first_week, mask = cached
+            offset = week - first_week
+            if offset < 0 or offset > MAX_WEEK_OFFSET or mask >> offset & 1:
+                self._users.move_to_end(key)
+                return
+        else:
+            doc = await self.db[USERS_COLLECTION].find_one_and_update(
+                {"group_id": group_id, "user_id": user_id},
+                {"$setOnInsert": {"first_week": week, "mask": 0}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            first_week, mask = doc["first_week"], doc.get("mask", 0)
+            offset = week - first_week
+            if offset < 0 or offset > MAX_WEEK_OFFSET or mask >> offset & 1:
+                self._remember(key, first_week, mask)
+                return
+
+        before = await self.db[USERS_COLLECTION].find_one_and_update(
+            {"group_id": group_id, "user_id": user_id},
+            {"$bit": {"mask": {"or": 1 << offset}}},
+            return_document=ReturnDocument.BEFORE
+        )
+        previous = before.get("mask", 0) if before else 0
+        self._remember(key, first_week, previous | 1 << offset)
+        if previous >> offset & 1:
+            return  # Another worker marked it first
+
+        await self.db[COHORTS_COLLECTION].update_one(
+            {"group_id": group_id, "cohort_week": first_week},
+            {"$inc": self._cohort_increments(previous, offset)},
+            upsert=True
+        )
+
+    @staticmethod
+    def _cohort_increments(previous_mask: int, offset: int) -> Dict[str, int]:
+        """Counter changes when bit `offset` is newly set on a user's mask"""
+        inc = {f"active.{offset}": 1}
+        if previous_mask == 0:
+            inc["size"] = 1
+        previous_last = previous_mask.bit_length() - 1
+        if offset > previous_last:
+            inc[f"last.{offset}"] = 1
+            if previous_last >= 0:
+                inc[f"last.{previous_last}"] = -1
+        return inc
+
+    async def backfill(self, group_id: int, since: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Rebuild a group's cohorts from the actions collection (one-off,
+        e.g. after deploying cohort tracking on an existing group)
+        """
+        match: Dict[str, Any] = {"group_id": group_id, "user_id": {"$ne": None}}
+        if since:
+            # Same date the weeks are computed from: timestamp, else created_at
+            match["$or"] = [
+                {"timestamp": {"$gte": since}},
+                {"timestamp": None, "created_at": {"$gte": since}},
+            ]
+        pipeline = [
+            {"$match": match},
+            {"$project": {
+                "user_id": 1,
+                "week": {"$floor": {"$divide": [
+                    {"$subtract": [{"$ifNull": ["$timestamp", "$created_at"]}, EPOCH_MONDAY]},
+                    WEEK_MS
+                ]}}
+            }},
+            {"$group": {"_id": {"user_id": "$user_id", "week": "$week"}}},
+            {"$group": {"_id": "$_id.user_id", "weeks": {"$push": "$_id.week"}}},
+        ]
+
+        cohorts: Dict[int, Dict[str, Any]] = {}
+        user_ops = []
+        async for row in self.db.actions.aggregate(pipeline, allowDiskUse=True):
+            weeks = sorted(int(w) for w in row["weeks"] if w is not None)
+            if not weeks:
+                continue
+            first_week = weeks[0]
+            mask = 0
+            for week in weeks:
+                if week - first_week <= MAX_WEEK_OFFSET:
+                    mask |= 1 << (week - first_week)
+            user_ops.append(UpdateOne(
+                {"group_id": group_id, "user_id": row["_id"]},
+                {"$set": {"first_week": first_week, "mask": mask}},
+                upsert=True
+            ))
+
+            cohort = cohorts.setdefault(first_week, {"size": 0, "active": {}, "last": {}})
+            cohort["size"] += 1
+            for offset in range(mask.bit_length()):
+                if mask >> offset & 1:
+                    cohort["active"][str(offset)] = cohort["active"].get(str(offset), 0) + 1
+            last = str(mask.bit_length() - 1)
+            cohort["last"][last] = cohort["last"].get(last, 0) + 1
+
+        await self.db[USERS_COLLECTION].delete_many({"group_id": group_id})
+        await self.db[COHORTS_COLLECTION].delete_many({"group_id": group_id})
+        if user_ops:
+            await self.db[USERS_COLLECTION].bulk_write(user_ops, ordered=False)
+        if cohorts:
+            await self.db[COHORTS_COLLECTION].insert_many([
+                dict(cohort, group_id=group_id, cohort_week=week) for week, cohort in cohorts.items()
+            ])
+        for key in [k for k in self._users if k[0] == group_id]:
+            del self._users[key]
+
+        return {"users": len(user_ops), "cohorts": len(cohorts)}
+
+    # ========================================================================
+    # QUERIES
+    # ========================================================================
+
+    async def _load_cohorts(self, group_id: int, cohorts: int) -> Tuple[int, List[Dict[str, Any]]]:
+        current = week_index(datetime.utcnow())
+        docs = await self.db[COHORTS_COLLECTION].find(
+            {"group_id": group_id, "cohort_week": {"$gt": current - cohorts}},
+            {"_id": 0}
+        ).sort("cohort_week", 1).to_list(cohorts)
+        return current, docs
+
+    async def retention_matrix(self, group_id: int, cohorts: int = 12, weeks: int = 12) -> Dict[str, Any]:
+        """
+        Cohort x week-offset retention matrix (percent of cohort active)
+
+        Cells in the future are None.
+        """
+        weeks = min(weeks, MAX_WEEK_OFFSET + 1)
+        current, docs = await self._load_cohorts(group_id, cohorts)
+
+        sizes = [doc.get("size", 0) for doc in docs]
+        counts = [
+            [doc.get("active", {}).get(str(offset), 0) for offset in range(weeks)]
+            for doc in docs
+        ]
+        elapsed = [current - doc["cohort_week"] for doc in docs]
+
+        if NUMPY_AVAILABLE and docs:
+            count_arr = np.asarray(counts, dtype=np.float64)
+            size_arr = np.asarray(sizes, dtype=np.float64)[:, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rates = np.where(size_arr > 0, count_arr / size_arr * 100, 0.0)
+            future = np.arange(weeks)[None, :] > np.asarray(elapsed)[:, None]
+            matrix = [
+                [None if f else round(float(v), 2) for v, f in zip(row, future_row)]
+                for row, future_row in zip(rates, future)
+            ]
+        else:
+            matrix = [
+                [
+                    None if offset > elapsed[i] else
+                    (round(counts[i][offset] / sizes[i] * 100, 2) if sizes[i] else 0.0)
+                    for offset in range(weeks)
+                ]
+                for i in range(len(docs))
+            ]
+
+        return {
+            "group_id": group_id,
+            "cohorts": [week_start(doc["cohort_week"]).date().isoformat() for doc in docs],
+            "sizes": sizes,
+            "weeks": weeks,
+            "matrix": matrix,
+        }
+
+    async def retention_rates(self, group_id: int, cohort_days: int = 7, cohorts: int = 52) -> Dict[str, float]:
+        """
+        Percent of each weekly cohort still active at least `cohort_days`
+        after joining (week granularity), keyed "week_<ISO week>"
+        """
+        min_offset = max(1, math.ceil(cohort_days / 7))
+        _, docs = await self._load_cohorts(group_id, cohorts)
+
+        retention = {}
+        for doc in docs:
+            size = doc.get("size", 0)
+            last = doc.get("last", {})
+            still_active = sum(count for offset, count in last.items() if int(offset) >= min_offset)
+            iso_week = week_start(doc["cohort_week"]).isocalendar()[1]
+            retention[f"week_{iso_week}"] = still_active / size * 100 if size else 0
+        return retention
@@ -0,0 +1,178 @@
+"""
+Write-Behind Buffer - Batched, non-blocking persistence
+
+Callers enqueue items and return immediately; a background task hands
+them to an async flush function in batches, when either the batch size
+is reached or the flush interval elapses. The queue is bounded: once
+full the oldest items are dropped and counted, so a slow or unavailable
+database degrades into lost log records rather than unbounded memory.
+"""
+
+import asyncio
+import logging
+import time as time_module
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+DEFAULT_MAX_PENDING = 20000
+
+
+class WriteBehindBuffer:
+    """Bounded in-memory queue flushed in batches by a background task"""
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Any]], Awaitable[Any]],
+        name: str = "write_behind",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        """
+        Args:
+            flush_fn: async callable persisting one batch
+            name: Label used in logs
+            batch_size: Flush as soon as this many items are pending
+            flush_interval: Flush at least this often while items are pending
+            max_pending: Queue bound; oldest items are dropped beyond it
+        """
+        self.flush_fn = flush_fn
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending: Deque[Any] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        # Metrics
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flush_errors = 0
+        self.flush_count = 0
+        self.high_water = 0
+        self.last_flush_ms = 0.0
+        self.last_flush_at: Optional[float] = None
+
+    # ========================================================================
+    # PRODUCER SIDE
+    # ========================================================================
+
+    def add(self, item: Any):
+        """Enqueue one item (never blocks)"""
+        self.add_many((item,))
+
+    def add_many(self, items: Iterable[Any]):
+        """Enqueue several items (never blocks)"""
+        for item in items:
+            self._pending.append(item)
+            self.enqueued += 1
+        self._enforce_bound()
+        self.high_water = max(self.high_water, len(self._pending))
+        self._ensure_started()
+        if len(self._pending) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+
+    def _enforce_bound(self):
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            for _ in range(overflow):
+                self._pending.popleft()
+            self.dropped += overflow
+            logger.warning(f"{self.name}: buffer full, dropped {overflow} oldest items")
+
+    # ========================================================================
+    # FLUSHING
+    # ========================================================================
+
+    def _ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop yet - items wait for start()/flush()
+        self.start()
+
+    def start(self):
+        """Start the background flush task"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Flush everything pending, one batch at a time"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                started = time_module.perf_counter()
+                try:
+                    await self.flush_fn(batch)
+                except asyncio.CancelledError:
+                    self._pending.extendleft(reversed(batch))
+                    raise
+                except Exception as e:
+                    self.flush_errors += 1
+                    logger.error(f"{self.name}: flush of {len(batch)} items failed: {e}")
+                    # Put the batch back (bounded) and retry on the next cycle
+                    self._pending.extendleft(reversed(batch))
+                    self._enforce_bound()
+                    return
+                self.flushed += len(batch)
+                self.flush_count += 1
+                self.last_flush_ms = (time_module.perf_counter() - started) * 1000
+                self.last_flush_at = time_module.time()
+
+    async def close(self):
+        """Stop the flush task and persist what is left"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    # ========================================================================
+    # METRICS
+    # ========================================================================
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Backpressure and throughput counters"""
+        return {
+            "pending": len(self._pending),
+            "capacity": self.max_pending,
+            "utilization": round(len(self._pending) / self.max_pending, 4) if self.max_pending else 0,
+            "high_water": self.high_water,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "last_flush_at": self.last_flush_at,
+        }
@@ -1 +1,20 @@
 """Telegram integration - Wrapper for Telegram Bot API operations"""
+
+from api_v2.telegram.api import TelegramAPIWrapper, TelegramUserStatus
+from api_v2.telegram.client import (
+    TelegramAPIError,
+    TelegramBotClient,
+    close_telegram_client,
+    get_telegram_client,
+    init_telegram_client,
+)
+
+__all__ = [
+    "TelegramAPIWrapper",
+    "TelegramUserStatus",
+    "TelegramAPIError",
+    "TelegramBotClient",
+    "init_telegram_client",
+    "get_telegram_client",
+    "close_telegram_client",
+]
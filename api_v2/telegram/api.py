@@ -1,12 +1,14 @@
 """
 Telegram API Wrapper - Unified interface for Telegram operations
-Supports both Python-Telegram-Bot and Pyrogram frameworks
+Backed by the shared pooled TelegramBotClient (api_v2.telegram.client)
 """
 
 import logging
 from typing import Optional, Dict, Any, List
 from enum import Enum
 
+from api_v2.telegram.client import TelegramBotClient, get_telegram_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,20 +26,31 @@ class TelegramAPIWrapper:
     """
     Unified Telegram API wrapper
     Provides common interface for bot operations
+    
+    `bot` is the shared TelegramBotClient, so aiogram-style calls such as
+    `wrapper.bot.ban_chat_member(...)` go through the same connection
+    pool, rate limiter and flood-wait handling as everything else.
     """
     
-    def __init__(self, bot_token: str, framework: str = "ptb"):
+    def __init__(self, bot_token: Optional[str] = None, framework: str = "ptb",
+                 client: Optional[TelegramBotClient] = None):
         """
         Initialize wrapper
         
         Args:
-            bot_token: Telegram bot token
-            framework: "ptb" (python-telegram-bot) or "pyrogram"
+            bot_token: Telegram bot token (used only if no shared client exists yet)
+            framework: Kept for compatibility; all calls use the Bot API client
+            client: Client to use instead of the shared one
         """
-        self.bot_token = bot_token
+        self.bot = client or get_telegram_client(bot_token)
+        self.bot_token = self.bot.token
         self.framework = framework.lower()
         self.logger = logging.getLogger(self.__class__.__name__)
     
+    async def _ok(self, method: str, **params) -> bool:
+        result = await self.bot.call(method, **params)
+        return result["success"]
+    
     # ========================================================================
     # GROUP INFORMATION
     # ========================================================================
@@ -55,36 +68,26 @@ class TelegramAPIWrapper:
                 "photo_url": str
             }
         """
-        try:
-            if self.framework == "ptb":
-                # Python-Telegram-Bot implementation would go here
-                pass
-            elif self.framework == "pyrogram":
-                # Pyrogram implementation would go here
-                pass
-            
-            return {
-                "group_id": group_id,
-                "title": "",
-                "member_count": 0,
-                "description": "",
-                "photo_url": None
-            }
-        except Exception as e:
-            self.logger.error(f"Error getting group info: {e}")
+        chat = await self.bot.call("getChat", chat_id=group_id)
+        if not chat["success"]:
+            self.logger.error(f"Error getting group info: {chat['error']}")
             return {}
+        data = chat["data"] or {}
+        return {
+            "group_id": group_id,
+            "title": data.get("title", ""),
+            "member_count": await self.get_group_members_count(group_id),
+            "description": data.get("description", ""),
+            "photo_url": None
+        }
     
     async def get_group_members_count(self, group_id: int) -> int:
         """Get member count"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return 0
-        except Exception as e:
-            self.logger.error(f"Error getting member count: {e}")
+        result = await self.bot.call("getChatMemberCount", chat_id=group_id)
+        if not result["success"]:
+            self.logger.error(f"Error getting member count: {result['error']}")
             return 0
+        return result["data"] or 0
     
     async def get_group_admins(self, group_id: int) -> List[Dict[str, Any]]:
         """
@@ -102,15 +105,21 @@ class TelegramAPIWrapper:
                 }
             ]
         """
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return []
-        except Exception as e:
-            self.logger.error(f"Error getting admins: {e}")
+        result = await self.bot.call("getChatAdministrators", chat_id=group_id)
+        if not result["success"]:
+            self.logger.error(f"Error getting admins: {result['error']}")
             return []
+        admins = []
+        for member in result["data"] or []:
+            user = member.get("user", {})
+            admins.append({
+                "user_id": user.get("id"),
+                "username": user.get("username"),
+                "first_name": user.get("first_name"),
+                **{key: value for key, value in member.items() if key.startswith("can_")},
+                "status": member.get("status"),
+            })
+        return admins
     
     # ========================================================================
     # USER INFORMATION
@@ -128,27 +137,28 @@ class TelegramAPIWrapper:
                 "is_bot": bool
             }
         """
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return {}
-        except Exception as e:
-            self.logger.error(f"Error getting user info: {e}")
+        result = await self.bot.call("getChat", chat_id=user_id)
+        if not result["success"]:
+            self.logger.error(f"Error getting user info: {result['error']}")
             return {}
+        data = result["data"] or {}
+        return {
+            "user_id": data.get("id", user_id),
+            "username": data.get("username"),
+            "first_name": data.get("first_name"),
+            "is_bot": False
+        }
     
     async def get_user_status(self, group_id: int, user_id: int) -> TelegramUserStatus:
         """Get user status in group"""
+        result = await self.bot.call("getChatMember", chat_id=group_id, user_id=user_id)
+        if not result["success"]:
+            self.logger.error(f"Error getting user status: {result['error']}")
+            return TelegramUserStatus.LEFT
         try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
+            return TelegramUserStatus((result["data"] or {}).get("status"))
+        except ValueError:
             return TelegramUserStatus.MEMBER
-        except Exception as e:
-            self.logger.error(f"Error getting user status: {e}")
-            return TelegramUserStatus.LEFT
     
     # ========================================================================
     # MODERATION ACTIONS
@@ -156,101 +166,58 @@ class TelegramAPIWrapper:
     
     async def ban_user(self, group_id: int, user_id: int, reason: str = "") -> bool:
         """Ban user from group"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error banning user: {e}")
-            return False
+        return await self._ok("banChatMember", chat_id=group_id, user_id=user_id)
     
     async def unban_user(self, group_id: int, user_id: int) -> bool:
         """Unban user from group"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error unbanning user: {e}")
-            return False
+        return await self._ok("unbanChatMember", chat_id=group_id, user_id=user_id, only_if_banned=True)
     
     async def kick_user(self, group_id: int, user_id: int) -> bool:
         """Kick user from group"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error kicking user: {e}")
+        if not await self._ok("banChatMember", chat_id=group_id, user_id=user_id):
             return False
+        return await self._ok("unbanChatMember", chat_id=group_id, user_id=user_id, only_if_banned=True)
     
     async def mute_user(self, group_id: int, user_id: int, until_date: Optional[int] = None) -> bool:
         """Mute user in group"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error muting user: {e}")
-            return False
+        return await self._ok(
+            "restrictChatMember", chat_id=group_id, user_id=user_id,
+            permissions={"can_send_messages": False}, until_date=until_date
+        )
     
     async def unmute_user(self, group_id: int, user_id: int) -> bool:
         """Unmute user in group"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error unmuting user: {e}")
-            return False
+        return await self._ok(
+            "restrictChatMember", chat_id=group_id, user_id=user_id,
+            permissions={
+                "can_send_messages": True,
+                "can_send_other_messages": True,
+                "can_add_web_page_previews": True,
+            }
+        )
     
     async def restrict_user(self, group_id: int, user_id: int, 
                            permissions: Dict[str, bool]) -> bool:
         """Restrict user permissions"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error restricting user: {e}")
-            return False
+        return await self._ok("restrictChatMember", chat_id=group_id, user_id=user_id, permissions=permissions)
     
     async def promote_user(self, group_id: int, user_id: int,
                           permissions: Optional[Dict[str, bool]] = None) -> bool:
         """Promote user to admin"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error promoting user: {e}")
-            return False
+        permissions = permissions or {
+            "can_delete_messages": True,
+            "can_restrict_members": True,
+            "can_pin_messages": True,
+        }
+        return await self._ok("promoteChatMember", chat_id=group_id, user_id=user_id, **permissions)
     
     async def demote_user(self, group_id: int, user_id: int) -> bool:
         """Demote user from admin"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error demoting user: {e}")
-            return False
+        return await self._ok(
+            "promoteChatMember", chat_id=group_id, user_id=user_id,
+            can_change_info=False, can_delete_messages=False, can_invite_users=False,
+            can_restrict_members=False, can_pin_messages=False, can_promote_members=False
+        )
     
     # ========================================================================
     # MESSAGE OPERATIONS
@@ -259,61 +226,25 @@ class TelegramAPIWrapper:
     async def send_message(self, group_id: int, text: str, 
                           reply_markup: Optional[Any] = None) -> Optional[int]:
         """Send message to group"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return None
-        except Exception as e:
-            self.logger.error(f"Error sending message: {e}")
+        result = await self.bot.call("sendMessage", chat_id=group_id, text=text, reply_markup=reply_markup)
+        if not result["success"]:
+            self.logger.error(f"Error sending message: {result['error']}")
             return None
+        return (result["data"] or {}).get("message_id")
     
     async def edit_message(self, group_id: int, message_id: int, 
                           text: str) -> bool:
         """Edit message"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error editing message: {e}")
-            return False
+        return await self._ok("editMessageText", chat_id=group_id, message_id=message_id, text=text)
     
     async def delete_message(self, group_id: int, message_id: int) -> bool:
         """Delete message"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error deleting message: {e}")
-            return False
+        return await self._ok("deleteMessage", chat_id=group_id, message_id=message_id)
     
     async def pin_message(self, group_id: int, message_id: int) -> bool:
         """Pin message"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error pinning message: {e}")
-            return False
+        return await self._ok("pinChatMessage", chat_id=group_id, message_id=message_id)
     
     async def unpin_message(self, group_id: int, message_id: int) -> bool:
         """Unpin message"""
-        try:
-            if self.framework == "ptb":
-                pass
-            elif self.framework == "pyrogram":
-                pass
-            return True
-        except Exception as e:
-            self.logger.error(f"Error unpinning message: {e}")
-            return False
+        return await self._ok("unpinChatMessage", chat_id=group_id, message_id=message_id)
@@ -0,0 +1,321 @@
+"""
+Telegram Bot API Client - One pooled client for the whole service
+
+A single httpx.AsyncClient (keep-alive connection pool) is created in the
+api_v2 lifespan and shared by every caller, instead of a new client and
+TLS handshake per request. Requests go through:
+
+- a global token bucket (Telegram allows ~30 requests/second per bot)
+- per-chat flood-wait pauses: a 429 with `retry_after` pauses that chat
+  (or the whole bot) and the request is retried after the wait
+- bounded retries with backoff: connection failures (the request was
+  never sent) for every method; read/protocol errors and 5xx responses,
+  after which Telegram may already have acted, only for IDEMPOTENT_METHODS
+- per-method timeouts (long polls and uploads get more time)
+
+Methods can be called as `client.call("banChatMember", ...)` (result
+dict, never raises), `client.request(...)` (raises TelegramAPIError) or
+aiogram-style `client.ban_chat_member(...)`.
+"""
+
+import asyncio
+import logging
+import os
+import time as time_module
+from typing import Any, Dict, Optional
+
+import httpx
+
+from shared.batch_runner import ChatPacer
+
+logger = logging.getLogger(__name__)
+
+# Bot API server; point at a local server (e.g. api_v2.telegram.fake_server)
+# for benchmarks and integration tests
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+DEFAULT_TIMEOUT = 10.0
+CONNECT_TIMEOUT = 5.0
+METHOD_TIMEOUTS: Dict[str, float] = {
+    "getUpdates": 40.0,
+    "sendDocument": 60.0,
+    "sendVideo": 60.0,
+    "sendAudio": 60.0,
+    "sendPhoto": 30.0,
+    "sendMediaGroup": 60.0,
+}
+
+# Global request rate (token bucket)
+DEFAULT_RATE = 30.0  # requests per second
+DEFAULT_BURST = 30
+
+# Connection pool
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+
+# Errors raised before the request was sent (safe to retry even for
+# non-idempotent methods like sendMessage)
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Methods that may be repeated after Telegram possibly processed them
+# (protocol/read errors, unreadable responses, 5xx)
+IDEMPOTENT_METHODS = frozenset({
+    "getMe",
+    "getUpdates",
+    "getChat",
+    "getChatMember",
+    "getChatAdministrators",
+    "getChatMemberCount",
+    "getFile",
+    "getUserProfilePhotos",
+    "getMyCommands",
+    "getWebhookInfo",
+    "setChatPermissions",
+    "setMyCommands",
+})
+
+# Retries
+MAX_FLOOD_RETRIES = 3
+MAX_RETRY_AFTER = 60.0  # longer flood waits are returned to the caller
+MAX_TRANSIENT_RETRIES = 2
+TRANSIENT_BACKOFF = 0.5
+
+
+class TelegramAPIError(Exception):
+    """Bot API call failed (ok=false, HTTP or network error)"""
+
+    def __init__(self, method: str, description: str, error_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(f"{method}: {description}")
+        self.method = method
+        self.description = description
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Async token bucket with a global pause"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time_module.monotonic()
+        self.paused_until = 0.0
+        self.waits = 0
+
+    async def acquire(self):
+        while True:
+            now = time_module.monotonic()
+            if self.paused_until > now:
+                self.waits += 1
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            self.waits += 1
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time_module.monotonic() + seconds)
+
+
+def _camel_case(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+class TelegramBotClient:
+    """Pooled, rate-limited Telegram Bot API client"""
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = TELEGRAM_API_BASE,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_connections: int = MAX_CONNECTIONS,
+    ):
+        """
+        Args:
+            token: Bot token
+            base_url: Bot API server (official API or a local/fake server)
+            rate: Global requests per second
+            burst: Token bucket capacity
+            max_connections: Connection pool size
+        """
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.bucket = TokenBucket(rate, burst)
+        self.pacer = ChatPacer(interval=0.0)
+        self._http: Optional[httpx.AsyncClient] = None
+
+        # Metrics
+        self.requests = 0
+        self.failures = 0
+        self.flood_waits = 0
+        self.retries = 0
+
+    @property
+    def bot_id(self) -> Optional[int]:
+        try:
+            return int(self.token.split(":")[0])
+        except (ValueError, IndexError):
+            return None
+
+    # ========================================================================
+    # LIFECYCLE
+    # ========================================================================
+
+    async def start(self):
+        """Open the connection pool"""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=f"{self.base_url}/bot{self.token}/",
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+            )
+
+    async def close(self):
+        """Close the connection pool"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    # ========================================================================
+    # REQUESTS
+    # ========================================================================
+
+    async def request(self, method: str, **params) -> Any:
+        """Call a Bot API method and return its result (raises TelegramAPIError)"""
+        if self._http is None or self._http.is_closed:
+            await self.start()
+        params = {key: value for key, value in params.items() if value is not None}
+        chat_id = params.get("chat_id")
+        timeout = METHOD_TIMEOUTS.get(method, DEFAULT_TIMEOUT)
+        idempotent = method in IDEMPOTENT_METHODS
+        flood_retries = 0
+        transient_retries = 0
+
+        while True:
+            await self.pacer.wait(chat_id)
+            await self.bucket.acquire()
+            self.requests += 1
+            try:
+                response = await self._http.post(method, json=params, timeout=timeout)
+                data = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                retryable = idempotent or isinstance(e, RETRYABLE_ERRORS)
+                if retryable and transient_retries < MAX_TRANSIENT_RETRIES:
+                    transient_retries += 1
+                    self.retries += 1
+                    await asyncio.sleep(TRANSIENT_BACKOFF * 2 ** (transient_retries - 1))
+                    continue
+                self.failures += 1
+                raise TelegramAPIError(method, str(e) or e.__class__.__name__) from e
+
+            if data.get("ok"):
+                return data.get("result")
+
+            error_code = data.get("error_code", response.status_code)
+            description = data.get("description", "Unknown error")
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+
+            if error_code == 429 and retry_after is not None:
+                self.flood_waits += 1
+                if retry_after <= MAX_RETRY_AFTER and flood_retries < MAX_FLOOD_RETRIES:
+                    flood_retries += 1
+                    if chat_id is not None:
+                        self.pacer.defer(chat_id, retry_after)
+                    else:
+                        self.bucket.pause(retry_after)
+                    continue
+            elif error_code >= 500 and idempotent and transient_retries < MAX_TRANSIENT_RETRIES:
+                transient_retries += 1
+                self.retries += 1
+                await asyncio.sleep(TRANSIENT_BACKOFF * 2 ** (transient_retries - 1))
+                continue
+
+            self.failures += 1
+            raise TelegramAPIError(method, description, error_code, retry_after)
+
+    async def call(self, method: str, **params) -> Dict[str, Any]:
+        """Call a Bot API method, returning {"success", "data"} or {"success", "error"}"""
+        try:
+            return {"success": True, "data": await self.request(method, **params)}
+        except TelegramAPIError as e:
+            logger.error(f"Telegram API error for {method}: {e.description}")
+            result = {"success": False, "error": e.description, "error_code": e.error_code}
+            if e.retry_after is not None:
+                result["retry_after"] = e.retry_after
+            return result
+
+    def __getattr__(self, name: str):
+        # aiogram-style calls: client.ban_chat_member(chat_id=..., user_id=...)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = _camel_case(name)
+
+        async def bound(**params):
+            return await self.request(method, **params)
+
+        bound.__name__ = name
+        return bound
+
+    def metrics(self) -> Dict[str, Any]:
+        pool = self._http is not None and not self._http.is_closed
+        return {
+            "base_url": self.base_url,
+            "pool_open": pool,
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "flood_waits": self.flood_waits,
+            "rate_limit_waits": self.bucket.waits,
+            "paused_chats": self.pacer.metrics()["paused_chats"],
+        }
+
+
+# ============================================================================
+# SHARED INSTANCE
+# ============================================================================
+
+_telegram_client: Optional[TelegramBotClient] = None
+
+
+async def init_telegram_client(token: Optional[str] = None, base_url: Optional[str] = None) -> TelegramBotClient:
+    """Create and open the shared Telegram client"""
+    global _telegram_client
+    if _telegram_client is not None:
+        await _telegram_client.close()
+    _telegram_client = TelegramBotClient(
+        token or os.getenv("TELEGRAM_BOT_TOKEN", ""),
+        base_url or TELEGRAM_API_BASE,
+    )
+    await _telegram_client.start()
+    return _telegram_client
+
+
+def get_telegram_client(token: Optional[str] = None) -> TelegramBotClient:
+    """Get the shared Telegram client (created lazily outside the lifespan)"""
+    global _telegram_client
+    if _telegram_client is None:
+        _telegram_client = TelegramBotClient(token or os.getenv("TELEGRAM_BOT_TOKEN", ""))
+    return _telegram_client
+
+
+async def close_telegram_client():
+    """Close the shared Telegram client"""
+    global _telegram_client
+    if _telegram_client:
+        await _telegram_client.close()
+    _telegram_client = None
@@ -0,0 +1,455 @@
+"""
+Fake Telegram Bot API Server - Offline target for benchmarks and integration tests
+
+Implements the Bot API methods the moderation stack uses with in-memory
+chat state, so enforcement throughput and latency can be measured
+without touching api.telegram.org:
+
+- configurable latency (base + uniform jitter) per call
+- error injection (random 400s and 5xx responses)
+- realistic flood control: a global and a per-chat token bucket; an
+  exceeded bucket answers 429 with `parameters.retry_after` and keeps
+  refusing that chat until the wait has passed
+- /_fake/stats, /_fake/config and /_fake/reset control endpoints
+
+Point the services at it with TELEGRAM_API_BASE=http://localhost:8081.
+Run with:
+
+    python -m api_v2.telegram.fake_server --port 8081 --latency-ms 30 --chat-rate 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import time as time_module
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+# Not subject to flood control (polling and identity calls)
+UNLIMITED_METHODS = frozenset({"getUpdates", "getMe", "deleteWebhook"})
+
+
+class FakeServerConfig(BaseModel):
+    """Behaviour of the fake Bot API server"""
+    latency_ms: float = Field(0.0, ge=0, description="Base latency added to every call")
+    jitter_ms: float = Field(0.0, ge=0, description="Uniform random extra latency")
+    error_rate: float = Field(0.0, ge=0, le=1, description="Share of calls failing with 400")
+    server_error_rate: float = Field(0.0, ge=0, le=1, description="Share of calls failing with 502")
+    global_rate: float = Field(30.0, gt=0, description="Requests per second per bot")
+    global_burst: int = Field(30, ge=1)
+    chat_rate: float = Field(20.0, gt=0, description="Requests per second per chat")
+    chat_burst: int = Field(20, ge=1)
+    flood_penalty: float = Field(1.0, ge=0, description="Extra seconds added to retry_after")
+    seed: Optional[int] = None
+
+
+class _Bucket:
+    """Token bucket answering how long until the next token"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time_module.monotonic()
+        self.blocked_until = 0.0
+
+    def take(self, penalty: float) -> float:
+        """0 when a token was taken, else seconds the caller must wait"""
+        now = time_module.monotonic()
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        wait = (1 - self.tokens) / self.rate + penalty
+        self.blocked_until = now + wait
+        return wait
+
+
+class FakeBotAPI:
+    """In-memory Bot API state and method implementations"""
+
+    def __init__(self, config: Optional[FakeServerConfig] = None):
+        self.configure(config or FakeServerConfig())
+        self.reset()
+
+    def configure(self, config: FakeServerConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.global_bucket = _Bucket(config.global_rate, config.global_burst)
+        self.chat_buckets: Dict[Any, _Bucket] = {}
+
+    def reset(self):
+        self.members: Dict[Tuple[Any, int], Dict[str, Any]] = {}
+        self.chat_permissions: Dict[Any, Dict[str, bool]] = {}
+        self.pinned: Dict[Any, Optional[int]] = {}
+        self.next_message_id: Counter = Counter()
+        self.calls: Counter = Counter()
+        self.outcomes: Counter = Counter()
+        self.latency_total_ms = 0.0
+        self.started_at = time_module.time()
+
+    # ========================================================================
+    # DISPATCH
+    # ========================================================================
+
+    async def handle(self, token: str, method: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        self.calls[method] += 1
+        bot_id = _bot_id(token)
+        if bot_id is None:
+            return self._error(401, "Unauthorized")
+
+        config = self.config
+        delay = config.latency_ms + (self.random.uniform(0, config.jitter_ms) if config.jitter_ms else 0)
+        if delay:
+            self.latency_total_ms += delay
+            await asyncio.sleep(delay / 1000)
+
+        chat_id = params.get("chat_id")
+        if chat_id is not None:
+            chat_id = _require(params, "chat_id")
+        wait = 0.0 if method in UNLIMITED_METHODS else self.global_bucket.take(config.flood_penalty)
+        if not wait and chat_id is not None:
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self.chat_buckets[chat_id] = _Bucket(config.chat_rate, config.chat_burst)
+            wait = bucket.take(config.flood_penalty)
+        if wait:
+            retry_after = max(1, math.ceil(wait))
+            self.outcomes["flood"] += 1
+            return 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            }
+
+        if config.server_error_rate and self.random.random() < config.server_error_rate:
+            return self._error(502, "Bad Gateway")
+        if config.error_rate and self.random.random() < config.error_rate:
+            return self._error(400, "Bad Request: injected error")
+
+        handler = getattr(self, f"_m_{method}", None)
+        if handler is None:
+            return self._error(404, "Not Found: method not found")
+        if method == "getUpdates":
+            # Long poll that never has updates
+            await asyncio.sleep(min(float(params.get("timeout") or 0), 30))
+        try:
+            result = handler(bot_id, params)
+        except _BadRequest as e:
+            return self._error(400, f"Bad Request: {e}")
+        self.outcomes["ok"] += 1
+        return 200, {"ok": True, "result": result}
+
+    def _error(self, code: int, description: str) -> Tuple[int, Dict[str, Any]]:
+        self.outcomes[str(code)] += 1
+        return code, {"ok": False, "error_code": code, "description": description}
+
+    # ========================================================================
+    # STATE HELPERS
+    # ========================================================================
+
+    def _member(self, chat_id: Any, user_id: int) -> Dict[str, Any]:
+        return self.members.get((chat_id, user_id)) or {
+            "user": _user(user_id),
+            "status": "member",
+        }
+
+    def _set_member(self, chat_id: Any, user_id: int, status: str, **fields):
+        self.members[(chat_id, user_id)] = {"user": _user(user_id), "status": status, **fields}
+
+    def _message(self, chat_id: Any, **fields) -> Dict[str, Any]:
+        self.next_message_id[chat_id] += 1
+        return {
+            "message_id": self.next_message_id[chat_id],
+            "date": int(time_module.time()),
+            "chat": {"id": chat_id, "type": "supergroup"},
+            **fields,
+        }
+
+    # ========================================================================
+    # METHODS
+    # ========================================================================
+
+    def _m_getMe(self, bot_id, params):
+        return {"id": bot_id, "is_bot": True, "first_name": "Fake Bot", "username": "fake_bot"}
+
+    def _m_getUpdates(self, bot_id, params):
+        return []
+
+    def _m_setMyCommands(self, bot_id, params):
+        return True
+
+    def _m_deleteWebhook(self, bot_id, params):
+        return True
+
+    def _m_answerCallbackQuery(self, bot_id, params):
+        return True
+
+    def _m_getChat(self, bot_id, params):
+        chat_id = _require(params, "chat_id")
+        return {
+            "id": chat_id,
+            "type": "supergroup" if str(chat_id).startswith("-") else "private",
+            "title": f"Chat {chat_id}",
+            "permissions": self.chat_permissions.get(chat_id, {"can_send_messages": True}),
+        }
+
+    def _m_getChatMemberCount(self, bot_id, params):
+        chat_id = _require(params, "chat_id")
+        return sum(
+            1 for (chat, _), member in self.members.items()
+            if chat == chat_id and member["status"] not in ("left", "kicked")
+        ) or 1
+
+    def _m_getChatMember(self, bot_id, params):
+        return self._member(_require(params, "chat_id"), int(_require(params, "user_id")))
+
+    def _m_getChatAdministrators(self, bot_id, params):
+        chat_id = _require(params, "chat_id")
+        admins = [
+            member for (chat, _), member in self.members.items()
+            if chat == chat_id and member["status"] in ("creator", "administrator")
+        ]
+        return admins + [{"user": _user(bot_id, is_bot=True), "status": "administrator"}]
+
+    def _m_banChatMember(self, bot_id, params):
+        chat_id, user_id = _require(params, "chat_id"), int(_require(params, "user_id"))
+        if user_id == bot_id:
+            raise _BadRequest("can't ban myself")
+        self._set_member(chat_id, user_id, "kicked", until_date=params.get("until_date", 0))
+        return True
+
+    def _m_unbanChatMember(self, bot_id, params):
+        chat_id, user_id = _require(params, "chat_id"), int(_require(params, "user_id"))
+        member = self._member(chat_id, user_id)
+        if member["status"] == "kicked" or not params.get("only_if_banned"):
+            self._set_member(chat_id, user_id, "left")
+        return True
+
+    def _m_restrictChatMember(self, bot_id, params):
+        chat_id, user_id = _require(params, "chat_id"), int(_require(params, "user_id"))
+        permissions = _json_param(params.get("permissions")) or {}
+        if not isinstance(permissions, dict):
+            raise _BadRequest("invalid permissions")
+        if all(permissions.values()):
+            self._set_member(chat_id, user_id, "member")
+        else:
+            self._set_member(
+                chat_id, user_id, "restricted",
+                until_date=params.get("until_date", 0), is_member=True, **permissions
+            )
+        return True
+
+    def _m_promoteChatMember(self, bot_id, params):
+        chat_id, user_id = _require(params, "chat_id"), int(_require(params, "user_id"))
+        rights = {key: bool(value) for key, value in params.items() if key.startswith("can_") or key == "is_anonymous"}
+        if any(rights.values()):
+            self._set_member(chat_id, user_id, "administrator", can_be_edited=True, **rights)
+        else:
+            self._set_member(chat_id, user_id, "member")
+        return True
+
+    def _m_setChatAdministratorCustomTitle(self, bot_id, params):
+        chat_id, user_id = _require(params, "chat_id"), int(_require(params, "user_id"))
+        member = self._member(chat_id, user_id)
+        if member["status"] != "administrator":
+            raise _BadRequest("user is not an administrator")
+        member["custom_title"] = params.get("custom_title", "")
+        return True
+
+    def _m_setChatPermissions(self, bot_id, params):
+        chat_id = _require(params, "chat_id")
+        self.chat_permissions[chat_id] = _json_param(params.get("permissions")) or {}
+        return True
+
+    def _m_sendMessage(self, bot_id, params):
+        chat_id = _require(params, "chat_id")
+        text = _require(params, "text")
+        if len(str(text)) > 4096:
+            raise _BadRequest("message is too long")
+        return self._message(chat_id, text=text)
+
+    def _m_sendPhoto(self, bot_id, params):
+        return self._message(_require(params, "chat_id"), caption=params.get("caption"), photo=[])
+
+    def _m_sendDocument(self, bot_id, params):
+        return self._message(_require(params, "chat_id"), caption=params.get("caption"), document={})
+
+    def _m_sendVideo(self, bot_id, params):
+        return self._message(_require(params, "chat_id"), caption=params.get("caption"), video={})
+
+    def _m_sendAnimation(self, bot_id, params):
+        return self._message(_require(params, "chat_id"), caption=params.get("caption"), animation={})
+
+    def _m_sendSticker(self, bot_id, params):
+        return self._message(_require(params, "chat_id"), sticker={})
+
+    def _m_copyMessage(self, bot_id, params):
+        return {"message_id": self._message(_require(params, "chat_id"))["message_id"]}
+
+    def _m_editMessageText(self, bot_id, params):
+        chat_id = _require(params, "chat_id")
+        return {
+            "message_id": int(_require(params, "message_id")),
+            "date": int(time_module.time()),
+            "edit_date": int(time_module.time()),
+            "chat": {"id": chat_id, "type": "supergroup"},
+            "text": _require(params, "text"),
+        }
+
+    def _m_deleteMessage(self, bot_id, params):
+        chat_id, message_id = _require(params, "chat_id"), int(_require(params, "message_id"))
+        if message_id > self.next_message_id[chat_id] and self.next_message_id[chat_id]:
+            raise _BadRequest("message to delete not found")
+        return True
+
+    def _m_deleteMessages(self, bot_id, params):
+        _require(params, "chat_id")
+        message_ids = _json_param(_require(params, "message_ids"))
+        if not isinstance(message_ids, list) or not 1 <= len(message_ids) <= 100:
+            raise _BadRequest("message_ids must contain 1-100 identifiers")
+        return True
+
+    def _m_pinChatMessage(self, bot_id, params):
+        self.pinned[_require(params, "chat_id")] = int(_require(params, "message_id"))
+        return True
+
+    def _m_unpinChatMessage(self, bot_id, params):
+        self.pinned[_require(params, "chat_id")] = None
+        return True
+
+    def _m_unpinAllChatMessages(self, bot_id, params):
+        self.pinned[_require(params, "chat_id")] = None
+        return True
+
+    # ========================================================================
+    # STATS
+    # ========================================================================
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.calls.values())
+        elapsed = max(time_module.time() - self.started_at, 1e-9)
+        return {
+            "total_calls": total,
+            "calls_per_second": round(total / elapsed, 2),
+            "by_method": dict(self.calls),
+            "outcomes": dict(self.outcomes),
+            "avg_injected_latency_ms": round(self.latency_total_ms / total, 2) if total else 0.0,
+            "tracked_members": len(self.members),
+            "config": self.config.model_dump(),
+        }
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def _bot_id(token: str) -> Optional[int]:
+    try:
+        return int(token.split(":")[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def _user(user_id: int, is_bot: bool = False) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": is_bot, "first_name": f"User {user_id}"}
+
+
+def _require(params: Dict[str, Any], name: str) -> Any:
+    value = params.get(name)
+    if value is None:
+        raise _BadRequest(f"{name} is required")
+    if name == "chat_id":
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return value  # @username
+    return value
+
+
+def _json_param(value: Any) -> Any:
+    # Form-encoded requests carry objects as JSON strings
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+# ============================================================================
+# APPLICATION
+# ============================================================================
+
+def create_fake_telegram_app(config: Optional[FakeServerConfig] = None) -> FastAPI:
+    """FastAPI app serving /bot<token>/<method> from a FakeBotAPI"""
+    fake = FakeBotAPI(config)
+    app = FastAPI(title="Fake Telegram Bot API", docs_url=None, redoc_url=None)
+    app.state.fake = fake
+
+    @app.get("/_fake/stats")
+    async def fake_stats():
+        return fake.stats()
+
+    @app.post("/_fake/config")
+    async def fake_config(config: FakeServerConfig):
+        fake.configure(config)
+        return fake.config.model_dump()
+
+    @app.post("/_fake/reset")
+    async def fake_reset():
+        fake.reset()
+        return {"ok": True}
+
+    @app.api_route("/bot{token}/{method}", methods=["GET", "POST"])
+    async def bot_method(token: str, method: str, request: Request):
+        params: Dict[str, Any] = dict(request.query_params)
+        if request.method == "POST":
+            content_type = request.headers.get("content-type", "")
+            if content_type.startswith("application/json"):
+                body = await request.json()
+                if isinstance(body, dict):
+                    params.update(body)
+            elif content_type:
+                form = await request.form()
+                params.update({key: value for key, value in form.items() if isinstance(value, str)})
+        status, payload = await fake.handle(token, method, params)
+        return JSONResponse(payload, status_code=status)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    for name, field in FakeServerConfig.model_fields.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(field.default) if field.default is not None else int,
+                            default=field.default, help=field.description)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeServerConfig(**{name: getattr(args, name) for name in FakeServerConfig.model_fields})
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Fake Telegram Bot API on http://{args.host}:{args.port} with {config.model_dump()}")
+    uvicorn.run(create_fake_telegram_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
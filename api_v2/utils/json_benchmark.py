@@ -0,0 +1,115 @@
+"""
+Response Serialization Micro-Benchmark
+
+Compares the CPU cost of rendering large list payloads (action log and
+whitelist pages of BSON documents) through:
+
+    fastapi     jsonable_encoder + stdlib json (FastAPI's default path,
+                with ObjectIds converted by hand beforehand as routes did)
+    default     jsonable_encoder + FastJSONResponse (dict-returning routes)
+    direct      json_response (trusted routes, one encoder pass)
+
+Usage:
+    python -m api_v2.utils.json_benchmark [--sizes 100 1000 10000] [--iterations 20]
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from shared import responses
+from shared.responses import FastJSONResponse, json_response
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+
+def _oid() -> Any:
+    return ObjectId() if ObjectId else f"{random.getrandbits(96):024x}"
+
+
+def _action_doc(group_id: int, i: int) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "_id": _oid(),
+        "group_id": group_id,
+        "user_id": 10**8 + i,
+        "admin_id": 10**8 + random.randint(0, 20),
+        "action_type": random.choice(["ban", "mute", "warn", "delete", "kick"]),
+        "reason": "Spam links in the group chat",
+        "duration": random.choice([None, 3600, 86400]),
+        "status": "completed",
+        "metadata": {"message_id": random.randint(1, 10**6), "source": "auto", "tags": ["spam", "links"]},
+        "created_at": now - timedelta(seconds=i * 37),
+    }
+
+
+def _by_hand(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [dict(doc, _id=str(doc["_id"])) for doc in docs]
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e3
+
+
+def run(sizes: List[int], iterations: int = 20) -> List[Dict[str, Any]]:
+    """One row per (payload size, path) with ms per response and bytes"""
+    rows = []
+    for size in sizes:
+        docs = [_action_doc(-1001234567890, i) for i in range(size)]
+        payload = {"success": True, "data": {"items": docs, "total": size}}
+        n = max(3, iterations * 1000 // max(size, 1000))
+
+        def fastapi_path():
+            content = jsonable_encoder({"success": True, "data": {"items": _by_hand(docs), "total": size}})
+            return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+        def default_path():
+            content = jsonable_encoder(
+                {"success": True, "data": {"items": _by_hand(docs), "total": size}}
+            )
+            return FastJSONResponse(content).body
+
+        def direct_path():
+            return json_response(payload).body
+
+        for name, fn in (("fastapi", fastapi_path), ("default", default_path), ("direct", direct_path)):
+            rows.append({
+                "size": size,
+                "path": name,
+                "bytes": len(fn()),
+                "ms": _time(fn, n),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON response rendering")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    backend = "orjson" if responses.ORJSON_AVAILABLE else "json (orjson not installed)"
+    print(f"FastJSONResponse backend: {backend}")
+    print(f"{'docs':>8}  {'path':<10}{'bytes':>12}{'ms/resp':>12}{'speedup':>10}")
+    print("-" * 54)
+    baseline = {}
+    for row in run(args.sizes, args.iterations):
+        if row["path"] == "fastapi":
+            baseline[row["size"]] = row["ms"]
+        speedup = baseline[row["size"]] / row["ms"] if row["ms"] else 0.0
+        print(f"{row['size']:>8}  {row['path']:<10}{row['bytes']:>12}{row['ms']:>12.2f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -41,6 +41,8 @@ logger = logging.getLogger(__name__)
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 API_V2_URL = os.getenv("API_V2_URL", "http://localhost:8002")
 API_V2_KEY = os.getenv("API_V2_KEY", "shared-api-key")
+# Bot API server (e.g. a local api_v2.telegram.fake_server for benchmarks)
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE")
 
 if not TELEGRAM_BOT_TOKEN:
     logger.error("❌ TELEGRAM_BOT_TOKEN not set in environment variables")
@@ -8755,7 +8757,14 @@ async def setup_bot():
             logger.info("✅ Centralized API is healthy")
         
         # Initialize bot (without default parse_mode to avoid HTML parsing issues)
-        bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        if TELEGRAM_API_BASE:
+            from aiogram.client.session.aiohttp import AiohttpSession
+            from aiogram.client.telegram import TelegramAPIServer
+            session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_BASE))
+            bot = Bot(token=TELEGRAM_BOT_TOKEN, session=session)
+            logger.info(f"Using Bot API server {TELEGRAM_API_BASE}")
+        else:
+            bot = Bot(token=TELEGRAM_BOT_TOKEN)
         
         # Initialize dispatcher with memory storage
         storage = MemoryStorage()
@@ -8,6 +8,7 @@ This handler automatically registers groups when:
 3. Bot is removed from a group
 """
 
+import asyncio
 import logging
 import httpx
 from typing import Optional
@@ -20,6 +21,10 @@ API_BASE_URL = "http://localhost:8001/api"
 AUTO_REGISTER_ENABLED = True
 PERIODIC_STATS_UPDATE_ENABLED = True
 
+# Groups sent per bulk request, and Telegram lookups in flight during a stats sync
+BULK_CHUNK_SIZE = 1000
+STATS_FETCH_CONCURRENCY = 10
+
 # ============================================================================
 # PYROGRAM INTEGRATION
 # ============================================================================
@@ -188,6 +193,8 @@ async def ensure_group_registered_ptb(context: ContextTypes.DEFAULT_TYPE, chat_i
             if response.status_code == 200:
                 result = response.json()
                 logger.debug(f"Group {chat.title}: {result['action']}")
+                # Remembered for the periodic stats sync
+                context.bot_data.setdefault('registered_groups', set()).add(chat_id)
             else:
                 logger.warning(f"Failed to register group {chat_id}: {response.status_code}")
         
@@ -288,20 +295,41 @@ async def periodic_update_group_stats(context: ContextTypes.DEFAULT_TYPE, client
     if not PERIODIC_STATS_UPDATE_ENABLED:
         return
     
+    group_ids = list(context.bot_data.get('registered_groups', ()))
+    if not group_ids:
+        return
+    
     try:
-        logger.info("Starting periodic stats update...")
+        logger.info(f"Starting periodic stats update for {len(group_ids)} groups...")
+        semaphore = asyncio.Semaphore(STATS_FETCH_CONCURRENCY)
         
-        # Get list of all active groups (would need to fetch from database)
-        # For now, this is a placeholder
+        async def fetch_stats(chat_id: int):
+            async with semaphore:
+                try:
+                    member_count = await context.bot.get_chat_member_count(chat_id)
+                    admins = await context.bot.get_chat_administrators(chat_id)
+                    return {'group_id': chat_id, 'member_count': member_count, 'admin_count': len(admins)}
+                except Exception as e:
+                    logger.debug(f"Could not fetch stats for group {chat_id}: {e}")
+                    return None
         
-        # Example: Update a specific group
-        # async with httpx.AsyncClient() as http:
-        #     response = await http.put(
-        #         f'{API_BASE_URL}/groups/update-stats/-100123456789',
-        #         json={'member_count': 150, 'admin_count': 3}
-        #     )
+        stats = [entry for entry in await asyncio.gather(*(fetch_stats(g) for g in group_ids)) if entry]
         
-        logger.info("Periodic stats update complete")
+        # One bulk request per chunk instead of one request per group
+        updated = 0
+        async with httpx.AsyncClient() as http:
+            for i in range(0, len(stats), BULK_CHUNK_SIZE):
+                response = await http.post(
+                    f'{API_BASE_URL}/groups/bulk-update-stats',
+                    json={'groups': stats[i:i + BULK_CHUNK_SIZE]},
+                    timeout=30
+                )
+                if response.status_code == 200:
+                    updated += response.json().get('matched', 0)
+                else:
+                    logger.warning(f"Bulk stats update failed: {response.status_code}")
+        
+        logger.info(f"Periodic stats update complete: {updated}/{len(group_ids)} groups updated")
         
     except Exception as e:
         logger.error(f"Error in periodic stats update: {e}")
@@ -380,24 +408,30 @@ async def bulk_register_groups(groups_data: list):
         result = await bulk_register_groups(groups)
         print(result)
     """
+    totals = {'created': 0, 'updated': 0, 'failed': 0, 'total': 0}
     try:
         async with httpx.AsyncClient() as http:
-            response = await http.post(
-                f'{API_BASE_URL}/groups/bulk-register',
-                json={'groups': groups_data},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(
-                    f"Bulk registration: {result['created']} created, "
-                    f"{result['updated']} updated, {result['failed']} failed"
+            # The API upserts each chunk with a single bulk write
+            for i in range(0, len(groups_data), BULK_CHUNK_SIZE):
+                response = await http.post(
+                    f'{API_BASE_URL}/groups/bulk-register',
+                    json={'groups': groups_data[i:i + BULK_CHUNK_SIZE]},
+                    timeout=30
                 )
-                return result
-            else:
-                logger.error(f"Bulk registration failed: {response.status_code}")
-                return None
+                
+                if response.status_code != 200:
+                    logger.error(f"Bulk registration failed: {response.status_code}")
+                    return None
+                
+                result = response.json()
+                for key in totals:
+                    totals[key] += result.get(key, 0)
+        
+        logger.info(
+            f"Bulk registration: {totals['created']} created, "
+            f"{totals['updated']} updated, {totals['failed']} failed"
+        )
+        return dict(totals, success=True)
                 
     except Exception as e:
         logger.error(f"Error in bulk registration: {e}")
@@ -9,6 +9,8 @@ import logging
 from bson import ObjectId
 from datetime import datetime
 
+from shared.responses import json_response
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/advanced", tags=["advanced"])
@@ -43,6 +45,17 @@ def sanitize_doc(doc):
     return out
 
 
+def list_response(docs: List[Dict[str, Any]]):
+    """Trusted list payload: drop _id and let the shared encoder do the rest"""
+    for doc in docs:
+        doc.pop("_id", None)
+    return json_response({
+        "success": True,
+        "data": docs,
+        "count": len(docs)
+    })
+
+
 # ============================================================================
 # SETTINGS ENDPOINTS
 # ============================================================================
@@ -152,11 +165,7 @@ async def get_group_members(group_id: int, active_only: bool = True):
         db_service = AdvancedDBService(get_db())
         members = await db_service.get_group_members(group_id, active_only)
 
-        return {
-            "success": True,
-            "data": sanitize_doc(members),
-            "count": len(members)
-        }
+        return list_response(members)
     except Exception as e:
         logger.error(f"Error getting members: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -220,11 +229,7 @@ async def get_group_admins(group_id: int):
         db_service = AdvancedDBService(get_db())
         admins = await db_service.get_group_admins(group_id)
 
-        return {
-            "success": True,
-            "data": sanitize_doc(admins),
-            "count": len(admins)
-        }
+        return list_response(admins)
     except Exception as e:
         logger.error(f"Error getting admins: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -291,11 +296,7 @@ async def get_group_roles(group_id: int):
         db_service = AdvancedDBService(get_db())
         roles = await db_service.get_group_roles(group_id)
 
-        return {
-            "success": True,
-            "data": sanitize_doc(roles),
-            "count": len(roles)
-        }
+        return list_response(roles)
     except Exception as e:
         logger.error(f"Error getting roles: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -366,11 +367,7 @@ async def get_command_history(group_id: int, limit: int = Query(100, le=1000)):
         db_service = AdvancedDBService(get_db())
         history = await db_service.get_command_history(group_id, limit)
 
-        return {
-            "success": True,
-            "data": sanitize_doc(history),
-            "count": len(history)
-        }
+        return list_response(history)
     except Exception as e:
         logger.error(f"Error getting history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -422,11 +419,7 @@ async def get_event_logs(
         db_service = AdvancedDBService(get_db())
         logs = await db_service.get_event_logs(group_id, event_type, limit)
 
-        return {
-            "success": True,
-            "data": sanitize_doc(logs),
-            "count": len(logs)
-        }
+        return list_response(logs)
     except Exception as e:
         logger.error(f"Error getting events: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,7 +3,7 @@ Dashboard API Endpoints
 Provides data for the web dashboard: groups, users, actions stats
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from typing import Optional, List
 from datetime import datetime, timedelta
@@ -12,6 +12,10 @@ from dotenv import load_dotenv
 from pathlib import Path
 from pydantic import BaseModel
 
+from shared.counts import get_count_cache
+from shared.pagination import InvalidCursor, fetch_page
+from centralized_api.core.snapshots import get_snapshot_cache
+
 # Load environment variables
 env_path = Path(__file__).resolve().parent.parent / ".env"
 load_dotenv(env_path)
@@ -40,6 +44,12 @@ def get_database() -> AsyncIOMotorDatabase:
     return _db
 
 
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    """Expose the keyset cursor for the next page (list bodies stay unchanged)"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
 # ============================================================================
 # MODELS
 # ============================================================================
@@ -95,64 +105,81 @@ class DashboardStats(BaseModel):
 
 @router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats():
-    """Get dashboard statistics"""
+    """Get dashboard statistics (a snapshot refreshed every few seconds)"""
     db = get_database()
     
     try:
-        groups_col = db["groups"]
-        users_col = db["users"]
-        actions_col = db["actions"]
-        
-        # Count documents
-        total_groups = await groups_col.count_documents({})
-        total_users = await users_col.count_documents({})
-        total_actions = await actions_col.count_documents({})
-        
-        # Calculate stats
-        total_members = 0
-        total_admins = 0
-        async for group in groups_col.find({}):
-            total_members += group.get("member_count", 0)
-            total_admins += group.get("admin_count", 0)
-        
-        # Active users count
-        active_users = await users_col.count_documents({"is_active": True})
-        
-        # Actions today and this week
-        now = datetime.utcnow()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start = now - timedelta(days=7)
-        
-        actions_today = await actions_col.count_documents({
-            "created_at": {"$gte": today_start}
-        })
-        
-        actions_this_week = await actions_col.count_documents({
-            "created_at": {"$gte": week_start}
-        })
-        
-        return DashboardStats(
-            total_groups=total_groups,
-            total_members=total_members,
-            total_admins=total_admins,
-            total_actions=total_actions,
-            active_users=active_users,
-            actions_today=actions_today,
-            actions_this_week=actions_this_week,
-        )
-    
+        return await get_snapshot_cache().get("dashboard:stats", lambda: compute_dashboard_stats(db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def compute_dashboard_stats(db: AsyncIOMotorDatabase) -> DashboardStats:
+    """Dashboard totals from server-side aggregations"""
+    groups_col = db["groups"]
+    users_col = db["users"]
+    actions_col = db["actions"]
+    
+    counts = get_count_cache()
+    
+    # Unfiltered totals come from collection metadata, filtered ones
+    # from the TTL count cache
+    total_groups = await counts.count(groups_col)
+    total_actions = await counts.count(actions_col)
+    active_users = await counts.count(users_col, {"is_active": True})
+    
+    # Member/admin totals summed by the server
+    group_totals = await groups_col.aggregate([
+        {"$group": {
+            "_id": None,
+            "members": {"$sum": {"$ifNull": ["$member_count", 0]}},
+            "admins": {"$sum": {"$ifNull": ["$admin_count", 0]}},
+        }},
+    ]).to_list(length=1)
+    totals = group_totals[0] if group_totals else {}
+    
+    # Actions today and this week in one pass over the week's index range
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = now - timedelta(days=7)
+    
+    windows = await actions_col.aggregate([
+        {"$match": {"created_at": {"$gte": week_start}}},
+        {"$facet": {
+            "week": [{"$count": "n"}],
+            "today": [{"$match": {"created_at": {"$gte": today_start}}}, {"$count": "n"}],
+        }},
+    ]).to_list(length=1)
+    windows = windows[0] if windows else {}
+    
+    def facet_count(name: str) -> int:
+        rows = windows.get(name) or []
+        return rows[0]["n"] if rows else 0
+    
+    return DashboardStats(
+        total_groups=total_groups,
+        total_members=totals.get("members", 0),
+        total_admins=totals.get("admins", 0),
+        total_actions=total_actions,
+        active_users=active_users,
+        actions_today=facet_count("today"),
+        actions_this_week=facet_count("week"),
+    )
+
+
 @router.get("/groups", response_model=List[GroupResponse])
-async def get_groups(skip: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=100)):
-    """Get list of groups with pagination"""
+async def get_groups(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+):
+    """Get list of groups with pagination (next page cursor in X-Next-Cursor)"""
     db = get_database()
     
     try:
-        groups_col = db["groups"]
-        groups = await groups_col.find({}).skip(skip).limit(limit).to_list(limit)
+        groups, next_cursor = await fetch_page(db["groups"], {}, [("_id", 1)], limit, cursor=cursor, skip=skip)
+        set_next_cursor(response, next_cursor)
         
         return [
             GroupResponse(
@@ -166,6 +193,8 @@ async def get_groups(skip: int = Query(0, ge=0), limit: int = Query(20, ge=1, le
             )
             for g in groups
         ]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -198,13 +227,18 @@ async def get_group(group_id: int):
 
 
 @router.get("/users", response_model=List[UserResponse])
-async def get_users(skip: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=100)):
-    """Get list of users with pagination"""
+async def get_users(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+):
+    """Get list of users with pagination (next page cursor in X-Next-Cursor)"""
     db = get_database()
     
     try:
-        users_col = db["users"]
-        users = await users_col.find({}).skip(skip).limit(limit).to_list(limit)
+        users, next_cursor = await fetch_page(db["users"], {}, [("_id", 1)], limit, cursor=cursor, skip=skip)
+        set_next_cursor(response, next_cursor)
         
         return [
             UserResponse(
@@ -219,18 +253,22 @@ async def get_users(skip: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=
             )
             for u in users
         ]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/actions", response_model=List[ActionResponse])
 async def get_actions(
+    response: Response,
     group_id: Optional[int] = Query(None),
     action_type: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
 ):
-    """Get list of actions with filtering and pagination"""
+    """Get list of actions with filtering and pagination (next page cursor in X-Next-Cursor)"""
     db = get_database()
     
     try:
@@ -243,7 +281,10 @@ async def get_actions(
         if action_type:
             filter_dict["action_type"] = action_type
         
-        actions = await actions_col.find(filter_dict).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+        actions, next_cursor = await fetch_page(
+            actions_col, filter_dict, [("created_at", -1)], limit, cursor=cursor, skip=skip
+        )
+        set_next_cursor(response, next_cursor)
         
         return [
             ActionResponse(
@@ -257,6 +298,8 @@ async def get_actions(
             )
             for a in actions
         ]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -293,7 +336,7 @@ async def health_check():
     
     try:
         # Try to access database
-        await db["groups"].count_documents({})
+        await db["groups"].estimated_document_count()
         return {
             "status": "healthy",
             "database": "connected",
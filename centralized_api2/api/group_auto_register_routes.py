@@ -7,6 +7,8 @@ from fastapi import APIRouter, HTTPException, Body
 from datetime import datetime
 import logging
 
+from centralized_api.services.group_registration import GroupRegistrationService
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/groups", tags=["groups"])
@@ -326,92 +328,35 @@ async def bulk_register_groups(
     if not groups or not isinstance(groups, list):
         raise HTTPException(status_code=400, detail="groups must be a non-empty list")
     
-    try:
-        groups_col = db['groups']
-        
-        created = 0
-        updated = 0
-        failed = 0
-        errors = []
-        
-        for group_data in groups:
-            try:
-                group_id = group_data.get('group_id')
-                group_name = group_data.get('group_name', 'Unknown')
-                
-                if not group_id:
-                    failed += 1
-                    errors.append("Missing group_id in one of the entries")
-                    continue
-                
-                # Check if exists
-                existing = await groups_col.find_one({'group_id': group_id})
-                
-                if existing:
-                    # Update
-                    await groups_col.update_one(
-                        {'group_id': group_id},
-                        {
-                            '$set': {
-                                'group_name': group_name,
-                                'member_count': group_data.get('member_count', 0),
-                                'admin_count': group_data.get('admin_count', 0),
-                                'updated_at': datetime.utcnow(),
-                            }
-                        }
-                    )
-                    updated += 1
-                else:
-                    # Create
-                    group_doc = {
-                        'group_id': group_id,
-                        'group_name': group_name,
-                        'group_type': group_data.get('group_type', 'group'),
-                        'description': group_data.get('description', ''),
-                        'member_count': group_data.get('member_count', 0),
-                        'admin_count': group_data.get('admin_count', 0),
-                        'photo_url': group_data.get('photo_url', ''),
-                        'is_active': True,
-                        'created_at': datetime.utcnow(),
-                        'updated_at': datetime.utcnow(),
-                        'metadata': {
-                            'auto_registered': True,
-                            'registration_source': 'bulk_import',
-                        },
-                        'settings': {
-                            'auto_warn_enabled': False,
-                            'auto_mute_enabled': False,
-                            'spam_threshold': 5,
-                            'profanity_filter': False,
-                        },
-                        'stats': {
-                            'total_actions': 0,
-                            'total_warnings': 0,
-                            'total_mutes': 0,
-                            'total_bans': 0,
-                        }
-                    }
-                    
-                    await groups_col.insert_one(group_doc)
-                    created += 1
-                    
-            except Exception as e:
-                logger.error(f"Error registering group: {e}")
-                failed += 1
-                errors.append(f"Error for {group_data.get('group_name')}: {str(e)}")
-        
-        logger.info(f"Bulk registration: {created} created, {updated} updated, {failed} failed")
-        
-        return {
-            "success": True,
-            "created": created,
-            "updated": updated,
-            "failed": failed,
-            "total": len(groups),
-            "errors": errors if errors else [],
-            "message": f"Bulk registration complete: {created} created, {updated} updated, {failed} failed"
-        }
-        
-    except Exception as e:
-        logger.error(f"Error in bulk registration: {e}")
-        raise HTTPException(status_code=500, detail=f"Bulk registration failed: {str(e)}")
+    result = await GroupRegistrationService(db).bulk_register_groups(groups, source='bulk_import')
+    if not result['success']:
+        raise HTTPException(status_code=500, detail=f"Bulk registration failed: {result.get('error')}")
+    return result
+
+
+@router.post("/bulk-update-stats")
+async def bulk_update_group_stats(
+    groups: list = Body(..., embed=True)
+):
+    """
+    Update member/admin counts for many groups in one request
+    
+    Request:
+    {
+        "groups": [
+            {"group_id": -1001234567890, "member_count": 150, "admin_count": 3},
+            ...
+        ]
+    }
+    """
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not initialized")
+    
+    if not groups or not isinstance(groups, list):
+        raise HTTPException(status_code=400, detail="groups must be a non-empty list")
+    
+    result = await GroupRegistrationService(db).bulk_update_group_stats(groups)
+    if not result['success']:
+        raise HTTPException(status_code=500, detail=f"Bulk stats update failed: {result.get('error') or result.get('message')}")
+    return result
+
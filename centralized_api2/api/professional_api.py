@@ -11,6 +11,9 @@ from fastapi import APIRouter, HTTPException, Query, Depends, Body
 from pydantic import BaseModel, Field, validator
 
 from centralized_api.core.database import get_db_manager, DatabaseManager
+from shared.counts import COUNT_MODE_PATTERN
+from shared.pagination import InvalidCursor
+from shared.responses import json_response
 
 logger = logging.getLogger(__name__)
 
@@ -176,6 +179,8 @@ async def list_groups(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     active_only: bool = Query(True),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (ignores page)"),
+    count: str = Query("cached", pattern=COUNT_MODE_PATTERN, description="Total count strategy (none: has_more only)"),
     db: DatabaseManager = Depends(get_db_manager)
 ):
     """Get all groups with pagination"""
@@ -183,19 +188,25 @@ async def list_groups(
         result = await db.get_all_groups(
             active_only=active_only,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            cursor=cursor,
+            count=count
         )
         
-        return {
+        return json_response({
             "success": True,
             "data": result['items'],
             "pagination": {
                 "page": result['page'],
                 "per_page": result['per_page'],
                 "total": result['total'],
-                "pages": result['pages']
+                "pages": result['pages'],
+                "next_cursor": result['next_cursor'],
+                "has_more": result['has_more']
             }
-        }
+        })
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing groups: {e}")
         raise HTTPException(status_code=500, detail="Failed to list groups")
@@ -401,6 +412,8 @@ async def get_group_actions(
     group_id: int,
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (ignores page)"),
+    count: str = Query("cached", pattern=COUNT_MODE_PATTERN, description="Total count strategy (none: has_more only)"),
     db: DatabaseManager = Depends(get_db_manager)
 ):
     """Get actions for a group"""
@@ -408,19 +421,25 @@ async def get_group_actions(
         result = await db.get_group_actions(
             group_id=group_id,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            cursor=cursor,
+            count=count
         )
         
-        return {
+        return json_response({
             "success": True,
             "data": result['items'],
             "pagination": {
                 "page": result['page'],
                 "per_page": result['per_page'],
                 "total": result['total'],
-                "pages": result['pages']
+                "pages": result['pages'],
+                "next_cursor": result['next_cursor'],
+                "has_more": result['has_more']
             }
-        }
+        })
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting actions: {e}")
         raise HTTPException(status_code=500, detail="Failed to get actions")
@@ -431,6 +450,8 @@ async def get_user_actions(
     user_id: int,
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (ignores page)"),
+    count: str = Query("cached", pattern=COUNT_MODE_PATTERN, description="Total count strategy (none: has_more only)"),
     db: DatabaseManager = Depends(get_db_manager)
 ):
     """Get actions by a user"""
@@ -438,19 +459,25 @@ async def get_user_actions(
         result = await db.get_user_actions(
             user_id=user_id,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            cursor=cursor,
+            count=count
         )
         
-        return {
+        return json_response({
             "success": True,
             "data": result['items'],
             "pagination": {
                 "page": result['page'],
                 "per_page": result['per_page'],
                 "total": result['total'],
-                "pages": result['pages']
+                "pages": result['pages'],
+                "next_cursor": result['next_cursor'],
+                "has_more": result['has_more']
             }
-        }
+        })
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting user actions: {e}")
         raise HTTPException(status_code=500, detail="Failed to get actions")
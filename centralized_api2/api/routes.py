@@ -4,10 +4,11 @@ Endpoints for action execution and management
 """
 
 import logging
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Query, Path
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, HTTPException, Query, Path
+from fastapi.responses import JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from centralized_api.config import MONGODB_URI, MONGODB_DATABASE
 
@@ -28,7 +29,11 @@ from centralized_api.models import (
 )
 from centralized_api.services import ActionExecutor
 from centralized_api.db import ActionDatabase
-from centralized_api.config import API_PREFIX
+from centralized_api.config import API_PREFIX, MAX_BATCH_ACTIONS
+from centralized_api.core.member_state import MemberStateStore, active_restrictions
+from shared.responses import json_response
+from shared.batch_runner import STREAM_MEDIA_TYPES
+from centralized_api.services.dead_letter_replay import ERROR_CLASS_PATTERN, dead_letter_query
 
 logger = logging.getLogger(__name__)
 
@@ -119,12 +124,42 @@ async def execute_action(request: ActionRequest) -> ActionResponse:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/actions/enqueue", status_code=202)
+async def enqueue_action(request: ActionRequest):
+    """
+    Queue a single action and return its action_id immediately
+    
+    A worker runs the action; retries and flood waits are rescheduled in
+    the queue. Poll `/actions/status/{action_id}` for the outcome.
+    """
+    executor = await get_executor()
+    try:
+        action_id = await executor.enqueue_action(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"action_id": action_id, "status": ActionStatus.PENDING.value}
+
+
+@router.get("/actions/queue/stats")
+async def get_queue_stats():
+    """Job counts per status and worker pool metrics"""
+    executor = await get_executor()
+    return await executor.get_queue_stats()
+
+
 @router.post("/actions/batch", response_model=List[ActionResponse])
-async def execute_batch(requests: List[ActionRequest]) -> List[ActionResponse]:
+async def execute_batch(
+    requests: List[ActionRequest],
+    concurrency: Optional[int] = Query(None, ge=1, description="Actions in flight at once"),
+    stream: Optional[str] = Query(None, pattern="^(ndjson|sse)$", description="Stream progress instead of waiting"),
+):
     """
     Execute multiple actions in batch
     
-    All actions are executed concurrently for speed.
+    Actions run concurrently up to `concurrency` at a time, paced per chat
+    and honouring Telegram flood waits. With `stream=ndjson|sse` progress
+    events are streamed as actions complete; the batch id (X-Batch-Id
+    header) can be used to re-attach, cancel or resume.
     
     Example:
     ```json
@@ -148,11 +183,19 @@ async def execute_batch(requests: List[ActionRequest]) -> List[ActionResponse]:
         if not requests:
             raise ValueError("Batch must contain at least one action")
 
-        if len(requests) > 100:
-            raise ValueError("Batch size limited to 100 actions")
+        if len(requests) > MAX_BATCH_ACTIONS:
+            raise ValueError(f"Batch size limited to {MAX_BATCH_ACTIONS} actions")
 
         executor = await get_executor()
-        responses = await executor.execute_batch(requests)
+        if stream:
+            run = executor.submit_batch(requests, concurrency=concurrency)
+            return StreamingResponse(
+                executor.batches.stream(run.batch_id, stream),
+                media_type=STREAM_MEDIA_TYPES[stream],
+                headers={"X-Batch-Id": run.batch_id},
+            )
+
+        responses = await executor.execute_batch(requests, concurrency=concurrency)
         return responses
 
     except ValueError as e:
@@ -163,6 +206,72 @@ async def execute_batch(requests: List[ActionRequest]) -> List[ActionResponse]:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/actions/batch/async", status_code=202)
+async def submit_batch(
+    requests: List[ActionRequest],
+    concurrency: Optional[int] = Query(None, ge=1, description="Actions in flight at once"),
+):
+    """Start a batch in the background and return its id immediately"""
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one action")
+    if len(requests) > MAX_BATCH_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"Batch size limited to {MAX_BATCH_ACTIONS} actions")
+
+    executor = await get_executor()
+    return executor.submit_batch(requests, concurrency=concurrency).summary()
+
+
+async def _get_batch_run(batch_id: str):
+    executor = await get_executor()
+    run = executor.batches.get(batch_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return executor, run
+
+
+@router.get("/actions/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Progress of a batch"""
+    _, run = await _get_batch_run(batch_id)
+    return run.summary()
+
+
+@router.get("/actions/batch/{batch_id}/events")
+async def stream_batch_events(
+    batch_id: str,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$"),
+    after: int = Query(-1, ge=-1, description="Only events with a higher seq"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """Stream a batch's progress events from an offset (SSE clients resume from Last-Event-ID)"""
+    executor, run = await _get_batch_run(batch_id)
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    return StreamingResponse(
+        executor.batches.stream(run.batch_id, format, after),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"X-Batch-Id": run.batch_id},
+    )
+
+
+@router.post("/actions/batch/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    """Stop a running batch (finished actions are kept)"""
+    executor, _ = await _get_batch_run(batch_id)
+    run = await executor.batches.cancel(batch_id)
+    return run.summary()
+
+
+@router.post("/actions/batch/{batch_id}/resume")
+async def resume_batch(batch_id: str):
+    """Continue a cancelled batch with its unfinished actions"""
+    executor, run = await _get_batch_run(batch_id)
+    if run.status == "running":
+        raise HTTPException(status_code=409, detail="Batch is still running")
+    executor.batches.resume(batch_id)
+    return run.summary()
+
+
 # ============================================================================
 # ACTION STATUS & HISTORY ENDPOINTS
 # ============================================================================
@@ -323,7 +432,14 @@ async def get_group_statistics(
 # ============================================================================
 
 @router.get("/actions/dead-letters")
-async def get_dead_letters() -> dict:
+async def get_dead_letters(
+    group_id: Optional[int] = Query(None, description="Filter by group"),
+    action_type: Optional[str] = Query(None, description="Filter by action type"),
+    error_class: Optional[str] = Query(None, pattern=ERROR_CLASS_PATTERN, description="Filter by error class"),
+    since: Optional[datetime] = Query(None, description="Failed at or after"),
+    until: Optional[datetime] = Query(None, description="Failed before"),
+    resolved: Optional[bool] = Query(None, description="Filter by resolved/replayed state"),
+) -> dict:
     """
     Get dead letter queue (failed actions that couldn't be recovered)
     
@@ -336,17 +452,15 @@ async def get_dead_letters() -> dict:
         if not db._connected:
             raise HTTPException(status_code=503, detail="Database not connected")
 
+        query = dead_letter_query(group_id, action_type, error_class, since, until, resolved)
         dead_letters = list(
-            db.db["action_dead_letters"].find().sort("created_at", -1).limit(100)
+            db.db["action_dead_letters"].find(query, {"_id": 0}).sort("created_at", -1).limit(100)
         )
 
-        for doc in dead_letters:
-            doc.pop("_id", None)
-
-        return {
+        return json_response({
             "count": len(dead_letters),
             "dead_letters": dead_letters,
-        }
+        })
 
     except HTTPException:
         raise
@@ -355,6 +469,68 @@ async def get_dead_letters() -> dict:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+async def _get_replayer():
+    executor = await get_executor()
+    if executor.replays is None:
+        raise HTTPException(status_code=503, detail="Action queue not configured")
+    return executor.replays
+
+
+@router.post("/actions/dead-letters/replay", status_code=202)
+async def replay_dead_letters(
+    group_id: Optional[int] = Query(None, description="Only this group"),
+    action_type: Optional[str] = Query(None, description="Only this action type"),
+    error_class: Optional[str] = Query(None, pattern=ERROR_CLASS_PATTERN, description="Only this error class"),
+    since: Optional[datetime] = Query(None, description="Failed at or after"),
+    until: Optional[datetime] = Query(None, description="Failed before"),
+    limit: Optional[int] = Query(None, ge=1, description="Replay at most this many dead letters"),
+    batch_size: Optional[int] = Query(None, ge=1, le=1000, description="Dead letters per batch"),
+    rate: Optional[float] = Query(None, gt=0, description="Dead letters enqueued per second"),
+    dry_run: bool = Query(False, description="Count what would be replayed without enqueuing"),
+):
+    """
+    Re-enqueue unresolved dead letters matching the filters
+    
+    Dead letters whose action (or a later action on the same member, e.g.
+    an unmute after a failed mute) has since succeeded are resolved without
+    replaying. Returns a replay id; poll `/actions/dead-letters/replay/{id}`
+    for progress.
+    """
+    replayer = await _get_replayer()
+    run = replayer.submit(
+        group_id=group_id,
+        action_type=action_type,
+        error_class=error_class,
+        since=since,
+        until=until,
+        limit=limit,
+        batch_size=batch_size,
+        rate=rate,
+        dry_run=dry_run,
+    )
+    return run.summary()
+
+
+@router.get("/actions/dead-letters/replay/{replay_id}")
+async def get_replay_status(replay_id: str = Path(..., description="Replay ID")):
+    """Progress of a dead-letter replay"""
+    replayer = await _get_replayer()
+    run = replayer.get(replay_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Replay not found")
+    return run.summary()
+
+
+@router.post("/actions/dead-letters/replay/{replay_id}/cancel")
+async def cancel_replay(replay_id: str = Path(..., description="Replay ID")):
+    """Stop a replay; dead letters already enqueued stay queued"""
+    replayer = await _get_replayer()
+    run = await replayer.cancel(replay_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Replay not found")
+    return run.summary()
+
+
 # ============================================================================
 # HELPER ENDPOINTS
 # ============================================================================
@@ -408,7 +584,6 @@ async def check_pre_action_validation(
     """
     try:
         db = get_db()
-        actions_collection = db["actions"]
         
         # Map action types to their corresponding status checks
         action_status_map = {
@@ -454,34 +629,13 @@ async def check_pre_action_validation(
         # ==========================================
         # Check 2: Admin permission (is admin muted/restricted?)
         # ==========================================
-        admin_actions = await actions_collection.find(
-            {
-                "group_id": group_id,
-                "user_id": admin_id,
-            }
-        ).sort("created_at", -1).limit(50).to_list(50)
-        
-        admin_current_mute = False
-        admin_current_restrict = False
-        
-        for admin_action in admin_actions:
-            admin_action_t = admin_action.get("action_type", "").lower()
-            
-            if admin_action_t == "mute" and not admin_current_mute:
-                admin_current_mute = True
-                checks["admin_muted"] = True
-            elif admin_action_t == "unmute" and admin_current_mute:
-                admin_current_mute = False
-                checks["admin_muted"] = False
-            elif admin_action_t == "restrict" and not admin_current_restrict:
-                admin_current_restrict = True
-                checks["admin_restricted"] = True
-            elif admin_action_t == "unrestrict" and admin_current_restrict:
-                admin_current_restrict = False
-                checks["admin_restricted"] = False
-            
-            if any([admin_current_mute, admin_current_restrict]):
-                break
+        # Both members' materialized states in one indexed read
+        states = await MemberStateStore(db).get_many(group_id, [admin_id, user_id])
+        admin_restrictions = active_restrictions(states[admin_id])
+        admin_current_mute = "mute" in admin_restrictions
+        admin_current_restrict = "restrict" in admin_restrictions
+        checks["admin_muted"] = admin_current_mute
+        checks["admin_restricted"] = admin_current_restrict
         
         # Admin cannot take action if muted or restricted
         if admin_current_mute:
@@ -507,45 +661,10 @@ async def check_pre_action_validation(
         # ==========================================
         # Check 3: Duplicate action prevention
         # ==========================================
-        user_actions = await actions_collection.find(
-            {
-                "group_id": group_id,
-                "user_id": user_id,
-            }
-        ).sort("created_at", -1).limit(100).to_list(100)
-        
-        current_restrictions = []
-        current_ban = False
-        current_mute = False
-        current_restrict = False
-        
-        for action in user_actions:
-            action_t = action.get("action_type", "").lower()
-            
-            if action_t == "ban" and not current_ban:
-                current_ban = True
-                current_restrictions.append("ban")
-            elif action_t == "unban" and current_ban:
-                current_ban = False
-                if "ban" in current_restrictions:
-                    current_restrictions.remove("ban")
-            elif action_t == "mute" and not current_mute:
-                current_mute = True
-                current_restrictions.append("mute")
-            elif action_t == "unmute" and current_mute:
-                current_mute = False
-                if "mute" in current_restrictions:
-                    current_restrictions.remove("mute")
-            elif action_t == "restrict" and not current_restrict:
-                current_restrict = True
-                current_restrictions.append("restrict")
-            elif action_t == "unrestrict" and current_restrict:
-                current_restrict = False
-                if "restrict" in current_restrictions:
-                    current_restrictions.remove("restrict")
-            
-            if any([current_ban, current_mute, current_restrict]):
-                break
+        current_restrictions = active_restrictions(states[user_id])
+        current_ban = "ban" in current_restrictions
+        current_mute = "mute" in current_restrictions
+        current_restrict = "restrict" in current_restrictions
         
         # Check for duplicate restriction
         if check_action is not None:
@@ -21,7 +21,7 @@ load_dotenv(env_path, override=True)
 
 from centralized_api.config import API_PREFIX
 from centralized_api.db.mongodb import ActionDatabase
-from centralized_api.api.routes import router as action_router
+from centralized_api.api.routes import router as action_router, set_executor as set_action_executor
 from centralized_api.api.simple_actions import router as simple_actions_router, set_executor
 from centralized_api.api.advanced_rbac_routes import register_advanced_rbac_routes
 from centralized_api.api.advanced_routes import router as advanced_router
@@ -30,10 +30,13 @@ from centralized_api.api.dashboard_routes import router as dashboard_router, set
 from centralized_api.api.group_auto_register_routes import router as group_auto_register_router, set_db as set_auto_register_db
 from centralized_api.api.professional_api import router as professional_api_router, set_db_manager
 from centralized_api.core.database import init_db_manager, close_db_manager
-from centralized_api.services.executor import ActionExecutor
+from shared.responses import FastJSONResponse
+from centralized_api.services.executor import ActionExecutor, create_bot
+from centralized_api.services.action_queue import ActionQueue
 from centralized_api.services.superadmin_service import SuperadminService
 from centralized_api.services.group_admin_service import GroupAdminService
-from centralized_api.config import MONGODB_URI, MONGODB_DATABASE
+from centralized_api.services.stream_ingestion import ActionStreamIngestion, REDIS_AVAILABLE, aioredis
+from centralized_api.config import MONGODB_URI, MONGODB_DATABASE, REDIS_URI, REDIS_PASSWORD, ACTION_STREAM_ENABLED
 from motor.motor_asyncio import AsyncIOMotorClient
 
 # Configure logging
@@ -48,11 +51,12 @@ _db: Optional[ActionDatabase] = None
 _executor: Optional[ActionExecutor] = None
 _superadmin_service: Optional[SuperadminService] = None
 _group_admin_service: Optional[GroupAdminService] = None
+_stream_ingestion: Optional[ActionStreamIngestion] = None
 
 
 async def init_services(app: FastAPI):
     """Initialize all services on startup"""
-    global _db, _executor, _superadmin_service, _group_admin_service
+    global _db, _executor, _superadmin_service, _group_admin_service, _stream_ingestion
     
     try:
         logger.info("🚀 Initializing Centralized API services...")
@@ -80,13 +84,42 @@ async def init_services(app: FastAPI):
             logger.warning(f"Could not initialize DatabaseManager: {e}")
         
         
-        # Initialize services (bot is optional for centralized API)
-        _executor = ActionExecutor(bot=None, db=_db)
+        # Initialize services (bot is optional for centralized API; created
+        # only when TELEGRAM_BOT_TOKEN is set, against TELEGRAM_API_BASE)
+        try:
+            bot = create_bot()
+        except Exception as e:
+            logger.warning(f"Could not create Telegram bot: {e}")
+            bot = None
+        action_queue = None
+        if getattr(app.state, "motor_db", None) is not None:
+            action_queue = ActionQueue(app.state.motor_db)
+        _executor = ActionExecutor(bot=bot, db=_db, queue=action_queue)
+        if action_queue is not None:
+            try:
+                await action_queue.ensure_indexes()
+                await _executor.replays.ensure_indexes()
+            except Exception as e:
+                logger.warning(f"Could not create action queue indexes: {e}")
+        if _executor.start_workers():
+            logger.info("✅ Action queue workers started")
+
+        # Web/dashboard actions arriving on the Redis Stream
+        if ACTION_STREAM_ENABLED and REDIS_AVAILABLE:
+            try:
+                redis_client = aioredis.from_url(REDIS_URI, password=REDIS_PASSWORD, decode_responses=True)
+                _stream_ingestion = ActionStreamIngestion(_executor, redis_client)
+                await _stream_ingestion.start()
+                logger.info("✅ Action stream consumers started")
+            except Exception as e:
+                logger.warning(f"Could not start action stream ingestion: {e}")
+                _stream_ingestion = None
         _superadmin_service = SuperadminService(db=_db)
         _group_admin_service = GroupAdminService(db=_db)
         
         # Initialize simple actions executor (for bot compatibility)
         set_executor(_executor)
+        set_action_executor(_executor)
         
         # Initialize web control database (for web API)
         set_web_database(_db)
@@ -111,9 +144,16 @@ async def close_services():
     try:
         logger.info("🛑 Shutting down services...")
         
+        if _stream_ingestion:
+            await _stream_ingestion.stop()
+            await _stream_ingestion.redis.close()
+        if _executor:
+            await _executor.stop_workers()
         if _db:
             await _db.disconnect()
             logger.info("✅ MongoDB disconnected")
+        if _executor and _executor.bot:
+            await _executor.bot.session.close()
         # Close motor client if present on app.state
         try:
             # app may not be available here; try to close any global motor client
@@ -149,7 +189,8 @@ app = FastAPI(
     title="Centralized API",
     description="Core API service for bot and web services",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
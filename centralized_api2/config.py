@@ -44,6 +44,34 @@ BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", "30.0"))
 # Maximum concurrent actions
 MAX_CONCURRENT_ACTIONS = int(os.getenv("MAX_CONCURRENT_ACTIONS", "100"))
 
+# Minimum spacing between two actions in the same chat (seconds)
+BATCH_CHAT_INTERVAL = float(os.getenv("BATCH_CHAT_INTERVAL", "0.05"))
+
+# Maximum actions accepted in one batch request
+MAX_BATCH_ACTIONS = int(os.getenv("MAX_BATCH_ACTIONS", "5000"))
+
+# ============================================================================
+# ACTION QUEUE CONFIGURATION
+# ============================================================================
+
+# Queue workers per API process
+ACTION_WORKERS = int(os.getenv("ACTION_WORKERS", "8"))
+
+# Seconds a claimed job stays leased before another worker may take it over
+ACTION_VISIBILITY_TIMEOUT = float(os.getenv("ACTION_VISIBILITY_TIMEOUT", "120"))
+
+# Idle workers poll the queue at most this often (seconds)
+ACTION_QUEUE_POLL_INTERVAL = float(os.getenv("ACTION_QUEUE_POLL_INTERVAL", "1.0"))
+
+# Finished jobs are kept this long for status lookups (seconds)
+ACTION_JOB_RETENTION = int(os.getenv("ACTION_JOB_RETENTION", str(7 * 24 * 3600)))
+
+# Dead letters re-enqueued per replay batch
+DEAD_LETTER_REPLAY_BATCH = int(os.getenv("DEAD_LETTER_REPLAY_BATCH", "200"))
+
+# Maximum dead letters re-enqueued per second during a replay
+DEAD_LETTER_REPLAY_RATE = float(os.getenv("DEAD_LETTER_REPLAY_RATE", "100"))
+
 # ============================================================================
 # API CONFIGURATION
 # ============================================================================
@@ -102,6 +130,8 @@ ENABLE_HISTORY = os.getenv("ENABLE_HISTORY", "true").lower() == "true"
 
 COLLECTION_ACTIONS = "action_logs"
 COLLECTION_DEAD_LETTERS = "action_dead_letters"
+COLLECTION_ACTION_JOBS = "action_jobs"
+COLLECTION_MEMBER_STATES = "member_states"
 COLLECTION_WARNINGS = "user_warnings"
 COLLECTION_ROLES = "user_roles"
 
@@ -112,6 +142,10 @@ COLLECTION_ROLES = "user_roles"
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_API_TIMEOUT = int(os.getenv("TELEGRAM_API_TIMEOUT", "30"))
 
+# Bot API server (set to a local server such as api_v2.telegram.fake_server
+# for benchmarks and integration tests)
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
 # ============================================================================
 # REDIS CONFIGURATION (for integration with bot)
 # ============================================================================
@@ -123,6 +157,28 @@ REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
 
 REDIS_URI = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
+# Web/dashboard action ingestion over a Redis Stream consumer group
+ACTION_STREAM_ENABLED = os.getenv("ACTION_STREAM_ENABLED", "false").lower() == "true"
+ACTION_STREAM = os.getenv("ACTION_STREAM", "web:actions:stream")
+ACTION_STREAM_GROUP = os.getenv("ACTION_STREAM_GROUP", "centralized-api")
+ACTION_STREAM_DEAD = os.getenv("ACTION_STREAM_DEAD", "web:actions:dead")
+
+# Consumers per API process (processes scale out horizontally)
+ACTION_STREAM_CONSUMERS = int(os.getenv("ACTION_STREAM_CONSUMERS", "4"))
+
+# Entries read per consumer per round trip
+ACTION_STREAM_BATCH = int(os.getenv("ACTION_STREAM_BATCH", "10"))
+
+# Pending entries idle this long (ms) are reclaimed from dead consumers
+ACTION_STREAM_CLAIM_IDLE_MS = int(os.getenv("ACTION_STREAM_CLAIM_IDLE_MS", "60000"))
+
+# Deliveries before an entry is moved to the dead stream
+ACTION_STREAM_MAX_DELIVERIES = int(os.getenv("ACTION_STREAM_MAX_DELIVERIES", "5"))
+
+# Approximate stream length cap and result key lifetime (seconds)
+ACTION_STREAM_MAXLEN = int(os.getenv("ACTION_STREAM_MAXLEN", "100000"))
+ACTION_RESULT_TTL = int(os.getenv("ACTION_RESULT_TTL", "3600"))
+
 # ============================================================================
 # VALIDATION ERRORS
 # ============================================================================
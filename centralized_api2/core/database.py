@@ -13,6 +13,10 @@ from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncI
 from pymongo import UpdateOne, InsertOne, DeleteOne, ASCENDING, DESCENDING, TEXT
 from pymongo.errors import DuplicateKeyError, ConnectionFailure
 
+from shared.counts import get_count_cache
+from centralized_api.core.member_state import MemberStateStore
+from shared.pagination import fetch_page
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,6 +34,9 @@ class DatabaseIndex:
                 (('updated_at',), {}),
                 (('member_count',), {}),
                 (('admin_count',), {}),
+                # Keyset pagination: filter fields, sort key, _id tiebreaker
+                ((('is_active', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)), {}),
+                ((('created_at', DESCENDING), ('_id', DESCENDING)), {}),
             ],
             'users': [
                 (('user_id',), {'unique': True}),
@@ -44,6 +51,16 @@ class DatabaseIndex:
                 (('created_at',), {}),
                 (('status',), {}),
                 (('group_id', 'created_at'), {}),  # Composite index
+                # Keyset pagination: filter fields, sort key, _id tiebreaker
+                ((('group_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)), {}),
+                ((('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)), {}),
+                ((('action_type', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)), {}),
+                ((('group_id', ASCENDING), ('action_type', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)), {}),
+                ((('created_at', DESCENDING), ('_id', DESCENDING)), {}),
+            ],
+            'member_states': [
+                # Pre-action checks: one point read per (group, user)
+                ((('group_id', ASCENDING), ('user_id', ASCENDING)), {'unique': True}),
             ],
             'logs': [
                 (('event_type',), {}),
@@ -237,33 +254,45 @@ class QueryBuilder:
         
         return await query.to_list(None)
     
-    async def count(self) -> int:
-        """Count matching documents"""
-        return await self.collection.count_documents(self.filter)
+    async def count(self, mode: str = "exact") -> Optional[int]:
+        """Count matching documents (mode: exact, cached, estimated or none)"""
+        return await get_count_cache().count(self.collection, self.filter, mode)
     
     async def exists(self) -> bool:
         """Check if any document matches"""
-        return await self.collection.count_documents(self.filter) > 0
+        return await self.collection.find_one(self.filter, projection={'_id': 1}) is not None
     
-    async def paginate(self, page: int = 1, per_page: int = 20) -> Dict:
-        """Get paginated results"""
-        skip = (page - 1) * per_page
+    async def paginate(self, page: int = 1, per_page: int = 20, cursor: Optional[str] = None,
+                       count: str = "cached") -> Dict:
+        """
+        Get paginated results
         
-        total = await self.collection.count_documents(self.filter)
-        
-        query = self.collection.find(self.filter, projection=self.projection)
-        
-        if self.sort_spec:
-            query = query.sort(self.sort_spec)
+        Sorted by the sort spec plus `_id`. With a `cursor` (the previous
+        page's next_cursor) the page is a keyset range scan and `page` is
+        ignored; page numbers fall back to skip(). `count` picks how the
+        total is computed (see shared.counts); with "none"
+        total and pages are None and callers rely on has_more.
+        """
+        total = await self.count(count)
         
-        items = await query.skip(skip).limit(per_page).to_list(None)
+        items, next_cursor = await fetch_page(
+            self.collection,
+            self.filter,
+            self.sort_spec,
+            per_page,
+            cursor=cursor,
+            skip=(page - 1) * per_page,
+            projection=self.projection,
+        )
         
         return {
             'items': items,
             'page': page,
             'per_page': per_page,
             'total': total,
-            'pages': (total + per_page - 1) // per_page,
+            'pages': (total + per_page - 1) // per_page if total is not None else None,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
         }
 
 
@@ -273,11 +302,13 @@ class DatabaseManager:
     def __init__(self, connection: DatabaseConnection):
         self.connection = connection
         self.db = None
+        self.member_states: Optional[MemberStateStore] = None
     
     async def initialize(self) -> None:
         """Initialize the manager"""
         await self.connection.connect()
         self.db = self.connection.db
+        self.member_states = MemberStateStore(self.db)
     
     async def close(self) -> None:
         """Close the manager"""
@@ -292,6 +323,7 @@ class DatabaseManager:
             group_data['updated_at'] = datetime.utcnow()
             
             result = await self.db['groups'].insert_one(group_data)
+            get_count_cache().note_insert(self.db['groups'], group_data)
             logger.info(f"✓ Created group: {group_data.get('group_name')}")
             return str(result.inserted_id)
         except DuplicateKeyError:
@@ -320,7 +352,9 @@ class DatabaseManager:
         """Get group by ID"""
         return await QueryBuilder(self.db['groups']).where(group_id=group_id).first()
     
-    async def get_all_groups(self, active_only: bool = True, page: int = 1, per_page: int = 20) -> Dict:
+    async def get_all_groups(
+        self, active_only: bool = True, page: int = 1, per_page: int = 20, cursor: Optional[str] = None, count: str = "cached"
+    ) -> Dict:
         """Get paginated groups"""
         query = QueryBuilder(self.db['groups'])
         
@@ -329,7 +363,7 @@ class DatabaseManager:
         
         query.sort('created_at', DESCENDING)
         
-        return await query.paginate(page, per_page)
+        return await query.paginate(page, per_page, cursor=cursor, count=count)
     
     # ==================== USER OPERATIONS ====================
     
@@ -340,6 +374,7 @@ class DatabaseManager:
             user_data['updated_at'] = datetime.utcnow()
             
             result = await self.db['users'].insert_one(user_data)
+            get_count_cache().note_insert(self.db['users'], user_data)
             logger.info(f"✓ Created user: {user_data.get('username')}")
             return str(result.inserted_id)
         except DuplicateKeyError:
@@ -366,26 +401,32 @@ class DatabaseManager:
             action_data['updated_at'] = datetime.utcnow()
             
             result = await self.db['actions'].insert_one(action_data)
+            get_count_cache().note_insert(self.db['actions'], action_data)
+            await self.member_states.apply_action(action_data)
             return str(result.inserted_id)
         except Exception as e:
             logger.error(f"❌ Error creating action: {e}")
             raise
     
-    async def get_group_actions(self, group_id: int, page: int = 1, per_page: int = 50) -> Dict:
+    async def get_group_actions(
+        self, group_id: int, page: int = 1, per_page: int = 50, cursor: Optional[str] = None, count: str = "cached"
+    ) -> Dict:
         """Get actions for a group"""
         query = QueryBuilder(self.db['actions'])
         query.where(group_id=group_id)
         query.sort('created_at', DESCENDING)
         
-        return await query.paginate(page, per_page)
+        return await query.paginate(page, per_page, cursor=cursor, count=count)
     
-    async def get_user_actions(self, user_id: int, page: int = 1, per_page: int = 50) -> Dict:
+    async def get_user_actions(
+        self, user_id: int, page: int = 1, per_page: int = 50, cursor: Optional[str] = None, count: str = "cached"
+    ) -> Dict:
         """Get actions by a user"""
         query = QueryBuilder(self.db['actions'])
         query.where(user_id=user_id)
         query.sort('created_at', DESCENDING)
         
-        return await query.paginate(page, per_page)
+        return await query.paginate(page, per_page, cursor=cursor, count=count)
     
     # ==================== STATISTICS OPERATIONS ====================
     
@@ -399,7 +440,7 @@ class DatabaseManager:
             
             actions_query = QueryBuilder(self.db['actions'])
             actions_query.where(group_id=group_id)
-            total_actions = await actions_query.count()
+            total_actions = await actions_query.count("cached")
             
             return {
                 'group_id': group_id,
@@ -419,14 +460,14 @@ class DatabaseManager:
         try:
             groups_query = QueryBuilder(self.db['groups'])
             groups_query.where(is_active=True)
-            total_groups = await groups_query.count()
+            total_groups = await groups_query.count("cached")
             
             users_query = QueryBuilder(self.db['users'])
             users_query.where(is_active=True)
-            total_users = await users_query.count()
+            total_users = await users_query.count("cached")
             
             actions_query = QueryBuilder(self.db['actions'])
-            total_actions = await actions_query.count()
+            total_actions = await actions_query.count("estimated")
             
             return {
                 'total_groups': total_groups,
@@ -515,6 +556,8 @@ class DatabaseManager:
                 }
             )
             
+            if result.modified_count:
+                get_count_cache().invalidate(self.db['groups'])
             return result.modified_count > 0
         except Exception as e:
             logger.error(f"❌ Error deleting group: {e}")
@@ -0,0 +1,230 @@
+"""
+Member State - Materialized restriction state per (group, user)
+
+One document per member in `member_states` holds whether they are
+currently banned, muted or restricted:
+
+    {group_id, user_id, banned, muted, muted_until, restricted,
+     last_action, last_action_at, updated_at}
+
+Every action write also applies the action to the member's state with a
+single atomic update. The update only lands if the action is not older than
+the state (`last_action_at`), so concurrent or out-of-order writers cannot
+roll the state back. Pre-action checks read the state for admin and target
+in one indexed query instead of replaying their action history.
+
+Members without a state document (history written before states existed)
+are backfilled from their latest actions on first read.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# action_type -> state fields it sets
+STATE_EFFECTS: Dict[str, Dict[str, Any]] = {
+    "ban": {"banned": True},
+    "unban": {"banned": False},
+    "mute": {"muted": True},
+    "unmute": {"muted": False, "muted_until": None},
+    "restrict": {"restricted": True},
+    "unrestrict": {"restricted": False},
+}
+
+EMPTY_STATE = {"banned": False, "muted": False, "muted_until": None, "restricted": False}
+
+# Backfill reads at most this many past actions per member
+BACKFILL_HISTORY = 100
+
+_FAILED_STATUSES = {"failed", "cancelled", "pending", "in_progress", "retrying"}
+
+
+def _action_type(action: Dict[str, Any]) -> str:
+    value = action.get("action_type") or ""
+    return str(getattr(value, "value", value)).lower()
+
+
+def changes_state(action: Dict[str, Any]) -> bool:
+    """Whether an action document affects member state (and took effect)"""
+    if _action_type(action) not in STATE_EFFECTS:
+        return False
+    if action.get("success") is False:
+        return False
+    status = action.get("status")
+    return str(getattr(status, "value", status)).lower() not in _FAILED_STATUSES
+
+
+def restriction_minutes(source: Any) -> Optional[int]:
+    """
+    Restriction length in minutes of a request model or action document
+
+    `duration_minutes` wins when set; otherwise `duration` (MuteRequest's
+    field, in seconds) is converted. This is the one place that reads
+    durations in seconds.
+    """
+    if isinstance(source, dict):
+        minutes, seconds = source.get("duration_minutes"), source.get("duration")
+    else:
+        minutes, seconds = getattr(source, "duration_minutes", None), getattr(source, "duration", None)
+    if minutes:
+        return int(minutes)
+    if seconds:
+        return max(int(seconds) // 60, 1)
+    return None
+
+
+def state_update(
+    group_id: int,
+    user_id: int,
+    action_type: str,
+    at: datetime,
+    duration_minutes: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    (filter, update) applying one action to a member's state
+
+    Use with update_one(..., upsert=True); a DuplicateKeyError means the
+    stored state is newer than the action (or a concurrent first write won
+    the insert).
+    """
+    action_type = str(getattr(action_type, "value", action_type)).lower()
+    fields = dict(STATE_EFFECTS.get(action_type, {}))
+    if action_type == "mute":
+        fields["muted_until"] = at + timedelta(minutes=duration_minutes) if duration_minutes else None
+    fields.update({
+        "last_action": action_type,
+        "last_action_at": at,
+        "updated_at": datetime.utcnow(),
+    })
+    defaults = {key: value for key, value in EMPTY_STATE.items() if key not in fields}
+    query = {
+        "group_id": group_id,
+        "user_id": user_id,
+        "$or": [{"last_action_at": {"$lte": at}}, {"last_action_at": None}],
+    }
+    update = {"$set": fields}
+    if defaults:
+        update["$setOnInsert"] = defaults
+    return query, update
+
+
+def state_from_history(actions: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold past action documents (any order) into a state"""
+    state = dict(EMPTY_STATE, last_action=None, last_action_at=None)
+    dated = [action for action in actions if changes_state(action)]
+    dated.sort(key=lambda action: action.get("created_at") or datetime.min)
+    for action in dated:
+        action_type = _action_type(action)
+        state.update(STATE_EFFECTS[action_type])
+        at = action.get("created_at")
+        if action_type == "mute":
+            minutes = restriction_minutes(action)
+            state["muted_until"] = at + timedelta(minutes=minutes) if minutes and at else None
+        state["last_action"] = action_type
+        state["last_action_at"] = at
+    return state
+
+
+def active_restrictions(state: Optional[Dict[str, Any]], now: Optional[datetime] = None) -> List[str]:
+    """Restrictions currently in force ("ban", "mute", "restrict")"""
+    if not state:
+        return []
+    now = now or datetime.utcnow()
+    restrictions = []
+    if state.get("banned"):
+        restrictions.append("ban")
+    muted_until = state.get("muted_until")
+    if state.get("muted") and (muted_until is None or muted_until > now):
+        restrictions.append("mute")
+    if state.get("restricted"):
+        restrictions.append("restrict")
+    return restrictions
+
+
+class MemberStateStore:
+    """Motor access to materialized member states"""
+
+    def __init__(self, db, collection: str = "member_states", history_collection: str = "actions"):
+        """
+        Args:
+            db: Motor database
+            collection: State collection name
+            history_collection: Action collection used to backfill missing states
+        """
+        self.states = db[collection]
+        self.history = db[history_collection]
+
+    async def ensure_indexes(self):
+        await self.states.create_index([("group_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+
+    async def apply(
+        self,
+        group_id: int,
+        user_id: Optional[int],
+        action_type: str,
+        at: Optional[datetime] = None,
+        duration_minutes: Optional[int] = None,
+    ) -> bool:
+        """Apply one successful action; returns False when it did not change state"""
+        if user_id is None or str(getattr(action_type, "value", action_type)).lower() not in STATE_EFFECTS:
+            return False
+        query, update = state_update(group_id, user_id, action_type, at or datetime.utcnow(), duration_minutes)
+        # A duplicate key means either a newer action already set the state
+        # or another first write for this member won the insert; retry once
+        # to tell them apart
+        for _ in range(2):
+            try:
+                await self.states.update_one(query, update, upsert=True)
+                return True
+            except DuplicateKeyError:
+                continue
+        return False
+
+    async def apply_action(self, action: Dict[str, Any]) -> bool:
+        """Apply an action document as written to an action collection"""
+        if not changes_state(action):
+            return False
+        return await self.apply(
+            action.get("group_id"),
+            action.get("user_id"),
+            _action_type(action),
+            action.get("created_at") or action.get("executed_at"),
+            restriction_minutes(action),
+        )
+
+    async def get_many(self, group_id: int, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """States of several members of a group in one query (backfilling misses)"""
+        states = {
+            doc["user_id"]: doc
+            async for doc in self.states.find({"group_id": group_id, "user_id": {"$in": user_ids}})
+        }
+        for user_id in user_ids:
+            if user_id not in states:
+                states[user_id] = await self._backfill(group_id, user_id)
+        return states
+
+    async def get(self, group_id: int, user_id: int) -> Dict[str, Any]:
+        return (await self.get_many(group_id, [user_id]))[user_id]
+
+    async def _backfill(self, group_id: int, user_id: int) -> Dict[str, Any]:
+        actions = await self.history.find(
+            {"group_id": group_id, "user_id": user_id, "action_type": {"$in": list(STATE_EFFECTS)}}
+        ).sort("created_at", DESCENDING).limit(BACKFILL_HISTORY).to_list(BACKFILL_HISTORY)
+        state = state_from_history(actions)
+        doc = dict(state, group_id=group_id, user_id=user_id, updated_at=datetime.utcnow())
+        query: Dict[str, Any] = {"group_id": group_id, "user_id": user_id}
+        if state["last_action_at"]:
+            query["$or"] = [{"last_action_at": {"$lte": state["last_action_at"]}}, {"last_action_at": None}]
+        else:
+            query["last_action_at"] = None
+        try:
+            await self.states.update_one(query, {"$set": doc}, upsert=True)
+        except DuplicateKeyError:
+            # An action landed meanwhile; its state wins
+            return await self.states.find_one({"group_id": group_id, "user_id": user_id}) or doc
+        return doc
@@ -0,0 +1,78 @@
+"""
+Stats Snapshots - Short-TTL cache for expensive dashboard aggregates
+
+Dashboard and superadmin statistics are aggregation pipelines over whole
+collections. Their results are kept as a snapshot for SNAPSHOT_TTL seconds:
+every request inside that window gets the same snapshot, and concurrent
+misses share one computation.
+
+    stats = await get_snapshot_cache().get("dashboard_stats", compute_stats)
+"""
+
+import time as time_module
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from shared.singleflight import SingleFlight
+
+SNAPSHOT_TTL = 15.0  # seconds
+
+
+class SnapshotCache:
+    """Named TTL snapshots with single-flight recomputation"""
+
+    def __init__(self, ttl: float = SNAPSHOT_TTL):
+        self.ttl = ttl
+        # key -> (expires_at, value)
+        self._snapshots: Dict[str, tuple] = {}
+        self._flights = SingleFlight()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, compute: Callable[[], Awaitable[Any]],
+                  ttl: Optional[float] = None) -> Any:
+        """Return the snapshot for `key`, computing it when missing or stale"""
+        entry = self._snapshots.get(key)
+        if entry and entry[0] > time_module.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        if self._flights.pending(key):
+            self.hits += 1
+        else:
+            self.misses += 1
+        return await self._flights.do(key, lambda: self._refresh(key, compute, ttl))
+
+    async def _refresh(self, key: str, compute: Callable[[], Awaitable[Any]],
+                       ttl: Optional[float]) -> Any:
+        # Runs inside the shared task, so the snapshot is stored even when
+        # the request that started it is cancelled
+        value = await compute()
+        self._snapshots[key] = (time_module.monotonic() + (self.ttl if ttl is None else ttl), value)
+        return value
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one snapshot (or all)"""
+        if key is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(key, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "snapshots": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_snapshot_cache: Optional[SnapshotCache] = None
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    """Process-wide snapshot cache"""
+    global _snapshot_cache
+    if _snapshot_cache is None:
+        _snapshot_cache = SnapshotCache()
+    return _snapshot_cache
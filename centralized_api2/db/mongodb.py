@@ -8,7 +8,7 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, ServerSelectionTimeoutError
 
 from centralized_api.models import ActionStatus
 from centralized_api.config import (
@@ -16,8 +16,10 @@ from centralized_api.config import (
     MONGODB_DATABASE,
     COLLECTION_ACTIONS,
     COLLECTION_DEAD_LETTERS,
+    COLLECTION_MEMBER_STATES,
     COLLECTION_WARNINGS,
 )
+from centralized_api.core.member_state import STATE_EFFECTS, state_update
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +89,12 @@ class ActionDatabase:
                 ("group_id", ASCENDING),
                 ("created_at", DESCENDING),
             ])
+
+            # Materialized member states (pre-action checks)
+            self.db[COLLECTION_MEMBER_STATES].create_index([
+                ("group_id", ASCENDING),
+                ("user_id", ASCENDING),
+            ], unique=True)
             
             logger.info("Database indexes created successfully")
         except Exception as e:
@@ -108,6 +116,7 @@ class ActionDatabase:
         retry_count: int = 0,
         api_response: Optional[Dict[str, Any]] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        duration_minutes: Optional[int] = None,
     ) -> str:
         """
         Log an action to database
@@ -127,6 +136,7 @@ class ActionDatabase:
             retry_count: Number of retries
             api_response: Response from Telegram API
             metadata: Additional metadata
+            duration_minutes: Restriction length (mute), kept in member state
             
         Returns:
             action_id
@@ -153,16 +163,41 @@ class ActionDatabase:
                 "retry_count": retry_count,
                 "api_response": api_response,
                 "metadata": metadata,
+                "duration_minutes": duration_minutes,
             }
 
             self.db[COLLECTION_ACTIONS].insert_one(doc)
             logger.info(f"Action logged: {action_id} - {action_type}")
+            if success:
+                self._apply_member_state(group_id, user_id, action_type, doc["created_at"], duration_minutes)
             return action_id
 
         except Exception as e:
             logger.error(f"Failed to log action: {str(e)}")
             return action_id
 
+    def _apply_member_state(
+        self,
+        group_id: int,
+        user_id: Optional[int],
+        action_type: str,
+        at: datetime,
+        duration_minutes: Optional[int] = None,
+    ):
+        """Apply a successful action to the member's materialized state"""
+        if user_id is None or str(getattr(action_type, "value", action_type)).lower() not in STATE_EFFECTS:
+            return
+        query, update = state_update(group_id, user_id, action_type, at, duration_minutes)
+        for _ in range(2):
+            try:
+                self.db[COLLECTION_MEMBER_STATES].update_one(query, update, upsert=True)
+                return
+            except DuplicateKeyError:
+                continue
+            except Exception as e:
+                logger.error(f"Failed to update member state: {str(e)}")
+                return
+
     async def log_dead_letter(
         self,
         action_id: str,
@@ -1,28 +1,24 @@
 """
 Example 3: Integrate with Redis Listeners
 Shows how to route Redis-based web actions through the centralized API
+
+Web actions go through a Redis Stream consumer group
+(centralized_api.services.stream_ingestion): unlike pub/sub, entries are
+kept until a consumer acknowledges them, so actions published while no
+listener is running, or held by a crashed one, are still executed.
 """
 
 import asyncio
-import json
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 
 import redis.asyncio as aioredis
 
 from centralized_api.services import ActionExecutor
-from centralized_api.models import (
-    ActionType,
-    BanRequest,
-    KickRequest,
-    MuteRequest,
-    UnmuteRequest,
-    PromoteRequest,
-    DemoteRequest,
-    WarnRequest,
-    PinRequest,
-    UnpinRequest,
-    DeleteMessageRequest,
+from centralized_api.services.stream_ingestion import (
+    ActionStreamIngestion,
+    get_action_result,
+    publish_action,
 )
 from centralized_api.config import REDIS_URI
 
@@ -31,213 +27,49 @@ logger = logging.getLogger(__name__)
 
 class RedisActionListener:
     """
-    Listen for action requests from web dashboard via Redis
+    Consume action requests from the web dashboard via a Redis Stream
     and execute them through centralized API
     """
 
-    def __init__(self, executor: ActionExecutor, redis_uri: str = REDIS_URI):
+    def __init__(self, executor: ActionExecutor, redis_uri: str = REDIS_URI, consumers: Optional[int] = None):
         """
         Initialize Redis listener
         
         Args:
             executor: ActionExecutor instance
             redis_uri: Redis connection URI
+            consumers: Parallel consumers (default ACTION_STREAM_CONSUMERS)
         """
         self.executor = executor
         self.redis_uri = redis_uri
+        self.consumers = consumers
         self.redis = None
-        self.pubsub = None
-        self._running = False
-
-    async def connect(self):
-        """Connect to Redis"""
-        try:
-            self.redis = await aioredis.from_url(self.redis_uri)
-            logger.info(f"Connected to Redis: {self.redis_uri}")
-        except Exception as e:
-            logger.error(f"Failed to connect to Redis: {str(e)}")
-            raise
-
-    async def disconnect(self):
-        """Disconnect from Redis"""
-        if self.redis:
-            await self.redis.close()
-            logger.info("Disconnected from Redis")
+        self.ingestion: Optional[ActionStreamIngestion] = None
 
     async def start(self):
-        """Start listening for action requests"""
-        if self._running:
+        """Connect and start the stream consumers"""
+        if self.ingestion:
             logger.warning("Listener already running")
             return
 
-        try:
-            await self.connect()
-            self._running = True
-            
-            # Subscribe to web action channel
-            self.pubsub = self.redis.pubsub()
-            await self.pubsub.subscribe("web:actions")
-            
-            logger.info("Started listening for web actions on Redis")
-            
-            # Listen for messages
-            async for message in self.pubsub.listen():
-                if message['type'] == 'message':
-                    await self._handle_action_message(message['data'])
-        
-        except Exception as e:
-            logger.error(f"Error in Redis listener: {str(e)}")
-            self._running = False
-            raise
-        finally:
-            await self.disconnect()
-
-    async def _handle_action_message(self, data: bytes):
-        """
-        Handle incoming action message from Redis
-        
-        Expected format:
-        {
-            "action_type": "ban",
-            "group_id": -1001234567890,
-            "user_id": 987654321,
-            "reason": "Spam",
-            "initiated_by": 111111,
-            "metadata": {...}
-        }
-        """
-        try:
-            action_data = json.loads(data)
-            
-            # Validate required fields
-            if not action_data.get('action_type'):
-                logger.warning("Missing action_type in Redis message")
-                return
-            
-            if not action_data.get('group_id') or not action_data.get('user_id'):
-                logger.warning("Missing group_id or user_id in Redis message")
-                return
-            
-            # Create appropriate request object
-            action_type = action_data.get('action_type')
-            request = self._create_request(action_data)
-            
-            if not request:
-                logger.warning(f"Could not create request for action: {action_type}")
-                return
-            
-            # Execute via centralized API
-            logger.info(f"Executing action from web: {action_type}")
-            response = await self.executor.execute_action(request)
-            
-            # Publish result back to web via result channel
-            result_channel = f"web:results:{response.action_id}"
-            result_data = {
-                "action_id": response.action_id,
-                "status": response.status.value,
-                "success": response.success,
-                "message": response.message,
-                "error": response.error,
-                "execution_time_ms": response.execution_time_ms,
-            }
-            
-            await self.redis.publish(result_channel, json.dumps(result_data))
-            logger.info(f"Action result published: {response.action_id}")
-        
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in Redis message: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error handling action message: {str(e)}")
-
-    def _create_request(self, action_data: dict):
-        """
-        Create appropriate request object from action data
-        
-        Args:
-            action_data: Raw action data from Redis
-            
-        Returns:
-            Appropriate ActionRequest subclass or None
-        """
-        try:
-            action_type = action_data.get('action_type')
-            
-            common_params = {
-                'group_id': action_data.get('group_id'),
-                'user_id': action_data.get('user_id'),
-                'reason': action_data.get('reason'),
-                'initiated_by': action_data.get('initiated_by'),
-                'metadata': action_data.get('metadata'),
-            }
-            
-            if action_type == ActionType.BAN:
-                return BanRequest(
-                    **common_params,
-                    until_date=action_data.get('until_date'),
-                    revoke_messages=action_data.get('revoke_messages', True),
-                )
-            
-            elif action_type == ActionType.KICK:
-                return KickRequest(
-                    **common_params,
-                    revoke_messages=action_data.get('revoke_messages', False),
-                )
-            
-            elif action_type == ActionType.MUTE:
-                return MuteRequest(
-                    **common_params,
-                    duration=action_data.get('duration', 3600),
-                )
-            
-            elif action_type == ActionType.UNMUTE:
-                return UnmuteRequest(**common_params)
-            
-            elif action_type == ActionType.PROMOTE:
-                return PromoteRequest(
-                    **common_params,
-                    permissions=action_data.get('permissions'),
-                )
-            
-            elif action_type == ActionType.DEMOTE:
-                return DemoteRequest(**common_params)
-            
-            elif action_type == ActionType.WARN:
-                return WarnRequest(
-                    **common_params,
-                    warn_count=action_data.get('warn_count', 1),
-                    auto_ban_after=action_data.get('auto_ban_after'),
-                )
-            
-            elif action_type == ActionType.PIN:
-                return PinRequest(
-                    **common_params,
-                    message_id=action_data.get('message_id'),
-                    notify=action_data.get('notify', True),
-                )
-            
-            elif action_type == ActionType.UNPIN:
-                return UnpinRequest(
-                    **common_params,
-                    message_id=action_data.get('message_id'),
-                )
-            
-            elif action_type == ActionType.DELETE_MESSAGE:
-                return DeleteMessageRequest(
-                    **common_params,
-                    message_id=action_data.get('message_id'),
-                )
-            
-            else:
-                logger.warning(f"Unknown action type: {action_type}")
-                return None
-        
-        except Exception as e:
-            logger.error(f"Error creating request: {str(e)}")
-            return None
+        self.redis = aioredis.from_url(self.redis_uri, decode_responses=True)
+        options = {"consumers": self.consumers} if self.consumers else {}
+        self.ingestion = ActionStreamIngestion(self.executor, self.redis, **options)
+        await self.ingestion.start()
+        logger.info("Started consuming web actions from Redis")
+
+    async def stop(self):
+        """Stop the consumers and disconnect"""
+        if self.ingestion:
+            await self.ingestion.stop()
+            self.ingestion = None
+        if self.redis:
+            await self.redis.close()
+            logger.info("Disconnected from Redis")
 
 
 # ============================================================================
-# HELPER FUNCTION FOR WEB TO TRIGGER ACTIONS
+# HELPER FUNCTIONS FOR WEB TO TRIGGER ACTIONS
 # ============================================================================
 
 async def web_publish_action(
@@ -250,7 +82,7 @@ async def web_publish_action(
     **kwargs,
 ) -> str:
     """
-    Publish action request from web to Redis for bot to execute
+    Add an action request from web to the action stream
     
     Args:
         redis_uri: Redis connection string
@@ -262,35 +94,55 @@ async def web_publish_action(
         **kwargs: Additional action-specific parameters
         
     Returns:
-        action_id for tracking
+        request_id for tracking
     """
+    redis = aioredis.from_url(redis_uri, decode_responses=True)
     try:
-        redis = await aioredis.from_url(redis_uri)
-        
-        import uuid
-        action_id = str(uuid.uuid4())
-        
-        action_data = {
-            "action_id": action_id,
+        request_id = await publish_action(redis, {
             "action_type": action_type,
             "group_id": group_id,
             "user_id": user_id,
             "reason": reason,
             "initiated_by": initiated_by,
             **kwargs,
-        }
-        
-        # Publish to Redis
-        await redis.publish("web:actions", json.dumps(action_data))
-        
-        logger.info(f"Web action published: {action_id} - {action_type}")
-        
+        })
+        logger.info(f"Web action queued: {request_id} - {action_type}")
+        return request_id
+    finally:
         await redis.close()
-        return action_id
+
+
+async def web_wait_for_result(
+    request_id: str,
+    redis_uri: str = REDIS_URI,
+    timeout: float = 30.0,
+) -> Optional[Dict[str, Any]]:
+    """
+    Wait for the result of a web action (None on timeout)
     
-    except Exception as e:
-        logger.error(f"Error publishing web action: {str(e)}")
-        raise
+    Subscribes to the result channel first and then checks the stored
+    result, so a result published in between is not missed.
+    """
+    redis = aioredis.from_url(redis_uri, decode_responses=True)
+    pubsub = redis.pubsub()
+    try:
+        await pubsub.subscribe(f"web:results:{request_id}")
+        result = await get_action_result(redis, request_id)
+        if result:
+            return result
+
+        async def next_result():
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    return await get_action_result(redis, request_id)
+
+        try:
+            return await asyncio.wait_for(next_result(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    finally:
+        await pubsub.close()
+        await redis.close()
 
 
 # ============================================================================
@@ -298,7 +150,8 @@ async def web_publish_action(
 # ============================================================================
 
 """
-In your bot startup:
+The centralized API starts the consumers itself when ACTION_STREAM_ENABLED
+is set. To run them in another process:
 
 from centralized_api.examples.redis_integration import RedisActionListener
 from centralized_api.services import ActionExecutor
@@ -310,9 +163,9 @@ async def start_redis_listener(bot):
     await db.connect()
     executor = ActionExecutor(bot=bot, db=db)
     
-    # Start Redis listener
+    # Start stream consumers (same consumer group as the API processes)
     listener = RedisActionListener(executor)
-    asyncio.create_task(listener.start())
+    await listener.start()
 
 # In your dispatcher setup:
 dp.startup.register(start_redis_listener)
@@ -325,10 +178,10 @@ dp.startup.register(start_redis_listener)
 """
 In your web dashboard to trigger actions:
 
-from centralized_api.examples.redis_integration import web_publish_action
+from centralized_api.examples.redis_integration import web_publish_action, web_wait_for_result
 
 # Example: Ban user from web
-action_id = await web_publish_action(
+request_id = await web_publish_action(
     action_type="ban",
     group_id=-1001234567890,
     user_id=987654321,
@@ -336,6 +189,6 @@ action_id = await web_publish_action(
     initiated_by=111111,
 )
 
-# Track result
-result = await redis.get(f"web:results:{action_id}")
+# Track result (also stored under web:results:{request_id} for ACTION_RESULT_TTL)
+result = await web_wait_for_result(request_id)
 """
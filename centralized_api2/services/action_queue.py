@@ -0,0 +1,434 @@
+"""
+Action Queue
+Durable MongoDB-backed job queue and worker pool for the executor
+
+- the API enqueues an action and returns its action_id at once
+- workers claim jobs with an atomic find-and-modify that sets a lease
+  (visibility timeout); a job whose worker died is taken over when its
+  lease expires
+- retries are scheduled by pushing `available_at` forward instead of
+  sleeping, so no request or worker is held by backoff
+- finished jobs are kept for status lookups and then expired by a TTL index
+
+Job documents (COLLECTION_ACTION_JOBS) use the action_id as `_id` and
+ActionStatus values as status: pending -> in_progress -> success / failed,
+with retrying for jobs waiting on a scheduled retry and cancelled for jobs
+cancelled before a worker claimed them.
+"""
+
+import asyncio
+import logging
+import re
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from centralized_api.config import (
+    ACTION_JOB_RETENTION,
+    ACTION_QUEUE_POLL_INTERVAL,
+    ACTION_VISIBILITY_TIMEOUT,
+    ACTION_WORKERS,
+    COLLECTION_ACTION_JOBS,
+)
+from centralized_api.models import (
+    ActionRequest,
+    ActionStatus,
+    ActionType,
+    BanRequest,
+    DeleteMessageRequest,
+    DemoteRequest,
+    KickRequest,
+    MuteRequest,
+    PinRequest,
+    PromoteRequest,
+    PurgeRequest,
+    RemoveRoleRequest,
+    RestrictRequest,
+    SetRoleRequest,
+    UnmuteRequest,
+    UnpinRequest,
+    UnrestrictRequest,
+    WarnRequest,
+)
+
+logger = logging.getLogger(__name__)
+
+# Request model per action type (jobs store the request as plain JSON)
+REQUEST_MODELS = {
+    ActionType.BAN: BanRequest,
+    ActionType.KICK: KickRequest,
+    ActionType.MUTE: MuteRequest,
+    ActionType.UNMUTE: UnmuteRequest,
+    ActionType.PROMOTE: PromoteRequest,
+    ActionType.DEMOTE: DemoteRequest,
+    ActionType.WARN: WarnRequest,
+    ActionType.PIN: PinRequest,
+    ActionType.UNPIN: UnpinRequest,
+    ActionType.DELETE_MESSAGE: DeleteMessageRequest,
+    ActionType.RESTRICT: RestrictRequest,
+    ActionType.UNRESTRICT: UnrestrictRequest,
+    ActionType.PURGE: PurgeRequest,
+    ActionType.SET_ROLE: SetRoleRequest,
+    ActionType.REMOVE_ROLE: RemoveRoleRequest,
+}
+
+READY_STATUSES = [ActionStatus.PENDING.value, ActionStatus.RETRYING.value]
+FINISHED_STATUSES = [ActionStatus.SUCCESS.value, ActionStatus.FAILED.value, ActionStatus.CANCELLED.value]
+
+# Errors worth retrying (network trouble or Telegram-side failures); other
+# errors (user not found, not enough rights, ...) fail at once
+_TRANSIENT_ERROR_PATTERN = re.compile(
+    r"network|timed? ?out|timeout|connect|temporar|unavailable|bad gateway|"
+    r"internal server error|server error|\b50[0234]\b",
+    re.IGNORECASE,
+)
+
+
+def is_transient_error(error: Any) -> bool:
+    """Whether an action error is likely to go away on retry"""
+    if error is None:
+        return False
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, OSError)):
+        return True
+    return bool(_TRANSIENT_ERROR_PATTERN.search(f"{type(error).__name__}: {error}"))
+
+
+def load_request(payload: Dict[str, Any]) -> ActionRequest:
+    """Rebuild the typed request model from a stored payload"""
+    model = REQUEST_MODELS.get(ActionType(payload["action_type"]), ActionRequest)
+    return model(**payload)
+
+
+class ActionQueue:
+    """MongoDB job queue with leases, visibility timeouts and delayed retries"""
+
+    def __init__(
+        self,
+        db,
+        collection: str = COLLECTION_ACTION_JOBS,
+        visibility_timeout: float = ACTION_VISIBILITY_TIMEOUT,
+    ):
+        """
+        Args:
+            db: Motor database
+            collection: Job collection name
+            visibility_timeout: Lease length for claimed jobs (seconds)
+        """
+        self.jobs = db[collection]
+        self.visibility_timeout = visibility_timeout
+        self._wakeup = asyncio.Event()
+        self._finish_hooks: List[Callable[[Dict[str, Any]], Awaitable[None]]] = []
+
+        # Metrics
+        self.enqueued = 0
+        self.claimed = 0
+        self.reclaimed = 0
+        self.retried = 0
+
+    async def ensure_indexes(self):
+        """Create the indexes claims, status lookups and expiry rely on"""
+        await self.jobs.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+        await self.jobs.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+        await self.jobs.create_index([("group_id", ASCENDING), ("created_at", ASCENDING)])
+        await self.jobs.create_index(
+            [("finished_at", ASCENDING)], expireAfterSeconds=ACTION_JOB_RETENTION
+        )
+
+    # ========================================================================
+    # PRODUCERS
+    # ========================================================================
+
+    def _job(self, request: ActionRequest, action_id: Optional[str], delay: float,
+             metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        return {
+            "_id": action_id or str(uuid.uuid4()),
+            "action_type": request.action_type.value if isinstance(request.action_type, ActionType) else request.action_type,
+            "group_id": request.group_id,
+            "user_id": request.user_id,
+            "request": request.model_dump(mode="json"),
+            "status": ActionStatus.PENDING.value,
+            "attempts": 0,
+            "flood_waits": 0,
+            "available_at": now + timedelta(seconds=delay),
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "last_error": None,
+            "metadata": metadata,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+
+    async def enqueue(
+        self,
+        request: ActionRequest,
+        action_id: Optional[str] = None,
+        delay: float = 0.0,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Add an action to the queue and return its action_id"""
+        job = self._job(request, action_id, delay, metadata)
+        await self.jobs.insert_one(job)
+        self.enqueued += 1
+        self._wakeup.set()
+        return job["_id"]
+
+    async def enqueue_many(
+        self,
+        requests: List[ActionRequest],
+        metadata: Optional[Dict[str, Any]] = None,
+        action_ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Add several actions in one round trip
+
+        With explicit action_ids, ids already in the queue are skipped
+        (makes re-submission idempotent). Returns the ids actually queued.
+        """
+        if not requests:
+            return []
+        ids = action_ids or [None] * len(requests)
+        docs = [self._job(request, action_id, 0.0, metadata) for request, action_id in zip(requests, ids)]
+        try:
+            await self.jobs.insert_many(docs, ordered=False)
+            queued = [doc["_id"] for doc in docs]
+        except BulkWriteError as e:
+            # Keep the ids that were not rejected as duplicates
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            rejected = {error["index"] for error in errors}
+            queued = [doc["_id"] for i, doc in enumerate(docs) if i not in rejected]
+        self.enqueued += len(queued)
+        if queued:
+            self._wakeup.set()
+        return queued
+
+    # ========================================================================
+    # CONSUMERS
+    # ========================================================================
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Lease the next ready job (or one whose lease expired)"""
+        now = datetime.utcnow()
+        lease = {
+            "$set": {
+                "status": ActionStatus.IN_PROGRESS.value,
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=self.visibility_timeout),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        }
+        job = await self.jobs.find_one_and_update(
+            {"status": {"$in": READY_STATUSES}, "available_at": {"$lte": now}},
+            lease,
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            job = await self.jobs.find_one_and_update(
+                {"status": ActionStatus.IN_PROGRESS.value, "lease_expires_at": {"$lte": now}},
+                lease,
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is not None:
+                self.reclaimed += 1
+                logger.warning(f"Reclaimed action {job['_id']} after its lease expired")
+        if job is not None:
+            self.claimed += 1
+        return job
+
+    async def retry(self, job: Dict[str, Any], delay: float, error: Optional[str] = None,
+                    flood_wait: bool = False, deferred: bool = False) -> bool:
+        """
+        Release a leased job for another attempt after `delay` seconds
+
+        Flood waits do not use up an attempt; deferrals (the job never ran,
+        e.g. its chat is paused) use up neither an attempt nor a flood wait.
+        """
+        now = datetime.utcnow()
+        update: Dict[str, Any] = {
+            "$set": {
+                "status": ActionStatus.RETRYING.value,
+                "available_at": now + timedelta(seconds=delay),
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "last_error": error,
+                "updated_at": now,
+            },
+        }
+        if flood_wait:
+            update["$inc"] = {"attempts": -1, "flood_waits": 1}
+        elif deferred:
+            update["$inc"] = {"attempts": -1}
+        result = await self.jobs.update_one({"_id": job["_id"], "lease_owner": job["lease_owner"]}, update)
+        self.retried += 1
+        return result.modified_count > 0
+
+    async def complete(self, job: Dict[str, Any], status: ActionStatus,
+                       result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> bool:
+        """Finish a leased job (ignored if the lease was lost to another worker)"""
+        now = datetime.utcnow()
+        outcome = await self.jobs.update_one(
+            {"_id": job["_id"], "lease_owner": job["lease_owner"]},
+            {"$set": {
+                "status": status.value,
+                "result": result,
+                "last_error": error,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "updated_at": now,
+                "finished_at": now,
+            }},
+        )
+        if outcome.modified_count:
+            await self._finished(dict(job, status=status.value, result=result, last_error=error, finished_at=now))
+        return outcome.modified_count > 0
+
+    def on_finish(self, hook: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Call `hook(job)` with the settled job whenever a job is completed or cancelled here"""
+        if hook not in self._finish_hooks:
+            self._finish_hooks.append(hook)
+
+    async def _finished(self, job: Dict[str, Any]):
+        for hook in self._finish_hooks:
+            try:
+                await hook(job)
+            except Exception as e:
+                logger.error(f"Action job {job['_id']} finish hook failed: {e}")
+
+    # ========================================================================
+    # MANAGEMENT
+    # ========================================================================
+
+    async def get(self, action_id: str) -> Optional[Dict[str, Any]]:
+        return await self.jobs.find_one({"_id": action_id})
+
+    async def cancel(self, action_id: str) -> bool:
+        """Cancel a job no worker has claimed yet"""
+        now = datetime.utcnow()
+        job = await self.jobs.find_one_and_update(
+            {"_id": action_id, "status": {"$in": READY_STATUSES}},
+            {"$set": {"status": ActionStatus.CANCELLED.value, "updated_at": now, "finished_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            return False
+        await self._finished(job)
+        return True
+
+    async def counts(self) -> Dict[str, int]:
+        """Jobs per status"""
+        counts = {status.value: 0 for status in ActionStatus}
+        async for row in self.jobs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    async def wait_for_work(self, timeout: float):
+        """Sleep until something is enqueued locally or `timeout` passes"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enqueued": self.enqueued,
+            "claimed": self.claimed,
+            "reclaimed": self.reclaimed,
+            "retried": self.retried,
+            "visibility_timeout": self.visibility_timeout,
+        }
+
+
+class ActionWorkerPool:
+    """Fixed pool of workers draining an ActionQueue"""
+
+    def __init__(
+        self,
+        queue: ActionQueue,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        workers: int = ACTION_WORKERS,
+        poll_interval: float = ACTION_QUEUE_POLL_INTERVAL,
+    ):
+        """
+        Args:
+            queue: Queue to drain
+            handler: Runs one claimed job and settles it (complete/retry)
+            workers: Number of concurrent workers
+            poll_interval: Longest idle wait between polls (seconds)
+        """
+        self.queue = queue
+        self.handler = handler
+        self.size = max(1, workers)
+        self.poll_interval = poll_interval
+        self.instance = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+        self.busy = 0
+        self.processed = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._tasks = [
+            asyncio.create_task(self._work(f"{self.instance}/{i}"))
+            for i in range(self.size)
+        ]
+        logger.info(f"Action queue: {self.size} workers started")
+
+    async def stop(self):
+        """Stop claiming and let in-flight jobs finish"""
+        self._running = False
+        self.queue._wakeup.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, worker_id: str):
+        idle = 0.05
+        while self._running:
+            try:
+                job = await self.queue.claim(worker_id)
+            except Exception as e:
+                logger.error(f"Action queue claim failed: {e}")
+                job = None
+                idle = self.poll_interval
+            if job is None:
+                await self.queue.wait_for_work(idle)
+                idle = min(idle * 2, self.poll_interval)
+                continue
+
+            idle = 0.05
+            self.busy += 1
+            try:
+                await self.handler(job)
+                self.processed += 1
+            except Exception as e:
+                # Lease expiry hands the job to another worker later
+                self.errors += 1
+                logger.error(f"Action job {job['_id']} crashed: {e}")
+            finally:
+                self.busy -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.size if self._running else 0,
+            "busy": self.busy,
+            "processed": self.processed,
+            "errors": self.errors,
+            **self.queue.metrics(),
+        }
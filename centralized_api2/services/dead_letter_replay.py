@@ -0,0 +1,394 @@
+"""
+Dead-Letter Replay
+Re-enqueue failed actions from the dead letter queue in bulk
+
+- dead letters are selected by group, action type, error class and time range
+  and scanned in keyset order, one batch per round trip
+- each batch is checked against the action log: dead letters whose action
+  (or a later action on the same member and state, e.g. an unmute after a
+  failed mute) has since succeeded are resolved without replaying
+- the rest go to the action queue in one insert per batch, paced to
+  DEAD_LETTER_REPLAY_RATE, and are marked resolved with the replay id
+- a replay id tracks progress, like batch ids for batches
+"""
+
+import asyncio
+import logging
+import time as time_module
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING
+
+from centralized_api.config import (
+    COLLECTION_ACTIONS,
+    COLLECTION_DEAD_LETTERS,
+    DEAD_LETTER_REPLAY_BATCH,
+    DEAD_LETTER_REPLAY_RATE,
+)
+from shared.pagination import fetch_page
+from centralized_api.models import ActionRequest, ActionStatus, ActionType
+from centralized_api.services.action_queue import ActionQueue, load_request
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_REPLAYS = 50
+
+# Error classes (matched case-insensitively against the dead letter error)
+ERROR_CLASSES = {
+    "flood_wait": r"retry after|retry in|too many requests|flood",
+    "network": r"network|timed? ?out|timeout|connect|temporar|unavailable|bad gateway|server error|\b50[0234]\b",
+    "permission": r"not enough rights|forbidden|administrator|bot was kicked|not a member|can't|cannot",
+    "not_found": r"not found|invalid|user_id_invalid|peer_id_invalid",
+}
+ERROR_CLASS_PATTERN = "^(" + "|".join([*ERROR_CLASSES, "other"]) + ")$"
+
+# Actions that set a member's state; a later success in the same family
+# (the action itself or its opposite) makes replaying an older failure wrong
+STATE_FAMILIES = {
+    ActionType.BAN: "membership",
+    ActionType.KICK: "membership",
+    ActionType.MUTE: "mute",
+    ActionType.UNMUTE: "mute",
+    ActionType.RESTRICT: "restrict",
+    ActionType.UNRESTRICT: "restrict",
+    ActionType.PROMOTE: "admin",
+    ActionType.DEMOTE: "admin",
+    ActionType.SET_ROLE: "role",
+    ActionType.REMOVE_ROLE: "role",
+}
+
+# Repeating these is a different action, not a duplicate
+NON_IDEMPOTENT = {ActionType.WARN}
+
+
+def dead_letter_query(
+    group_id: Optional[int] = None,
+    action_type: Optional[str] = None,
+    error_class: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    resolved: Optional[bool] = False,
+) -> Dict[str, Any]:
+    """MongoDB filter on the dead letter collection"""
+    query: Dict[str, Any] = {}
+    if resolved is not None:
+        query["resolved"] = resolved
+    if group_id is not None:
+        query["request.group_id"] = group_id
+    if action_type:
+        query["request.action_type"] = action_type.value if isinstance(action_type, ActionType) else action_type
+    if since or until:
+        query["created_at"] = {}
+        if since:
+            query["created_at"]["$gte"] = since
+        if until:
+            query["created_at"]["$lt"] = until
+    if error_class == "other":
+        query["$nor"] = [
+            {"error": {"$regex": pattern, "$options": "i"}} for pattern in ERROR_CLASSES.values()
+        ]
+    elif error_class:
+        query["error"] = {"$regex": ERROR_CLASSES[error_class], "$options": "i"}
+    return query
+
+
+def _family_key(request: ActionRequest) -> Optional[Tuple[str, int, Optional[int]]]:
+    family = STATE_FAMILIES.get(ActionType(request.action_type))
+    return (family, request.group_id, request.user_id) if family else None
+
+
+def _duplicate_key(request: ActionRequest) -> Optional[Tuple[Any, ...]]:
+    if ActionType(request.action_type) in NON_IDEMPOTENT:
+        return None
+    return (request.action_type, request.group_id, request.user_id, request.message_id)
+
+
+class ReplayRun:
+    """Progress of one dead-letter replay"""
+
+    def __init__(self, replay_id: str, query: Dict[str, Any], filters: Dict[str, Any],
+                 limit: Optional[int], batch_size: int, rate: float, dry_run: bool):
+        self.replay_id = replay_id
+        self.query = query
+        self.filters = filters
+        self.limit = limit
+        self.batch_size = batch_size
+        self.rate = rate
+        self.dry_run = dry_run
+
+        self.scanned = 0
+        self.queued = 0
+        self.skipped_succeeded = 0
+        self.skipped_superseded = 0
+        self.skipped_duplicate = 0
+        self.invalid = 0
+        self.batches = 0
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.created_at = time_module.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._seen: set = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "cancelled", "failed")
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed_end = self.finished_at or time_module.time()
+        elapsed = (elapsed_end - self.started_at) if self.started_at else 0.0
+        return {
+            "replay_id": self.replay_id,
+            "status": self.status,
+            "dry_run": self.dry_run,
+            "filters": self.filters,
+            "scanned": self.scanned,
+            "queued": self.queued,
+            "skipped_succeeded": self.skipped_succeeded,
+            "skipped_superseded": self.skipped_superseded,
+            "skipped_duplicate": self.skipped_duplicate,
+            "invalid": self.invalid,
+            "batches": self.batches,
+            "rate": self.rate,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "error": self.error,
+        }
+
+
+class DeadLetterReplayer:
+    """Selects dead letters and re-enqueues them into the action queue"""
+
+    def __init__(
+        self,
+        queue: ActionQueue,
+        batch_size: int = DEAD_LETTER_REPLAY_BATCH,
+        rate: float = DEAD_LETTER_REPLAY_RATE,
+    ):
+        """
+        Args:
+            queue: Action queue replayed actions are enqueued into
+            batch_size: Dead letters handled per round trip
+            rate: Maximum dead letters enqueued per second
+        """
+        self.queue = queue
+        db = queue.jobs.database
+        self.dead_letters = db[COLLECTION_DEAD_LETTERS]
+        self.actions = db[COLLECTION_ACTIONS]
+        self.batch_size = batch_size
+        self.rate = rate
+        self.replays: "OrderedDict[str, ReplayRun]" = OrderedDict()
+
+    async def ensure_indexes(self):
+        """Indexes for the replay scan and the succeeded-since lookup"""
+        await self.dead_letters.create_index(
+            [("resolved", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]
+        )
+        await self.actions.create_index([
+            ("group_id", ASCENDING), ("user_id", ASCENDING),
+            ("status", ASCENDING), ("created_at", ASCENDING),
+        ])
+
+    # ========================================================================
+    # SUBMISSION
+    # ========================================================================
+
+    def submit(
+        self,
+        group_id: Optional[int] = None,
+        action_type: Optional[str] = None,
+        error_class: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        rate: Optional[float] = None,
+        dry_run: bool = False,
+    ) -> ReplayRun:
+        """Start replaying the unresolved dead letters matching the filters"""
+        self._expire()
+        filters = {
+            "group_id": group_id,
+            "action_type": action_type,
+            "error_class": error_class,
+            "since": since.isoformat() if since else None,
+            "until": until.isoformat() if until else None,
+            "limit": limit,
+        }
+        run = ReplayRun(
+            str(uuid.uuid4()),
+            dead_letter_query(group_id, action_type, error_class, since, until),
+            filters,
+            limit,
+            max(1, batch_size or self.batch_size),
+            rate or self.rate,
+            dry_run,
+        )
+        self.replays[run.replay_id] = run
+        run.status = "running"
+        run.started_at = time_module.time()
+        run.task = asyncio.create_task(self._execute(run))
+        return run
+
+    def _expire(self):
+        while len(self.replays) > MAX_TRACKED_REPLAYS:
+            oldest = next((rid for rid, run in self.replays.items() if run.finished), None)
+            if oldest is None:
+                break
+            del self.replays[oldest]
+
+    def get(self, replay_id: str) -> Optional[ReplayRun]:
+        return self.replays.get(replay_id)
+
+    async def cancel(self, replay_id: str) -> Optional[ReplayRun]:
+        """Stop a replay; batches already enqueued stay queued"""
+        run = self.replays.get(replay_id)
+        if run and run.task and not run.task.done():
+            run.task.cancel()
+            try:
+                await run.task
+            except asyncio.CancelledError:
+                pass
+        return run
+
+    # ========================================================================
+    # EXECUTION
+    # ========================================================================
+
+    async def _execute(self, run: ReplayRun):
+        cursor = None
+        try:
+            while True:
+                size = run.batch_size
+                if run.limit:
+                    size = min(size, run.limit - run.scanned)
+                    if size <= 0:
+                        break
+                page, cursor = await fetch_page(
+                    self.dead_letters, run.query, [("created_at", ASCENDING)], size, cursor=cursor
+                )
+                if not page:
+                    break
+                enqueued = await self._replay_batch(run, page)
+                run.batches += 1
+                if cursor is None:
+                    break
+                if enqueued and run.rate:
+                    await asyncio.sleep(enqueued / run.rate)
+            run.status = "completed"
+        except asyncio.CancelledError:
+            run.status = "cancelled"
+            raise
+        except Exception as e:
+            run.status = "failed"
+            run.error = str(e)
+            logger.error(f"Dead-letter replay {run.replay_id} failed: {e}")
+        finally:
+            run.finished_at = time_module.time()
+            logger.info(f"Dead-letter replay {run.replay_id} {run.status}: {run.summary()}")
+
+    async def _replay_batch(self, run: ReplayRun, page: List[Dict[str, Any]]) -> int:
+        """Dedupe and enqueue one page of dead letters; returns the number queued"""
+        run.scanned += len(page)
+        parsed = []
+        for dead_letter in page:
+            try:
+                parsed.append((dead_letter, load_request(dead_letter["request"])))
+            except Exception:
+                run.invalid += 1
+
+        succeeded_ids, latest = await self._succeeded_since([request for _, request in parsed], page)
+
+        resolutions: Dict[str, List[Any]] = {"succeeded": [], "superseded": [], "duplicate": []}
+        replay: List[Tuple[Dict[str, Any], ActionRequest]] = []
+        for dead_letter, request in parsed:
+            family = _family_key(request)
+            later = latest.get(family) if family else None
+            duplicate = _duplicate_key(request)
+            if dead_letter["action_id"] in succeeded_ids:
+                resolutions["succeeded"].append(dead_letter["_id"])
+            elif later and later[0] > dead_letter["created_at"]:
+                key = "succeeded" if later[1] == request.action_type else "superseded"
+                resolutions[key].append(dead_letter["_id"])
+            elif duplicate is not None and duplicate in run._seen:
+                resolutions["duplicate"].append(dead_letter["_id"])
+            else:
+                if duplicate is not None:
+                    run._seen.add(duplicate)
+                replay.append((dead_letter, request))
+
+        run.skipped_succeeded += len(resolutions["succeeded"])
+        run.skipped_superseded += len(resolutions["superseded"])
+        run.skipped_duplicate += len(resolutions["duplicate"])
+
+        if run.dry_run:
+            run.queued += len(replay)
+            return 0
+
+        queued = await self.queue.enqueue_many(
+            [request for _, request in replay],
+            metadata={"replay_id": run.replay_id},
+            action_ids=[f"{dead_letter['action_id']}:{run.replay_id[:8]}" for dead_letter, _ in replay],
+        )
+        run.queued += len(queued)
+
+        resolutions["replayed"] = [dead_letter["_id"] for dead_letter, _ in replay]
+        now = datetime.utcnow()
+        for resolution, ids in resolutions.items():
+            if ids:
+                await self.dead_letters.update_many(
+                    {"_id": {"$in": ids}},
+                    {"$set": {
+                        "resolved": True,
+                        "resolution": resolution,
+                        "replay_id": run.replay_id,
+                        "resolved_at": now,
+                    }},
+                )
+        return len(queued)
+
+    async def _succeeded_since(
+        self, requests: List[ActionRequest], page: List[Dict[str, Any]]
+    ) -> Tuple[set, Dict[Tuple[str, int, Optional[int]], Tuple[datetime, str]]]:
+        """
+        Successful actions logged since the oldest dead letter of a page
+
+        Returns the action_ids that succeeded and, per state family key, the
+        time and type of the latest successful action.
+        """
+        if not page:
+            return set(), {}
+        clauses: List[Dict[str, Any]] = [{"action_id": {"$in": [doc["action_id"] for doc in page]}}]
+        members = {(request.group_id, request.user_id) for request in requests if _family_key(request)}
+        clauses.extend({"group_id": group_id, "user_id": user_id} for group_id, user_id in members)
+
+        succeeded_ids = set()
+        latest: Dict[Tuple[str, int, Optional[int]], Tuple[datetime, str]] = {}
+        async for action in self.actions.find(
+            {
+                "status": ActionStatus.SUCCESS.value,
+                "created_at": {"$gte": min(doc["created_at"] for doc in page)},
+                "$or": clauses,
+            },
+            projection={"_id": 0, "action_id": 1, "action_type": 1, "group_id": 1, "user_id": 1, "created_at": 1},
+        ):
+            succeeded_ids.add(action["action_id"])
+            try:
+                family = STATE_FAMILIES.get(ActionType(action["action_type"]))
+            except ValueError:
+                family = None
+            if family:
+                key = (family, action["group_id"], action["user_id"])
+                if key not in latest or action["created_at"] > latest[key][0]:
+                    latest[key] = (action["created_at"], action["action_type"])
+        return succeeded_ids, latest
+
+    def metrics(self) -> Dict[str, Any]:
+        running = [run for run in self.replays.values() if run.status == "running"]
+        return {
+            "tracked_replays": len(self.replays),
+            "running_replays": len(running),
+        }
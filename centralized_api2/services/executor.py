@@ -8,7 +8,7 @@ import asyncio
 import uuid
 import logging
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set
 from abc import ABC, abstractmethod
 
 from centralized_api.models import (
@@ -28,12 +28,21 @@ from centralized_api.models import (
     DeleteMessageRequest,
 )
 from centralized_api.db.mongodb import ActionDatabase
+from centralized_api.core.member_state import restriction_minutes
 from centralized_api.config import (
     BACKOFF_BASE,
     MAX_RETRIES,
     MAX_BACKOFF,
     BATCH_TIMEOUT,
+    BATCH_CHAT_INTERVAL,
+    MAX_CONCURRENT_ACTIONS,
+    TELEGRAM_API_BASE,
+    TELEGRAM_API_TIMEOUT,
+    TELEGRAM_BOT_TOKEN,
 )
+from shared.batch_runner import BatchRun, BatchRunner, ChatPacer, retry_after_seconds
+from centralized_api.services.action_queue import ActionQueue, ActionWorkerPool, is_transient_error, load_request
+from centralized_api.services.dead_letter_replay import DeadLetterReplayer
 
 # Import your existing Telegram API functions
 try:
@@ -58,42 +67,67 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+def create_bot(token: str = TELEGRAM_BOT_TOKEN, api_base: str = TELEGRAM_API_BASE):
+    """
+    Create an aiogram Bot for direct calls, pointed at the configured Bot
+    API server (None when no token is configured)
+    """
+    if not token:
+        return None
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_base), timeout=TELEGRAM_API_TIMEOUT)
+    return Bot(token=token, session=session)
+
+
 class ActionExecutor:
     """
     High-performance async executor for Telegram actions.
     Handles retries, logging, validation, and database persistence.
     """
 
-    def __init__(self, bot, db: Optional[ActionDatabase] = None):
+    def __init__(self, bot, db: Optional[ActionDatabase] = None, queue: Optional[ActionQueue] = None):
         """
         Initialize executor
         
         Args:
             bot: Aiogram Bot instance
             db: Optional ActionDatabase instance (uses default if not provided)
+            queue: Optional durable job queue (enables enqueue_action and workers)
         """
         self.bot = bot
         self.db = db or ActionDatabase()
+        self.queue = queue
+        self.workers: Optional[ActionWorkerPool] = None
+        self.replays = DeadLetterReplayer(queue) if queue is not None else None
         self._retry_config = {
             'base': BACKOFF_BASE,
             'max_retries': MAX_RETRIES,
             'max_backoff': MAX_BACKOFF,
         }
         self._pending_actions: Dict[str, Dict[str, Any]] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._max_flood_waits = 5
+        self.pacer = ChatPacer(interval=BATCH_CHAT_INTERVAL)
+        self.batches = BatchRunner(concurrency=16, max_concurrency=MAX_CONCURRENT_ACTIONS)
 
-    async def execute_action(self, request: ActionRequest) -> ActionResponse:
+    async def execute_action(self, request: ActionRequest, action_id: Optional[str] = None) -> ActionResponse:
         """
         Execute a single action with automatic retries and logging
         
         Args:
             request: Action request model
+            action_id: Id to log the action under (generated when omitted)
             
         Returns:
             ActionResponse with execution details
         """
-        action_id = str(uuid.uuid4())
+        action_id = action_id or str(uuid.uuid4())
         start_time = datetime.utcnow()
         retry_count = 0
+        flood_waits = 0
         last_error = None
 
         # Store pending action
@@ -107,27 +141,38 @@ class ActionExecutor:
             # Attempt execution with retries
             while retry_count <= self._retry_config['max_retries']:
                 try:
+                    await self.pacer.wait(request.group_id)
                     response = await self._execute_action_internal(
                         action_id=action_id,
                         request=request,
                         retry_count=retry_count,
                     )
 
-                    # Log successful action
+                    # Handlers report Telegram errors in the response; on
+                    # flood control wait as asked and try again
+                    flood_wait = None if response.success else retry_after_seconds(response.error)
+                    if flood_wait is not None and flood_waits < self._max_flood_waits:
+                        flood_waits += 1
+                        self.pacer.defer(request.group_id, flood_wait)
+                        continue
+
+                    # Log the outcome (handlers report failures in the response)
                     await self.db.log_action(
                         action_id=action_id,
                         action_type=request.action_type,
                         group_id=request.group_id,
                         user_id=request.user_id,
                         initiated_by=request.initiated_by,
-                        status=ActionStatus.SUCCESS,
-                        success=True,
+                        status=response.status,
+                        success=response.success,
                         message=response.message,
                         reason=request.reason,
+                        error=response.error,
                         execution_time_ms=response.execution_time_ms,
                         retry_count=retry_count,
                         api_response=response.api_response,
                         metadata=request.metadata,
+                        duration_minutes=restriction_minutes(request),
                     )
 
                     # Remove from pending
@@ -136,6 +181,13 @@ class ActionExecutor:
 
                 except Exception as e:
                     last_error = e
+
+                    flood_wait = retry_after_seconds(e)
+                    if flood_wait is not None and flood_waits < self._max_flood_waits:
+                        flood_waits += 1
+                        self.pacer.defer(request.group_id, flood_wait)
+                        continue
+
                     retry_count += 1
 
                     if retry_count <= self._retry_config['max_retries']:
@@ -664,10 +716,34 @@ class ActionExecutor:
     # BATCH OPERATIONS
     # =========================================================================
 
+    def submit_batch(
+        self,
+        requests: List[ActionRequest],
+        concurrency: Optional[int] = None,
+    ) -> BatchRun:
+        """
+        Start a batch in the background with bounded concurrency
+        
+        Args:
+            requests: List of action requests
+            concurrency: Actions in flight at once (default from config)
+            
+        Returns:
+            BatchRun tracked in self.batches (status, events, cancel, resume)
+        """
+        return self.batches.submit(
+            requests,
+            self.execute_action,
+            is_success=lambda response: response.success,
+            serialize=lambda response: response.model_dump(mode="json"),
+            concurrency=concurrency,
+        )
+
     async def execute_batch(
         self,
         requests: List[ActionRequest],
         atomic: bool = True,
+        concurrency: Optional[int] = None,
     ) -> List[ActionResponse]:
         """
         Execute multiple actions
@@ -675,13 +751,195 @@ class ActionExecutor:
         Args:
             requests: List of action requests
             atomic: If True, all actions must succeed or all fail (not fully implemented)
+            concurrency: Actions in flight at once (default from config)
             
         Returns:
-            List of ActionResponses
+            List of ActionResponses (in request order)
+        """
+        run = self.submit_batch(requests, concurrency=concurrency)
+        await self.batches.wait(run.batch_id)
+        return [response for response in run.results if response is not None]
+
+    # =========================================================================
+    # QUEUED EXECUTION
+    # =========================================================================
+
+    async def enqueue_action(self, request: ActionRequest) -> str:
+        """
+        Persist an action in the job queue and return its action_id at once
+        
+        A worker runs it later; retries are rescheduled in the queue rather
+        than slept on. Falls back to running in the background when no queue
+        is configured.
+        """
+        if self.queue is None:
+            action_id = str(uuid.uuid4())
+            # Visible to get_action_status before the task first runs
+            self._pending_actions[action_id] = {
+                'request': request,
+                'status': ActionStatus.PENDING,
+                'started_at': datetime.utcnow(),
+            }
+            task = asyncio.create_task(self.execute_action(request, action_id=action_id))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return action_id
+        return await self.queue.enqueue(request)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(
+            self._retry_config['base'] * (2 ** (max(attempt, 1) - 1)),
+            self._retry_config['max_backoff'],
+        )
+
+    async def run_job(self, job: Dict[str, Any]):
         """
-        tasks = [self.execute_action(req) for req in requests]
-        responses = await asyncio.gather(*tasks, return_exceptions=False)
-        return responses
+        Run one attempt of a claimed job and settle it in the queue
+        
+        - chat paused by a flood wait: put back until the pause ends (the
+          lease is not held while waiting; no attempt used)
+        - flood control: rescheduled after retry_after (no attempt used)
+        - transient errors: rescheduled with exponential backoff
+        - retries exhausted: logged FAILED and dead-lettered
+        - permanent errors: logged FAILED
+        """
+        action_id = job['_id']
+        attempt = job.get('attempts', 1)
+        max_attempts = self._retry_config['max_retries'] + 1
+
+        try:
+            request = load_request(job['request'])
+        except Exception as e:
+            await self.queue.complete(job, ActionStatus.FAILED, error=f"Invalid request: {e}")
+            return
+
+        if attempt > max_attempts:
+            # Poison job: its workers keep dying before they can settle it
+            error = job.get('last_error') or "Worker lease expired repeatedly"
+            await self._finish_failed(job, request, error, attempt - 1, dead_letter=True)
+            return
+
+        paused = self.pacer.paused_for(request.group_id)
+        if paused > 0:
+            await self.queue.retry(job, paused, error=job.get('last_error'), deferred=True)
+            return
+
+        start_time = datetime.utcnow()
+        response = None
+        error: Any = None
+        try:
+            await self.pacer.wait(request.group_id)
+            response = await self._execute_action_internal(
+                action_id=action_id,
+                request=request,
+                retry_count=attempt - 1,
+            )
+            error = None if response.success else response.error
+        except Exception as e:
+            error = e
+
+        if response is not None and response.success:
+            response.retry_count = attempt - 1
+            await self.db.log_action(
+                action_id=action_id,
+                action_type=request.action_type,
+                group_id=request.group_id,
+                user_id=request.user_id,
+                initiated_by=request.initiated_by,
+                status=ActionStatus.SUCCESS,
+                success=True,
+                message=response.message,
+                reason=request.reason,
+                execution_time_ms=response.execution_time_ms,
+                retry_count=attempt - 1,
+                api_response=response.api_response,
+                metadata=request.metadata,
+                duration_minutes=restriction_minutes(request),
+            )
+            await self.queue.complete(job, ActionStatus.SUCCESS, result=response.model_dump(mode="json"))
+            return
+
+        flood_wait = retry_after_seconds(error)
+        if flood_wait is not None and job.get('flood_waits', 0) < self._max_flood_waits:
+            self.pacer.defer(request.group_id, flood_wait)
+            await self.queue.retry(job, flood_wait, error=str(error), flood_wait=True)
+            return
+
+        transient = is_transient_error(error)
+        if transient and attempt < max_attempts:
+            backoff = self._backoff(attempt)
+            logger.warning(f"Action {action_id} failed, retrying in {backoff}s: {error}")
+            await self.queue.retry(job, backoff, error=str(error))
+            return
+
+        execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        await self._finish_failed(
+            job, request, str(error), attempt - 1,
+            dead_letter=transient,
+            message=response.message if response is not None else None,
+            execution_time_ms=execution_time,
+        )
+
+    async def _finish_failed(
+        self,
+        job: Dict[str, Any],
+        request: ActionRequest,
+        error: str,
+        retry_count: int,
+        dead_letter: bool,
+        message: Optional[str] = None,
+        execution_time_ms: Optional[float] = None,
+    ):
+        action_id = job['_id']
+        message = message if not dead_letter else f"Action failed after {retry_count} retries"
+        await self.db.log_action(
+            action_id=action_id,
+            action_type=request.action_type,
+            group_id=request.group_id,
+            user_id=request.user_id,
+            initiated_by=request.initiated_by,
+            status=ActionStatus.FAILED,
+            success=False,
+            message=message or "Action failed",
+            error=error,
+            reason=request.reason,
+            execution_time_ms=execution_time_ms,
+            retry_count=retry_count,
+            metadata=request.metadata,
+        )
+        if dead_letter:
+            await self.db.log_dead_letter(
+                action_id=action_id,
+                request=request,
+                error=error,
+                retry_count=retry_count,
+            )
+        await self.queue.complete(job, ActionStatus.FAILED, error=error)
+
+    def start_workers(self, workers: Optional[int] = None) -> Optional[ActionWorkerPool]:
+        """Start the worker pool draining the job queue"""
+        if self.queue is None:
+            return None
+        if self.workers is None:
+            kwargs = {'workers': workers} if workers else {}
+            self.workers = ActionWorkerPool(self.queue, self.run_job, **kwargs)
+        self.workers.start()
+        return self.workers
+
+    async def stop_workers(self):
+        """Stop claiming jobs and wait for in-flight ones"""
+        if self.workers is not None:
+            await self.workers.stop()
+
+    async def get_queue_stats(self) -> Dict[str, Any]:
+        """Job counts per status plus worker metrics"""
+        if self.queue is None:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'jobs': await self.queue.counts(),
+            'workers': self.workers.metrics() if self.workers else self.queue.metrics(),
+        }
 
     # =========================================================================
     # ACTION MANAGEMENT
@@ -703,6 +961,24 @@ class ActionExecutor:
                 timestamp=pending['started_at'],
             )
 
+        # Check the job queue (queued, running, or awaiting a retry)
+        if self.queue is not None:
+            job = await self.queue.get(action_id)
+            if job and job['status'] not in (ActionStatus.SUCCESS.value, ActionStatus.FAILED.value):
+                return ActionResponse(
+                    action_id=action_id,
+                    action_type=job['action_type'],
+                    group_id=job['group_id'],
+                    user_id=job.get('user_id') or 0,
+                    status=ActionStatus(job['status']),
+                    success=False,
+                    message="Action was cancelled" if job['status'] == ActionStatus.CANCELLED.value
+                    else "Action is queued",
+                    error=job.get('last_error'),
+                    timestamp=job['created_at'],
+                    retry_count=max(job.get('attempts', 0) - 1, 0),
+                )
+
         # Check database
         log = await self.db.get_action_log(action_id)
         if log:
@@ -724,6 +1000,8 @@ class ActionExecutor:
 
     async def cancel_action(self, action_id: str) -> bool:
         """Cancel a pending action"""
+        if self.queue is not None and await self.queue.cancel(action_id):
+            return True
         if action_id in self._pending_actions:
             del self._pending_actions[action_id]
             await self.db.update_action_status(
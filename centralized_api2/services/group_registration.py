@@ -5,8 +5,10 @@ Captures members, admins, and other group metadata
 """
 
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -346,16 +348,21 @@ class GroupRegistrationService:
         except Exception as e:
             logger.error(f"Failed to log event: {e}")
 
-    async def bulk_register_groups(self, groups: list) -> Dict[str, Any]:
+    async def bulk_register_groups(self, groups: list, source: str = 'bulk_import') -> Dict[str, Any]:
         """
         Register multiple groups at once
         
+        One unordered bulk_write of upserts: metadata is $set on every
+        group, creation-only fields are $setOnInsert. Registration events
+        for the created groups are written with a single insert_many.
+        
         Args:
             groups: List of group dictionaries
                     {group_id, group_name, member_count, admin_count, ...}
+            source: registration_source recorded on created groups
                     
         Returns:
-            Bulk registration result
+            Bulk registration result (created/updated/failed from the bulk result)
         """
         if not groups:
             return {
@@ -363,34 +370,61 @@ class GroupRegistrationService:
                 'message': 'No groups provided'
             }
         
-        created = 0
-        updated = 0
-        failed = 0
-        
+        errors = []
+        # Last entry wins when a group is listed twice
+        by_id: Dict[int, Dict[str, Any]] = {}
         for group_data in groups:
+            group_id = group_data.get('group_id') if isinstance(group_data, dict) else None
+            if not group_id:
+                errors.append("Missing group_id in one of the entries")
+                continue
+            by_id[group_id] = group_data
+        
+        entries = list(by_id.values())
+        now = datetime.utcnow()
+        operations = [self._upsert_operation(group_data, source, now) for group_data in entries]
+        
+        created_ids = []
+        updated = 0
+        failed = len(errors)
+        if operations:
             try:
-                result = await self.register_group(
-                    group_id=group_data.get('group_id'),
-                    group_name=group_data.get('group_name', 'Unknown'),
-                    group_type=group_data.get('group_type', 'group'),
-                    description=group_data.get('description'),
-                    member_count=group_data.get('member_count', 0),
-                    admin_count=group_data.get('admin_count', 0),
-                    photo_url=group_data.get('photo_url'),
-                )
-                
-                if result['success']:
-                    if result['action'] == 'created':
-                        created += 1
-                    else:
-                        updated += 1
-                else:
+                result = await self.groups_col.bulk_write(operations, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for error in details.get('writeErrors', []):
                     failed += 1
-                    
+                    errors.append(f"Error for group {entries[error['index']].get('group_id')}: {error.get('errmsg')}")
             except Exception as e:
-                logger.error(f"Error registering group: {e}")
-                failed += 1
+                logger.error(f"Bulk registration failed: {e}")
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'message': 'Bulk registration failed'
+                }
+            
+            created_ids = [entries[upsert['index']]['group_id'] for upsert in details.get('upserted', [])]
+            updated = details.get('nMatched', 0)
+        
+        if created_ids:
+            created_set = set(created_ids)
+            await self._log_events([
+                {
+                    'event_type': 'group_registered',
+                    'group_id': group_data['group_id'],
+                    'details': {
+                        'group_name': group_data.get('group_name', 'Unknown'),
+                        'member_count': group_data.get('member_count', 0),
+                        'admin_count': group_data.get('admin_count', 0),
+                        'source': source,
+                    },
+                    'timestamp': now,
+                }
+                for group_data in entries if group_data['group_id'] in created_set
+            ])
         
+        created = len(created_ids)
         logger.info(f"Bulk registration: {created} created, {updated} updated, {failed} failed")
         
         return {
@@ -399,8 +433,101 @@ class GroupRegistrationService:
             'updated': updated,
             'failed': failed,
             'total': len(groups),
-            'message': f'Bulk registration complete: {created} created, {updated} updated'
+            'errors': errors,
+            'message': f'Bulk registration complete: {created} created, {updated} updated, {failed} failed'
+        }
+
+    @staticmethod
+    def _upsert_operation(group_data: Dict[str, Any], source: str, now: datetime) -> UpdateOne:
+        """Upsert for one group: metadata always, defaults only on creation"""
+        update_data = {
+            'group_name': group_data.get('group_name', 'Unknown'),
+            'member_count': group_data.get('member_count', 0),
+            'admin_count': group_data.get('admin_count', 0),
+            'updated_at': now,
+        }
+        if group_data.get('description'):
+            update_data['description'] = group_data['description']
+        if group_data.get('photo_url'):
+            update_data['photo_url'] = group_data['photo_url']
+        
+        on_insert = {
+            'group_type': group_data.get('group_type', 'group'),
+            'description': '',
+            'photo_url': '',
+            'is_active': True,
+            'created_at': now,
+            'metadata': {
+                'auto_registered': True,
+                'registration_source': source,
+            },
+            'settings': {
+                'auto_warn_enabled': False,
+                'auto_mute_enabled': False,
+                'spam_threshold': 5,
+                'profanity_filter': False,
+            },
+            'stats': {
+                'total_actions': 0,
+                'total_warnings': 0,
+                'total_mutes': 0,
+                'total_bans': 0,
+            },
         }
+        for field in update_data:
+            on_insert.pop(field, None)
+        
+        return UpdateOne(
+            {'group_id': group_data['group_id']},
+            {'$set': update_data, '$setOnInsert': on_insert},
+            upsert=True,
+        )
+
+    async def bulk_update_group_stats(self, stats: list) -> Dict[str, Any]:
+        """
+        Update member/admin counts of many groups in one bulk_write
+        
+        Args:
+            stats: List of {group_id, member_count?, admin_count?}
+            
+        Returns:
+            Counts of matched, modified and missing groups
+        """
+        now = datetime.utcnow()
+        operations = []
+        for entry in stats:
+            if not isinstance(entry, dict) or not entry.get('group_id'):
+                continue
+            update_data = {'updated_at': now}
+            for field in ('member_count', 'admin_count'):
+                if entry.get(field) is not None:
+                    update_data[field] = entry[field]
+            operations.append(UpdateOne({'group_id': entry['group_id']}, {'$set': update_data}))
+        
+        if not operations:
+            return {'success': False, 'message': 'No group stats provided'}
+        
+        try:
+            result = await self.groups_col.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Bulk stats update failed: {e}")
+            return {'success': False, 'error': str(e)}
+        
+        logger.info(f"Bulk stats update: {result.matched_count} groups, {result.modified_count} changed")
+        return {
+            'success': True,
+            'matched': result.matched_count,
+            'modified': result.modified_count,
+            'missing': len(operations) - result.matched_count,
+            'total': len(operations),
+        }
+
+    async def _log_events(self, log_docs: List[Dict[str, Any]]) -> None:
+        """Log many group events with one insert_many"""
+        try:
+            await self.logs_col.insert_many(log_docs, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to log events: {e}")
 
 
 # Example usage in bot handlers
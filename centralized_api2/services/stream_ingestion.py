@@ -0,0 +1,417 @@
+"""
+Action Stream Ingestion
+Durable intake of web/dashboard actions from a Redis Stream consumer group
+
+- producers XADD actions to ACTION_STREAM (see publish_action); entries stay
+  in the stream until a consumer acknowledges them, so nothing is lost while
+  no API process is running
+- every API process runs ACTION_STREAM_CONSUMERS consumers in one consumer
+  group; Redis hands each entry to exactly one of them, so throughput scales
+  with consumers and processes
+- with the executor's ActionQueue, an entry is handed to the queue (job id =
+  request_id) and acknowledged once enqueued; the queue's workers run it
+  with their own leases and retries, and a redelivered entry whose job
+  already exists is just acknowledged
+- without a queue the action runs inline and the entry is acknowledged after
+  its result is published; while it runs, XCLAIM ... JUSTID keeps resetting
+  its idle time so other consumers do not reclaim and run it again
+- entries left pending by a crashed consumer are reclaimed with XAUTOCLAIM
+  once idle for ACTION_STREAM_CLAIM_IDLE_MS, and moved to ACTION_STREAM_DEAD
+  after ACTION_STREAM_MAX_DELIVERIES attempts
+- results are stored under `web:results:{request_id}` (ACTION_RESULT_TTL)
+  and published on the channel of the same name when the action finishes
+  (queued jobs report through ActionQueue.on_finish); a stored result also
+  makes redelivered entries no-ops
+
+Entry format: {"data": "<json action>"} where the action is an ActionRequest
+payload, optionally with a `request_id` (defaults to the entry id).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time as time_module
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from centralized_api.config import (
+    ACTION_RESULT_TTL,
+    ACTION_STREAM,
+    ACTION_STREAM_BATCH,
+    ACTION_STREAM_CLAIM_IDLE_MS,
+    ACTION_STREAM_CONSUMERS,
+    ACTION_STREAM_DEAD,
+    ACTION_STREAM_GROUP,
+    ACTION_STREAM_MAX_DELIVERIES,
+    ACTION_STREAM_MAXLEN,
+)
+from centralized_api.models import ActionStatus
+from centralized_api.services.action_queue import load_request
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import ResponseError
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    ResponseError = Exception
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+RESULT_PREFIX = "web:results:"
+
+# XREADGROUP block time; bounds how long stop() waits for idle consumers
+BLOCK_MS = 2000
+
+
+def _str(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def result_key(request_id: str) -> str:
+    return f"{RESULT_PREFIX}{request_id}"
+
+
+async def publish_action(
+    redis,
+    action: Dict[str, Any],
+    request_id: Optional[str] = None,
+    stream: str = ACTION_STREAM,
+    maxlen: int = ACTION_STREAM_MAXLEN,
+) -> str:
+    """
+    Add an action to the ingestion stream
+
+    Returns the request_id its result will be published under.
+    """
+    request_id = request_id or action.get("request_id") or str(uuid.uuid4())
+    payload = dict(action, request_id=request_id)
+    await redis.xadd(stream, {"data": json.dumps(payload, default=str)}, maxlen=maxlen, approximate=True)
+    return request_id
+
+
+async def get_action_result(redis, request_id: str) -> Optional[Dict[str, Any]]:
+    """Stored result of a streamed action (None until it has run)"""
+    raw = await redis.get(result_key(request_id))
+    return json.loads(raw) if raw else None
+
+
+class ActionStreamIngestion:
+    """Consumer group feeding stream entries to the ActionExecutor"""
+
+    def __init__(
+        self,
+        executor,
+        redis,
+        stream: str = ACTION_STREAM,
+        group: str = ACTION_STREAM_GROUP,
+        consumers: int = ACTION_STREAM_CONSUMERS,
+        batch: int = ACTION_STREAM_BATCH,
+        claim_idle_ms: int = ACTION_STREAM_CLAIM_IDLE_MS,
+        max_deliveries: int = ACTION_STREAM_MAX_DELIVERIES,
+        dead_stream: str = ACTION_STREAM_DEAD,
+    ):
+        """
+        Args:
+            executor: ActionExecutor running the actions
+            redis: redis.asyncio client
+            stream: Stream key
+            group: Consumer group name (shared by all API processes)
+            consumers: Consumers in this process
+            batch: Entries read per round trip
+            claim_idle_ms: Idle time before another consumer's entry is reclaimed
+            max_deliveries: Deliveries before an entry is dead-lettered
+            dead_stream: Stream receiving dead-lettered entries
+        """
+        self.executor = executor
+        self.redis = redis
+        self.stream = stream
+        self.group = group
+        self.size = max(1, consumers)
+        self.batch = batch
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.dead_stream = dead_stream
+        self.instance = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+
+        # Metrics
+        self.queued = 0
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.reclaimed = 0
+        self.dead = 0
+
+    # ========================================================================
+    # LIFECYCLE
+    # ========================================================================
+
+    async def ensure_group(self):
+        """Create the stream and consumer group if missing"""
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            logger.info(f"Created consumer group {self.group} on {self.stream}")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def start(self):
+        if self._running:
+            return
+        await self.ensure_group()
+        queue = getattr(self.executor, "queue", None)
+        if queue is not None:
+            queue.on_finish(self._job_finished)
+        self._running = True
+        self._tasks = [
+            asyncio.create_task(self._consume(f"{self.instance}/{i}"))
+            for i in range(self.size)
+        ]
+        logger.info(f"Action stream: {self.size} consumers reading {self.stream}")
+
+    async def stop(self, timeout: float = 30.0):
+        """Stop reading; in-flight entries finish (or are reclaimed later)"""
+        self._running = False
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    # ========================================================================
+    # CONSUMERS
+    # ========================================================================
+
+    async def _consume(self, consumer: str):
+        next_claim = 0.0
+        while self._running:
+            try:
+                if time_module.monotonic() >= next_claim:
+                    await self._reclaim(consumer)
+                    next_claim = time_module.monotonic() + self.claim_idle_ms / 2000
+                response = await self.redis.xreadgroup(
+                    self.group, consumer, {self.stream: ">"}, count=self.batch, block=BLOCK_MS
+                )
+                for _, entries in response or []:
+                    await self._handle_batch(consumer, [(entry_id, fields, 1) for entry_id, fields in entries])
+            except asyncio.CancelledError:
+                raise
+            except ResponseError as e:
+                if "NOGROUP" in str(e):
+                    await self.ensure_group()
+                else:
+                    logger.error(f"Action stream consumer {consumer}: {e}")
+                    await asyncio.sleep(1)
+            except Exception as e:
+                logger.error(f"Action stream consumer {consumer}: {e}")
+                await asyncio.sleep(1)
+
+    async def _reclaim(self, consumer: str):
+        """Take over entries other consumers left pending for too long"""
+        start = "0-0"
+        while True:
+            result = await self.redis.xautoclaim(
+                self.stream, self.group, consumer, self.claim_idle_ms,
+                start_id=start, count=self.batch,
+            )
+            start = _str(result[0])
+            # Entries trimmed from the stream come back without fields
+            entries = [(entry_id, fields) for entry_id, fields in result[1] if fields]
+            if entries:
+                self.reclaimed += len(entries)
+                deliveries = await self._deliveries(consumer, entries)
+                await self._handle_batch(consumer, [
+                    (entry_id, fields, deliveries.get(_str(entry_id), 1))
+                    for entry_id, fields in entries
+                ])
+            if start == "0-0":
+                return
+
+    async def _deliveries(self, consumer: str, entries: List[Tuple[Any, Any]]) -> Dict[str, int]:
+        # Exact per-id lookups for this consumer, so other pending entries in
+        # the same id range (other consumers' or our own in-flight ones)
+        # cannot crowd the just-claimed entries out of a capped range reply
+        pipe = self.redis.pipeline(transaction=False)
+        for entry_id, _ in entries:
+            pipe.xpending_range(
+                self.stream, self.group, min=entry_id, max=entry_id, count=1, consumername=consumer,
+            )
+        replies = await pipe.execute()
+        return {_str(item["message_id"]): item["times_delivered"] for reply in replies for item in reply}
+
+    # ========================================================================
+    # PROCESSING
+    # ========================================================================
+
+    async def _handle_batch(self, consumer: str, entries: List[Tuple[Any, Any, int]]):
+        results = await asyncio.gather(
+            *(self._handle(consumer, entry_id, fields, deliveries) for entry_id, fields, deliveries in entries),
+            return_exceptions=True,
+        )
+        for (entry_id, _, _), result in zip(entries, results):
+            # Left unacknowledged; reclaimed once idle
+            if isinstance(result, Exception):
+                logger.error(f"Action stream entry {_str(entry_id)} failed: {result}")
+
+    @staticmethod
+    def _decode(entry_id: str, fields: Dict[Any, Any]) -> Tuple[Dict[str, Any], str]:
+        fields = {_str(key): _str(value) for key, value in fields.items()}
+        payload = json.loads(fields["data"]) if "data" in fields else fields
+        request_id = str(payload.pop("request_id", None) or payload.get("action_id") or entry_id)
+        return payload, request_id
+
+    async def _handle(self, consumer: str, entry_id: Any, fields: Dict[Any, Any], deliveries: int = 1):
+        entry_id = _str(entry_id)
+        try:
+            payload, request_id = self._decode(entry_id, fields)
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            await self._dead_letter(entry_id, fields, entry_id, f"Invalid entry: {e}")
+            return
+
+        # A stored result means a previous delivery already ran it
+        if await self.redis.exists(result_key(request_id)):
+            self.duplicates += 1
+            await self.redis.xack(self.stream, self.group, entry_id)
+            return
+
+        if deliveries > self.max_deliveries:
+            await self._dead_letter(entry_id, fields, request_id, f"Gave up after {deliveries - 1} deliveries")
+            return
+
+        try:
+            request = load_request(payload)
+        except Exception as e:
+            await self._dead_letter(entry_id, fields, request_id, f"Invalid action: {e}")
+            return
+
+        queue = getattr(self.executor, "queue", None)
+        if queue is not None:
+            try:
+                await queue.enqueue(request, action_id=request_id, metadata={"stream_request_id": request_id})
+                self.queued += 1
+            except DuplicateKeyError:
+                # Redelivered after an earlier delivery enqueued it
+                self.duplicates += 1
+            await self.redis.xack(self.stream, self.group, entry_id)
+            return
+
+        holder = asyncio.create_task(self._hold(consumer, entry_id))
+        try:
+            response = await self.executor.execute_action(request)
+        finally:
+            holder.cancel()
+        self.processed += 1
+        if response.success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+        await self._publish_result(request_id, {
+            "request_id": request_id,
+            "action_id": response.action_id,
+            "status": response.status.value,
+            "success": response.success,
+            "message": response.message,
+            "error": response.error,
+            "execution_time_ms": response.execution_time_ms,
+        })
+        await self.redis.xack(self.stream, self.group, entry_id)
+
+    async def _hold(self, consumer: str, entry_id: str):
+        """Keep an entry that runs inline from going idle long enough to be reclaimed"""
+        interval = self.claim_idle_ms / 3000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.redis.xclaim(self.stream, self.group, consumer, 0, [entry_id], justid=True)
+            except Exception as e:
+                logger.warning(f"Could not refresh action stream entry {entry_id}: {e}")
+
+    async def _job_finished(self, job: Dict[str, Any]):
+        """Publish the result of a job enqueued from the stream"""
+        request_id = (job.get("metadata") or {}).get("stream_request_id")
+        if request_id is None:
+            return
+        result = job.get("result") or {}
+        success = job.get("status") == ActionStatus.SUCCESS.value
+        cancelled = job.get("status") == ActionStatus.CANCELLED.value
+        self.processed += 1
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        await self._publish_result(request_id, {
+            "request_id": request_id,
+            "action_id": job["_id"],
+            "status": job.get("status"),
+            "success": success,
+            "message": "Action was cancelled" if cancelled else result.get("message") or job.get("last_error"),
+            "error": job.get("last_error") or result.get("error"),
+            "execution_time_ms": result.get("execution_time_ms"),
+        })
+
+    async def _publish_result(self, request_id: str, result: Dict[str, Any]):
+        data = json.dumps(result, default=str)
+        await self.redis.set(result_key(request_id), data, ex=ACTION_RESULT_TTL)
+        await self.redis.publish(result_key(request_id), data)
+
+    async def _dead_letter(self, entry_id: str, fields: Dict[Any, Any], request_id: str, error: str):
+        """Move an entry that cannot be processed to the dead stream"""
+        self.dead += 1
+        logger.warning(f"Action stream entry {entry_id} dead-lettered: {error}")
+        dead_fields = {_str(key): _str(value) for key, value in fields.items()}
+        dead_fields.update({"source_id": entry_id, "error": error})
+        await self.redis.xadd(self.dead_stream, dead_fields, maxlen=ACTION_STREAM_MAXLEN, approximate=True)
+        await self._publish_result(request_id, {
+            "request_id": request_id,
+            "status": "failed",
+            "success": False,
+            "message": "Action could not be processed",
+            "error": error,
+        })
+        await self.redis.xack(self.stream, self.group, entry_id)
+
+    # ========================================================================
+    # MONITORING
+    # ========================================================================
+
+    async def stats(self) -> Dict[str, Any]:
+        """Stream length, group backlog and consumer metrics"""
+        group_info: Dict[str, Any] = {}
+        for info in await self.redis.xinfo_groups(self.stream):
+            info = {_str(key): value for key, value in info.items()}
+            if _str(info.get("name")) == self.group:
+                group_info = {
+                    "pending": info.get("pending"),
+                    "lag": info.get("lag"),
+                    "consumers": info.get("consumers"),
+                }
+        return {
+            "stream": self.stream,
+            "group": self.group,
+            "length": await self.redis.xlen(self.stream),
+            **group_info,
+            **self.metrics(),
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "local_consumers": self.size if self._running else 0,
+            "queued": self.queued,
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "reclaimed": self.reclaimed,
+            "dead": self.dead,
+        }
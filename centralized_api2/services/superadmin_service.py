@@ -15,6 +15,8 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from uuid import uuid4
 
+from shared.counts import get_count_cache
+from centralized_api.core.snapshots import get_snapshot_cache
 from centralized_api.models.advanced_rbac import (
     UserRole,
     GlobalPermission,
@@ -73,7 +75,7 @@ class SuperadminService:
             if is_active is not None:
                 query["is_active"] = is_active
             
-            total = await self.db.groups.count_documents(query)
+            total = await get_count_cache().count(self.db.groups, query)
             groups = await self.db.groups.find(query).skip(skip).limit(limit).to_list(length=limit)
             
             return {
@@ -436,44 +438,46 @@ class SuperadminService:
         Returns:
             DashboardStats with current stats
         """
+        return await get_snapshot_cache().get("superadmin:system_stats", self._compute_system_stats)
+    
+    async def _compute_system_stats(self) -> DashboardStats:
+        """Aggregate system statistics server-side (no documents are loaded)"""
         try:
-            groups = await self.db.groups.count_documents({"is_active": True})
-            
-            total_members = 0
-            total_admins = 0
-            total_actions_today = 0
-            total_bans = 0
-            total_warnings = 0
-            active_mutes = 0
-            
-            # Calculate from groups
-            groups_list = await self.db.groups.find({"is_active": True}).to_list(length=None)
-            for group in groups_list:
-                total_members += len(group.get("members", []))
-                total_admins += len(group.get("admins", []))
-            
-            # Get today's actions
-            today = datetime.utcnow().date()
-            actions = await self.db.actions.find({
-                "executed_at": {"$gte": datetime.combine(today, datetime.min.time())}
-            }).to_list(length=None)
-            
-            total_actions_today = len(actions)
+            group_totals = await self.db.groups.aggregate([
+                {"$match": {"is_active": True}},
+                {"$group": {
+                    "_id": None,
+                    "groups": {"$sum": 1},
+                    "members": {"$sum": {"$size": {"$ifNull": ["$members", []]}}},
+                    "admins": {"$sum": {"$size": {"$ifNull": ["$admins", []]}}},
+                }},
+            ]).to_list(length=1)
+            groups = group_totals[0] if group_totals else {}
+            
+            # Today's actions counted per type
+            today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+            by_type = {
+                row["_id"]: row["count"]
+                async for row in self.db.actions.aggregate([
+                    {"$match": {"executed_at": {"$gte": today_start}}},
+                    {"$group": {"_id": "$action_type", "count": {"$sum": 1}}},
+                ])
+            }
             
-            for action in actions:
-                if action.get("action_type") == "ban":
-                    total_bans += 1
-                elif action.get("action_type") == "warn":
-                    total_warnings += 1
+            # Mutes in force, from the materialized member states
+            active_mutes = await self.db.member_states.count_documents({
+                "muted": True,
+                "$or": [{"muted_until": None}, {"muted_until": {"$gt": datetime.utcnow()}}],
+            })
             
             return DashboardStats(
-                total_groups=groups,
-                total_members=total_members,
-                total_actions_today=total_actions_today,
-                total_warnings=total_warnings,
-                total_bans=total_bans,
+                total_groups=groups.get("groups", 0),
+                total_members=groups.get("members", 0),
+                total_actions_today=sum(by_type.values()),
+                total_warnings=by_type.get("warn", 0),
+                total_bans=by_type.get("ban", 0),
                 active_mutes=active_mutes,
-                total_admins=total_admins,
+                total_admins=groups.get("admins", 0),
             )
         except Exception as e:
             logger.error(f"Error getting system stats: {e}")
@@ -0,0 +1,6 @@
+"""
+Shared - Code used by both api_v2 and the centralized API
+
+Modules here have no service-specific imports; each service passes its own
+configuration in (e.g. BatchRunner(concurrency=...)).
+"""
@@ -0,0 +1,409 @@
+"""
+Batch Runner - Bounded, paced and observable mass actions
+
+Large batches (raid cleanups of thousands of users) are executed by a
+fixed pool of workers instead of one task per action, so concurrency
+never exceeds the configured bound. Calls into the same chat are spaced
+by a ChatPacer, and Telegram flood-wait errors (HTTP 429 with
+retry_after) pause that chat instead of being retried blindly.
+
+Every batch gets an id and an append-only event log; clients stream the
+log as NDJSON or SSE from any offset, so a dropped connection simply
+reconnects, and a cancelled batch can be resumed where it stopped.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time as time_module
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 16
+MAX_CONCURRENCY = 64
+
+# Minimum spacing between two calls into the same chat (seconds)
+DEFAULT_CHAT_INTERVAL = 0.05
+
+# Finished batches are kept this long for status/stream/resume
+BATCH_TTL = 3600
+MAX_TRACKED_BATCHES = 200
+
+MAX_TRACKED_CHATS = 10_000
+
+_RETRY_AFTER_PATTERN = re.compile(r"retry (?:after|in) (\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def retry_after_seconds(error: Any) -> Optional[float]:
+    """
+    Flood-wait delay carried by a Telegram error, if any
+
+    Understands aiogram/python-telegram-bot exceptions (`retry_after`
+    attribute), raw Bot API error payloads (`parameters.retry_after`) and
+    the textual "Retry after N" / "Retry in N seconds" forms.
+    """
+    if error is None:
+        return None
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        parameters = getattr(error, "parameters", None)
+        if isinstance(error, dict):
+            parameters = error.get("parameters")
+        if isinstance(parameters, dict):
+            value = parameters.get("retry_after")
+        elif parameters is not None:
+            value = getattr(parameters, "retry_after", None)
+    if value is None:
+        match = _RETRY_AFTER_PATTERN.search(str(error))
+        if match:
+            value = match.group(1)
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class ChatPacer:
+    """Spaces calls into the same chat and honours flood-wait pauses"""
+
+    def __init__(self, interval: float = DEFAULT_CHAT_INTERVAL):
+        """
+        Args:
+            interval: Minimum seconds between two calls into one chat
+        """
+        self.interval = interval
+        self._next_slot: Dict[Any, float] = {}
+        self._paused_until: Dict[Any, float] = {}
+        self.waits = 0
+        self.flood_waits = 0
+
+    def _prune(self, now: float):
+        if len(self._next_slot) > MAX_TRACKED_CHATS:
+            self._next_slot = {k: v for k, v in self._next_slot.items() if v > now}
+        if len(self._paused_until) > MAX_TRACKED_CHATS:
+            self._paused_until = {k: v for k, v in self._paused_until.items() if v > now}
+
+    async def wait(self, chat_id: Any):
+        """Wait for this chat's next free slot"""
+        if chat_id is None:
+            return
+        while True:
+            now = time_module.monotonic()
+            paused = self._paused_until.get(chat_id, 0.0)
+            if paused > now:
+                self.waits += 1
+                await asyncio.sleep(paused - now)
+                continue
+            # Reserve the slot before sleeping so concurrent callers queue up
+            slot = max(now, self._next_slot.get(chat_id, 0.0))
+            self._next_slot[chat_id] = slot + self.interval
+            self._prune(now)
+            if slot <= now:
+                return
+            self.waits += 1
+            await asyncio.sleep(slot - now)
+            if self._paused_until.get(chat_id, 0.0) <= time_module.monotonic():
+                return
+
+    def paused_for(self, chat_id: Any) -> float:
+        """Seconds left on this chat's flood-wait pause (0 when not paused)"""
+        if chat_id is None:
+            return 0.0
+        return max(0.0, self._paused_until.get(chat_id, 0.0) - time_module.monotonic())
+
+    def defer(self, chat_id: Any, seconds: float):
+        """Pause a chat after Telegram asked us to back off"""
+        if chat_id is None:
+            return
+        self.flood_waits += 1
+        until = time_module.monotonic() + seconds
+        if until > self._paused_until.get(chat_id, 0.0):
+            self._paused_until[chat_id] = until
+        logger.warning(f"Flood wait on chat {chat_id}: pausing {seconds:.1f}s")
+
+    def metrics(self) -> Dict[str, Any]:
+        now = time_module.monotonic()
+        return {
+            "interval": self.interval,
+            "paused_chats": sum(1 for v in self._paused_until.values() if v > now),
+            "waits": self.waits,
+            "flood_waits": self.flood_waits,
+        }
+
+
+class BatchRun:
+    """State and event log of one batch"""
+
+    def __init__(
+        self,
+        batch_id: str,
+        items: List[Any],
+        run_one: Callable[[Any], Awaitable[Any]],
+        is_success: Callable[[Any], bool],
+        serialize: Callable[[Any], Dict[str, Any]],
+        concurrency: int,
+        stop_on_error: bool,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        self.batch_id = batch_id
+        self.items = items
+        self.run_one = run_one
+        self.is_success = is_success
+        self.serialize = serialize
+        self.concurrency = concurrency
+        self.stop_on_error = stop_on_error
+        self.metadata = metadata or {}
+
+        self.results: List[Any] = [None] * len(items)
+        self.completed: List[bool] = [False] * len(items)
+        self.successful = 0
+        self.failed = 0
+        self.status = "pending"
+        self.created_at = time_module.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    @property
+    def done(self) -> int:
+        return self.successful + self.failed
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "cancelled", "stopped")
+
+    async def _emit(self, event: Dict[str, Any]):
+        event["seq"] = len(self.events)
+        self.events.append(event)
+        async with self._changed:
+            self._changed.notify_all()
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed_end = self.finished_at or time_module.time()
+        return {
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "successful": self.successful,
+            "failed": self.failed,
+            "remaining": self.total - self.done,
+            "concurrency": self.concurrency,
+            "elapsed_ms": round((elapsed_end - self.started_at) * 1000, 2) if self.started_at else 0.0,
+            "events": len(self.events),
+            **self.metadata,
+        }
+
+
+class BatchRunner:
+    """Registry and executor of bounded-concurrency batches"""
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, max_concurrency: int = MAX_CONCURRENCY):
+        """
+        Args:
+            concurrency: Default number of actions in flight per batch
+            max_concurrency: Upper bound for a batch's requested concurrency
+        """
+        self.concurrency = min(concurrency, max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.batches: "OrderedDict[str, BatchRun]" = OrderedDict()
+
+    # ========================================================================
+    # SUBMISSION
+    # ========================================================================
+
+    def submit(
+        self,
+        items: List[Any],
+        run_one: Callable[[Any], Awaitable[Any]],
+        is_success: Callable[[Any], bool] = lambda result: bool(getattr(result, "success", result)),
+        serialize: Callable[[Any], Dict[str, Any]] = lambda result: result,
+        concurrency: Optional[int] = None,
+        stop_on_error: bool = False,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> BatchRun:
+        """Register a batch and start executing it in the background"""
+        self._expire()
+        concurrency = max(1, min(concurrency or self.concurrency, self.max_concurrency))
+        run = BatchRun(
+            str(uuid.uuid4()), list(items), run_one, is_success, serialize,
+            concurrency, stop_on_error, metadata
+        )
+        self.batches[run.batch_id] = run
+        self._start(run)
+        return run
+
+    def _start(self, run: BatchRun):
+        run.status = "running"
+        run.started_at = run.started_at or time_module.time()
+        run.finished_at = None
+        run.task = asyncio.create_task(self._execute(run))
+
+    def _expire(self):
+        cutoff = time_module.time() - BATCH_TTL
+        for batch_id in [
+            batch_id for batch_id, run in self.batches.items()
+            if run.finished and (run.finished_at or 0) < cutoff
+        ]:
+            del self.batches[batch_id]
+        while len(self.batches) > MAX_TRACKED_BATCHES:
+            oldest = next((bid for bid, run in self.batches.items() if run.finished), None)
+            if oldest is None:
+                break
+            del self.batches[oldest]
+
+    # ========================================================================
+    # EXECUTION
+    # ========================================================================
+
+    async def _execute(self, run: BatchRun):
+        queue: "asyncio.Queue[int]" = asyncio.Queue()
+        for index, completed in enumerate(run.completed):
+            if not completed:
+                queue.put_nowait(index)
+        stop = asyncio.Event()
+        workers: List[asyncio.Task] = []
+
+        async def worker():
+            while not stop.is_set():
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await run.run_one(run.items[index])
+                    success = run.is_success(result)
+                    payload = run.serialize(result)
+                except Exception as e:
+                    logger.error(f"Batch {run.batch_id} item {index} failed: {e}")
+                    result, success, payload = None, False, {"error": str(e)}
+                run.results[index] = result
+                run.completed[index] = True
+                if success:
+                    run.successful += 1
+                else:
+                    run.failed += 1
+                await run._emit({
+                    "event": "result",
+                    "index": index,
+                    "success": success,
+                    "done": run.done,
+                    "total": run.total,
+                    "result": payload,
+                })
+                if run.stop_on_error and not success:
+                    stop.set()
+
+        try:
+            await run._emit({"event": "started", "batch_id": run.batch_id, "total": run.total,
+                             "remaining": queue.qsize()})
+            workers = [asyncio.create_task(worker()) for _ in range(min(run.concurrency, max(queue.qsize(), 1)))]
+            await asyncio.gather(*workers)
+            run.status = "stopped" if stop.is_set() and run.done < run.total else "completed"
+        except asyncio.CancelledError:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            run.status = "cancelled"
+        finally:
+            run.finished_at = time_module.time()
+            await run._emit({"event": run.status, **run.summary()})
+
+    async def wait(self, batch_id: str) -> Optional[BatchRun]:
+        """Wait for a batch to finish"""
+        run = self.batches.get(batch_id)
+        if run and run.task:
+            try:
+                await asyncio.shield(run.task)
+            except asyncio.CancelledError:
+                if not run.task.cancelled():
+                    raise
+        return run
+
+    # ========================================================================
+    # CONTROL
+    # ========================================================================
+
+    def get(self, batch_id: str) -> Optional[BatchRun]:
+        return self.batches.get(batch_id)
+
+    async def cancel(self, batch_id: str) -> Optional[BatchRun]:
+        """Stop a running batch; completed items keep their results"""
+        run = self.batches.get(batch_id)
+        if run and run.task and not run.task.done():
+            run.task.cancel()
+            try:
+                await run.task
+            except asyncio.CancelledError:
+                pass
+        return run
+
+    def resume(self, batch_id: str) -> Optional[BatchRun]:
+        """Continue a cancelled or stopped batch with its unfinished items"""
+        run = self.batches.get(batch_id)
+        if run is None or not run.finished or run.done >= run.total:
+            return run
+        self.batches.move_to_end(batch_id)
+        self._start(run)
+        return run
+
+    # ========================================================================
+    # STREAMING
+    # ========================================================================
+
+    async def events(self, batch_id: str, after: int = -1) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a batch's events with seq > after, following it until it finishes"""
+        run = self.batches.get(batch_id)
+        if run is None:
+            return
+        cursor = after + 1
+
+        def settled() -> bool:
+            return run.finished and bool(run.events) and run.events[-1]["event"] == run.status
+
+        while True:
+            while cursor < len(run.events):
+                yield run.events[cursor]
+                cursor += 1
+            if settled():
+                return
+            async with run._changed:
+                await run._changed.wait_for(lambda: cursor < len(run.events) or settled())
+
+    async def stream(self, batch_id: str, fmt: str = "ndjson", after: int = -1) -> AsyncIterator[str]:
+        """Events encoded as NDJSON lines or SSE frames"""
+        async for event in self.events(batch_id, after):
+            data = json.dumps(event, default=str)
+            if fmt == "sse":
+                yield f"id: {event['seq']}\nevent: {event['event']}\ndata: {data}\n\n"
+            else:
+                yield data + "\n"
+
+    def metrics(self) -> Dict[str, Any]:
+        running = [run for run in self.batches.values() if run.status == "running"]
+        return {
+            "tracked_batches": len(self.batches),
+            "running_batches": len(running),
+            "in_flight_items": sum(run.total - run.done for run in running),
+        }
+
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
@@ -0,0 +1,158 @@
+"""
+Count Cache - Cheap totals for paginated and dashboard queries
+
+`count_documents` walks every matching index entry, which on a large
+`actions` collection costs more than the page it accompanies. Totals go
+through a count strategy instead:
+
+    exact      count_documents on every call
+    cached     count_documents at most once per COUNT_TTL per (collection,
+               filter); concurrent misses share one query, and inserts
+               recorded with note_insert keep equality-filter counts current
+    estimated  collection metadata (estimated_document_count) for
+               unfiltered totals; filtered totals fall back to cached
+    none       no count at all (callers report has_more instead)
+
+Unfiltered totals use estimated_document_count in every mode except exact.
+"""
+
+import time as time_module
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from bson import json_util
+
+from shared.singleflight import SingleFlight
+
+COUNT_MODES = ("exact", "cached", "estimated", "none")
+COUNT_MODE_PATTERN = "^(exact|cached|estimated|none)$"
+
+COUNT_TTL = 30.0  # seconds
+MAX_CACHED_COUNTS = 10_000
+
+CountKey = Tuple[str, str]
+
+
+def _is_equality_filter(query: Dict[str, Any]) -> bool:
+    return all(
+        not key.startswith("$") and not isinstance(value, (dict, list))
+        for key, value in query.items()
+    )
+
+
+class CountCache:
+    """TTL cache of filtered counts, kept current on recorded inserts"""
+
+    def __init__(self, ttl: float = COUNT_TTL, max_entries: int = MAX_CACHED_COUNTS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> [expires_at, count, filter]
+        self._counts: "OrderedDict[CountKey, list]" = OrderedDict()
+        self._by_collection: Dict[str, Set[CountKey]] = {}
+        self._flights = SingleFlight()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.estimated = 0
+
+    @staticmethod
+    def _key(collection, query: Dict[str, Any]) -> CountKey:
+        return collection.full_name, json_util.dumps(query, sort_keys=True)
+
+    async def count(self, collection, query: Optional[Dict[str, Any]] = None,
+                    mode: str = "cached") -> Optional[int]:
+        """
+        Count documents matching `query` using a count strategy
+
+        Returns None for mode "none".
+        """
+        query = query or {}
+        if mode == "none":
+            return None
+        if mode == "exact":
+            return await collection.count_documents(query)
+        if not query:
+            self.estimated += 1
+            return await collection.estimated_document_count()
+
+        key = self._key(collection, query)
+        entry = self._counts.get(key)
+        if entry and entry[0] > time_module.monotonic():
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return entry[1]
+
+        if self._flights.pending(key):
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        async def recount() -> int:
+            total = await collection.count_documents(query)
+            self._store(key, total, query)
+            return total
+
+        return await self._flights.do(key, recount)
+
+    def _store(self, key: CountKey, total: int, query: Dict[str, Any]):
+        self._counts[key] = [time_module.monotonic() + self.ttl, total, query]
+        self._counts.move_to_end(key)
+        self._by_collection.setdefault(key[0], set()).add(key)
+        while len(self._counts) > self.max_entries:
+            old_key, _ = self._counts.popitem(last=False)
+            self._forget(old_key)
+
+    def _forget(self, key: CountKey):
+        keys = self._by_collection.get(key[0])
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._by_collection[key[0]]
+
+    def note_insert(self, collection, doc: Dict[str, Any], n: int = 1):
+        """
+        Account for `n` inserted documents like `doc`: cached equality-filter
+        counts it matches are incremented, other filters on the collection
+        are dropped and recounted on next use
+        """
+        for key in list(self._by_collection.get(collection.full_name, ())):
+            entry = self._counts.get(key)
+            if entry is None:
+                self._forget(key)
+                continue
+            query = entry[2]
+            if _is_equality_filter(query):
+                if all(doc.get(field) == value for field, value in query.items()):
+                    entry[1] += n
+            else:
+                del self._counts[key]
+                self._forget(key)
+
+    def invalidate(self, collection=None):
+        """Drop cached counts for one collection (or all)"""
+        if collection is None:
+            self._counts.clear()
+            self._by_collection.clear()
+            return
+        for key in self._by_collection.pop(collection.full_name, set()):
+            self._counts.pop(key, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "cached_counts": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "estimated": self.estimated,
+        }
+
+
+_count_cache: Optional[CountCache] = None
+
+
+def get_count_cache() -> CountCache:
+    """Process-wide count cache"""
+    global _count_cache
+    if _count_cache is None:
+        _count_cache = CountCache()
+    return _count_cache
@@ -0,0 +1,131 @@
+"""
+Keyset Pagination - Opaque cursors for constant-cost paging
+
+A cursor encodes the sort key values and `_id` of the last document on a
+page. The next page is fetched with a range filter on (sort key, _id)
+instead of skip(), so with a compound index on the filter fields, the
+sort fields and `_id`, page 10,000 reads as few index entries as page 1.
+
+    items, next_cursor = await fetch_page(
+        db.actions, {"group_id": gid}, [("created_at", DESCENDING)],
+        limit=50, cursor=cursor
+    )
+
+skip() remains available (cursor=None, skip=N) for old page-number clients.
+"""
+
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import json_util
+from pymongo import ASCENDING
+
+SortSpec = Sequence[Tuple[str, int]]
+
+
+class InvalidCursor(ValueError):
+    """Cursor token is malformed or was issued for a different listing"""
+
+
+def keyset_sort(sort: SortSpec) -> List[Tuple[str, int]]:
+    """Sort spec with `_id` appended as the tiebreaker (same direction as the last key)"""
+    sort = list(sort)
+    if not sort or sort[-1][0] != "_id":
+        sort.append(("_id", sort[-1][1] if sort else ASCENDING))
+    return sort
+
+
+def encode_cursor(doc: Dict[str, Any], sort: SortSpec) -> str:
+    """Opaque token for the position right after `doc`"""
+    sort = keyset_sort(sort)
+    payload = {
+        "k": [field for field, _ in sort],
+        "v": [doc.get(field) for field, _ in sort],
+    }
+    raw = json_util.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: SortSpec) -> List[Any]:
+    """Sort key values stored in a cursor (raises InvalidCursor)"""
+    sort = keyset_sort(sort)
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json_util.loads(raw)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not isinstance(payload, dict) or payload.get("k") != [field for field, _ in sort]:
+        raise InvalidCursor("Cursor does not belong to this listing")
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+def _after(field: str, direction: int, value: Any) -> List[Dict[str, Any]]:
+    """Conditions for `field` strictly past `value` in sort order"""
+    # null/missing sorts lowest, and range operators never match it
+    if value is None:
+        return [{field: {"$ne": None}}] if direction == ASCENDING else []
+    if direction == ASCENDING:
+        return [{field: {"$gt": value}}]
+    if field == "_id":
+        return [{field: {"$lt": value}}]
+    return [{field: {"$lt": value}}, {field: None}]
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """Range filter selecting documents after the cursor position"""
+    sort = keyset_sort(sort)
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        prefix = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        for condition in _after(field, direction, values[i]):
+            branches.append(dict(prefix, **condition))
+    if not branches:
+        return {"_id": {"$exists": False}}  # cursor was at the very end
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort: SortSpec,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page in keyset order
+
+    Args:
+        collection: Motor collection
+        query: Base filter
+        sort: Sort spec (without `_id`; it is added as the tiebreaker)
+        limit: Page size
+        cursor: Token from a previous page (takes precedence over skip)
+        skip: Legacy offset, only used without a cursor
+        projection: Optional projection (must keep the sort fields)
+
+    Returns:
+        (items, next_cursor); next_cursor is None on the last page
+    """
+    sort = keyset_sort(sort)
+    if cursor:
+        after = keyset_filter(sort, decode_cursor(cursor, sort))
+        query = {"$and": [query, after]} if query else after
+        skip = 0
+
+    find = collection.find(query, projection=projection).sort(sort)
+    if skip:
+        find = find.skip(skip)
+    items = await find.limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1], sort)
+    return items, next_cursor
+
@@ -0,0 +1,98 @@
+"""
+Fast JSON Responses - orjson rendering with BSON-aware encoding
+
+FastJSONResponse is each app's default response class: payloads are
+rendered with orjson (stdlib json when orjson is not installed) and
+ObjectId, Decimal128, sets and pydantic models are encoded by one shared
+`bson_default` hook, so routes no longer convert documents by hand.
+
+FastAPI still runs returned dicts through `jsonable_encoder` (and the
+route's response_model) before rendering. Routes returning trusted
+payloads built from our own documents can skip both with
+`json_response(payload)`; the payload is then encoded in a single orjson
+pass. Use `model_projection(Model)` to fetch only the fields a response
+model documents.
+
+Benchmark: python -m api_v2.utils.json_benchmark
+"""
+
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Mapping, Optional, Type
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    from bson import ObjectId
+    from bson.decimal128 import Decimal128
+    BSON_AVAILABLE = True
+except ImportError:
+    BSON_AVAILABLE = False
+
+
+def bson_default(value: Any) -> Any:
+    """Encode values JSON has no type for (same output as jsonable_encoder)"""
+    if BSON_AVAILABLE:
+        if isinstance(value, ObjectId):
+            return str(value)
+        if isinstance(value, Decimal128):
+            return float(value.to_decimal())
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize a response payload to JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=bson_default, option=_ORJSON_OPTIONS)
+    return json.dumps(
+        content,
+        default=bson_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson and the shared BSON encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200,
+                  headers: Optional[Mapping[str, str]] = None) -> FastJSONResponse:
+    """Trusted response: skips response_model validation and jsonable_encoder"""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """MongoDB projection for the fields (by alias) a response model declares"""
+    return {field.alias or name: 1 for name, field in model.model_fields.items()}
@@ -0,0 +1,48 @@
+"""
+Single Flight - One in-flight call per key, shared by concurrent callers
+
+    flights = SingleFlight()
+    total = await flights.do(key, lambda: collection.count_documents(query))
+
+The call runs as its own task, so it is never tied to the caller that
+started it: if any caller (including the first) is cancelled, the others
+still get the result, and the key is released when the call finishes,
+whatever the outcome.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Concurrent calls for the same key share one task"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def pending(self, key: Hashable) -> bool:
+        """Whether a call for key is in flight"""
+        return key in self._inflight
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run call() for key, or join the call already in flight"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._release(key, done))
+        # Shield so a cancelled caller does not cancel the shared call
+        return await asyncio.shield(future)
+
+    def _release(self, key: Hashable, done: asyncio.Future):
+        if self._inflight.get(key) is done:
+            del self._inflight[key]
+        if not done.cancelled():
+            done.exception()  # mark retrieved when every caller was cancelled
+
+    def forget(self, key: Hashable):
+        """Let the next call for key start afresh (the running one completes)"""
+        self._inflight.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._inflight)